@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+ragfine bench — throughput benchmarks for insightgen steps and whole pipelines.
+
+    ragfine bench --docs 200 --output bench.json
+    ragfine bench --compare bench.json          # exit code 1 on regressions
+
+Results are written as JSON ({"meta": ..., "results": [...]}) with stable
+benchmark names, so files from two commits can be diffed or compared with
+--compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import ragfine.steps  # noqa: F401  (registers built-in steps)
+from ragfine.steps import load_insightgen
+from ragfine.core.pipebase import State
+from ragfine.core.pipeline import Pipeline, combine
+from ragfine.core.cow import copy_state
+
+# --- synthetic corpus ---
+_WORDS = (
+    "the a of and to in is was for on that with as by it at from this be are or an which "
+    "data model system report value result process team review market growth plan policy "
+    "network service design quality analysis support project customer product research"
+).split()
+_NAMES = (
+    "Alice Bob Carol Dave Erin Frank Grace Heidi Ivan Judy Mallory Niaj Olivia Peggy Rupert "
+    "Sybil Trent Victor Walter Warsaw Berlin Paris Acme Globex Initech Umbrella Hooli Vandelay"
+).split()
+_DOMAINS = ("example.com", "mail.org", "corp.net", "uni.edu")
+
+
+def synth_corpus(
+    n_docs: int,
+    doc_words: int = 200,
+    entity_density: float = 0.08,
+    email_rate: float = 0.01,
+    url_rate: float = 0.01,
+    seed: int = 0,
+) -> List[str]:
+    """
+    Deterministic synthetic documents: sentences of lowercase filler words with
+    capitalised names (entity_density = share of tokens), emails and URLs mixed in.
+    """
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(n_docs):
+        tokens: List[str] = []
+        sentence = 0
+        for _ in range(doc_words):
+            r = rng.random()
+            if r < entity_density:
+                tok = rng.choice(_NAMES)
+            elif r < entity_density + email_rate:
+                tok = f"{rng.choice(_NAMES).lower()}.{rng.randrange(100)}@{rng.choice(_DOMAINS)}"
+            elif r < entity_density + email_rate + url_rate:
+                tok = f"https://{rng.choice(_DOMAINS)}/{rng.choice(_WORDS)}/{rng.randrange(1000)}"
+            else:
+                tok = rng.choice(_WORDS)
+            sentence += 1
+            if sentence == 1:
+                tok = tok[:1].upper() + tok[1:]
+            if sentence >= rng.randint(8, 20):
+                tok += "."
+                sentence = 0
+            tokens.append(tok)
+        docs.append(" ".join(tokens).rstrip(".") + ".")
+    return docs
+
+
+# --- timing ---
+def _time(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"seconds": statistics.median(times), "min_s": min(times)}
+
+
+def _result(name: str, timing: Dict[str, float], items: int, **params: Any) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "params": params,
+        "seconds": round(timing["seconds"], 6),
+        "min_s": round(timing["min_s"], 6),
+        "items": items,
+        "items_per_s": round(items / timing["seconds"], 2) if timing["seconds"] else None,
+    }
+
+
+def _insightgen_steps() -> List[Any]:
+    load_insightgen()
+    from ragfine.insightgen import Entifier, Questor, Solver, Integrator, Refiner, Rebaser
+    return [Entifier(), Questor(), Solver(), Integrator(), Refiner(), Rebaser()]
+
+
+def bench_steps(docs: List[str], repeat: int) -> List[Dict[str, Any]]:
+    """Each insightgen step alone, on states prepared by the steps before it."""
+    steps = _insightgen_steps()
+    variant = {"style_prefix": "", "style_suffix": ""}
+    states = [State(data={"text": d}) for d in docs]
+    chars = sum(len(d) for d in docs)
+    out = []
+    for step_obj in steps:
+        inputs = [copy_state(s) for s in states]
+
+        def _run_all():
+            for s in [copy_state(s) for s in inputs]:
+                step_obj.run(s, variant)
+
+        copy_only = _time(lambda: [copy_state(s) for s in inputs], repeat)
+        timing = _time(_run_all, repeat)
+        timing = {k: max(v - copy_only[k], 0.0) for k, v in timing.items()}  # exclude input copies
+        res = _result(f"step/{step_obj.name}", timing, len(docs), docs=len(docs))
+        res["chars_per_s"] = round(chars / timing["seconds"], 2) if timing["seconds"] else None
+        out.append(res)
+        states = [step_obj.run(s, variant) for s in inputs]
+    return out
+
+
+def bench_pipelines(
+    docs: List[str], repeat: int, variant_counts: List[int], concurrency: List[int],
+) -> List[Dict[str, Any]]:
+    """Full insightgen pipeline via run_many: sync over variant counts, async over concurrency levels."""
+    pipe = Pipeline(_insightgen_steps())
+    out = []
+    for n in variant_counts:
+        variants = combine({"style_suffix": [f"\n—{i}" for i in range(n)]}, {"style_prefix": ""})
+
+        def _sync():
+            for _ in pipe.run_many((State(data={"text": d}) for d in docs), variants=variants, retain="summary"):
+                pass
+        out.append(_result(f"pipeline/sync/v{n}", _time(_sync, repeat), len(docs) * n, docs=len(docs), variants=n))
+
+        for c in concurrency:
+            def _async():
+                for _ in pipe.run_many((State(data={"text": d}) for d in docs), variants=variants,
+                                       async_mode=True, variant_concurrency=c, step_executor=None,
+                                       retain="summary"):
+                    pass
+            out.append(_result(f"pipeline/async/v{n}/c{c}", _time(_async, repeat), len(docs) * n,
+                               docs=len(docs), variants=n, concurrency=c))
+    return out
+
+
+def _three_pass_entities(text: str) -> List[str]:
+    """Reference: the previous Entifier extraction (three regex passes + dedup), kept for the speedup figure."""
+    from ragfine.insightgen.utils import WORD_RE, EMAIL_RE, URL_RE, unique
+    words = WORD_RE.findall(text)
+    titlecase = [w for w in words if w[:1].isupper() and w.lower() != w]
+    return unique(titlecase + EMAIL_RE.findall(text) + URL_RE.findall(text))
+
+
+def bench_entity_scanner(docs: List[str], megabytes: float, repeat: int) -> List[Dict[str, Any]]:
+    """Single-pass scan_entities vs the three-pass reference on one MB-sized document."""
+    from ragfine.insightgen.utils import scan_entities
+    unit = " ".join(docs) + " "
+    text = unit * max(1, int(megabytes * 1_000_000 / max(len(unit), 1)))
+    size = {"mb": round(len(text) / 1_000_000, 3)}
+    three = _time(lambda: _three_pass_entities(text), repeat)
+    one = _time(lambda: scan_entities(text), repeat)
+    spans = _time(lambda: scan_entities(text, spans=True), repeat)
+    out = [
+        _result("scanner/three_pass", three, len(text), **size),
+        _result("scanner/single_pass", one, len(text), **size),
+        _result("scanner/single_pass_spans", spans, len(text), **size),
+    ]
+    out[1]["speedup"] = round(three["seconds"] / one["seconds"], 2) if one["seconds"] else None
+    return out
+
+
+# --- comparison ---
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Benchmarks whose median time grew by more than `threshold` (fraction) vs the baseline."""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in current.get("results", []):
+        b = base.get(r["name"])
+        if not b or not b.get("seconds"):
+            continue
+        ratio = r["seconds"] / b["seconds"]
+        r["vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append({"name": r["name"], "baseline_s": b["seconds"], "seconds": r["seconds"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="ragfine bench", description="Benchmark ragfine steps and pipelines.")
+    ap.add_argument("--docs", type=int, default=200, help="Number of synthetic documents")
+    ap.add_argument("--doc-words", type=int, default=200, help="Words per document")
+    ap.add_argument("--entity-density", type=float, default=0.08, help="Share of tokens that are names")
+    ap.add_argument("--email-rate", type=float, default=0.01, help="Share of tokens that are emails")
+    ap.add_argument("--url-rate", type=float, default=0.01, help="Share of tokens that are URLs")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3, help="Repetitions per benchmark (median is reported)")
+    ap.add_argument("--variants", type=_int_list, default=[1, 4, 16], help="Variant counts, e.g. 1,4,16")
+    ap.add_argument("--concurrency", type=_int_list, default=[1, 8], help="Async concurrency levels, e.g. 1,8")
+    ap.add_argument("--scanner-mb", type=float, default=2.0, help="Document size for the entity scanner benchmark")
+    ap.add_argument("--only", choices=("steps", "pipelines", "scanner"), help="Run one group of benchmarks")
+    ap.add_argument("--output", "-o", help="Write JSON here (default: stdout)")
+    ap.add_argument("--compare", help="Baseline JSON from an earlier run")
+    ap.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = ap.parse_args(argv)
+
+    docs = synth_corpus(args.docs, args.doc_words, args.entity_density, args.email_rate, args.url_rate, args.seed)
+    results: List[Dict[str, Any]] = []
+    if args.only in (None, "steps"):
+        results += bench_steps(docs, args.repeat)
+    if args.only in (None, "pipelines"):
+        results += bench_pipelines(docs, args.repeat, args.variants, args.concurrency)
+    if args.only in (None, "scanner"):
+        results += bench_entity_scanner(docs, args.scanner_mb, args.repeat)
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "corpus": {k: getattr(args, k) for k in ("docs", "doc_words", "entity_density", "email_rate", "url_rate", "seed")},
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    regressions: List[Dict[str, Any]] = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            regressions = compare(report, json.load(fh), args.threshold)
+        report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    for r in regressions:
+        print(f"REGRESSION {r['name']}: {r['baseline_s']}s -> {r['seconds']}s (x{r['ratio']})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,11 @@ import ragfine.steps  # noqa: F401
 from ragfine import State, pipeline_from_yaml, pipeline_from_json
 
 def main():
+    # subcommand: `ragfine bench ...` (see ragfine/cli/bench.py)
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        from ragfine.cli.bench import main as bench_main
+        sys.exit(bench_main(sys.argv[2:]))
+
     ap = argparse.ArgumentParser(description="Run a ragfine pipeline from YAML/JSON spec.")
     ap.add_argument("--spec", required=True, help="Path to YAML/JSON pipeline spec (or '-' for stdin)")
     ap.add_argument("--async", dest="async_mode", action="store_true",
@@ -1,4 +1,11 @@
 from .pipebase import Variant, State, Step, step, PipelineReport
 from .pipeline import Pipeline, combine
+from .cow import CowState, CowDict, copy_state, peek
+from .variant_space import VariantSpace
+from .cache import StepCache
+from .plan import CompiledPlan
+from .retention import StepRecord, SpillStore, load_spilled
+from .tracing import Tracer, trace
+from .dataflow import DataflowReport, DataflowError, check_dataflow
 from .builder import pipeline_from_spec, pipeline_from_yaml, pipeline_from_json
 from .registry import register_step, register_fn
\ No newline at end of file
@@ -1,7 +1,7 @@
 # ragfine/registry/builder.py
 from __future__ import annotations
 from typing import Any, Dict, Union, Tuple, TYPE_CHECKING
-import yaml, json
+import yaml, json, warnings
 from .registry import STEP_REGISTRY
 from .pipeline import Pipeline
 
@@ -15,10 +15,49 @@ def build_step_from_spec(spec: Union[str, Dict[str, Any]]):
     params = {k: v for k, v in spec.items() if k not in ("use", "type")}
     return STEP_REGISTRY[name](**params)
 
-def pipeline_from_spec(spec: Dict[str, Any]) -> Tuple["Pipeline", Dict[str, Any]]:
+def _cache_from_spec(cfg: Any):
+    """`cache:` section of a spec: a path, or a mapping with path / max_bytes."""
+    if not cfg:
+        return None
+    from .cache import StepCache
+    if isinstance(cfg, str):
+        return StepCache(cfg)
+    if cfg is True:
+        return StepCache()
+    return StepCache(**cfg)
+
+def _check_spec_dataflow(pipe: "Pipeline", spec: Dict[str, Any]) -> None:
+    """
+    Opt-in build-time dataflow check (see core/dataflow.py):
+        check_dataflow: false (default) | "warn" | "raise" (true = "raise")
+        trust_dataflow: true lets proven steps skip their runtime input validation
+    """
+    mode = spec.get("check_dataflow", False)
+    trust = bool(spec.get("trust_dataflow", False))
+    if mode is True:
+        mode = "raise"
+    if not mode:
+        if trust:
+            raise ValueError("trust_dataflow needs check_dataflow: 'warn' or 'raise'")
+        return
+    if mode not in ("warn", "raise"):
+        raise ValueError(f"Unknown check_dataflow {mode!r}; expected false, 'warn' or 'raise'")
+    report = pipe.check_dataflow(spec.get("inputs"), trust=trust, raise_on_error=mode == "raise")
+    if report.errors:  # "warn"
+        warnings.warn("Pipeline dataflow check failed:\n  " + "\n  ".join(report.errors), stacklevel=3)
+
+def _build_pipeline(spec: Dict[str, Any]) -> "Pipeline":
+    """Steps and cache of a spec, without the dataflow check (worker processes rebuild with this)."""
     from ..core.pipeline import Pipeline  # local import avoids cycles
     steps = [build_step_from_spec(s) for s in spec.get("steps", [])]
-    return Pipeline(steps), (spec.get("defaults") or {})
+    pipe = Pipeline(steps, cache=_cache_from_spec(spec.get("cache")))
+    pipe.spec = spec  # lets worker processes rebuild the pipeline instead of pickling steps
+    return pipe
+
+def pipeline_from_spec(spec: Dict[str, Any]) -> Tuple["Pipeline", Dict[str, Any]]:
+    pipe = _build_pipeline(spec)
+    _check_spec_dataflow(pipe, spec)
+    return pipe, (spec.get("defaults") or {})
 
 # ---------------------------------------------------------------------------
 # Convenience loaders for YAML / JSON specs
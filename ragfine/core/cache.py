@@ -0,0 +1,304 @@
+"""
+Content-addressed, persistent cache of step results (Pipeline(cache=...)).
+
+A step result is stored under a key built from:
+  - the step type and its constructor parameters (public instance attributes,
+    or `step.cache_key()` when the step defines it); functions are identified by
+    their code (bytecode, constants, defaults, closure values and the globals they
+    reference), not just by name,
+  - a digest of the state keys the step reads (`reads_state`, else the whole state),
+  - the variant keys it reads (`reads_variant`, else the whole variant).
+Unchanged upstream steps of an edited spec therefore hit the cache and only the
+steps downstream of the change run again.
+
+A step that declares `reads_state` must also say what it writes (`writes_state`,
+or the output model of @validate_io); only those keys are stored, and a hit merges
+them into the current state, leaving every other key as it is. Without a known
+write set such a step is not cached. Steps with `cacheable = False` are
+never cached (use it for non-deterministic steps or steps with side effects).
+"""
+from __future__ import annotations
+from typing import Any, Dict, Optional, Tuple
+from pathlib import Path
+import hashlib, inspect, pickle, sqlite3, threading, time, types
+
+from .pipebase import State, Variant
+from .cow import peek
+
+_PROTOCOL = 4  # stable across the supported Python versions
+_FORMAT = 3    # entry layout (data, meta, partial) and key normalisation; part of every key
+
+# `totals` keeps the running size of `entries` (maintained by triggers), so a put
+# never has to SUM the whole table; the atime index makes eviction an index walk
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key   TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size  INTEGER NOT NULL,
+    atime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime);
+CREATE TABLE IF NOT EXISTS totals (
+    id    INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM entries;
+CREATE TRIGGER IF NOT EXISTS entries_added AFTER INSERT ON entries
+BEGIN UPDATE totals SET bytes = bytes + NEW.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS entries_removed AFTER DELETE ON entries
+BEGIN UPDATE totals SET bytes = bytes - OLD.size WHERE id = 0; END;
+"""
+_EVICT_BATCH = 64
+
+
+def _canonical(obj: Any, _seen: Optional[set] = None) -> Any:
+    """Stable, comparable form of step parameters (functions by code, not address)."""
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return obj
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:  # recursive closures / containers
+        return "<cycle>"
+    seen.add(id(obj))
+    try:
+        if isinstance(obj, dict):
+            return sorted(((repr(k), _canonical(v, seen)) for k, v in obj.items()), key=lambda kv: kv[0])
+        if isinstance(obj, (list, tuple, set, frozenset)):
+            items = [_canonical(v, seen) for v in obj]
+            return sorted(items, key=repr) if isinstance(obj, (set, frozenset)) else items
+        if isinstance(obj, types.ModuleType):
+            return f"module:{obj.__name__}"
+        if isinstance(obj, types.CodeType):
+            return ["code", obj.co_code, obj.co_names, _canonical(obj.co_consts, seen)]
+        if inspect.ismethod(obj):
+            return ["method", _canonical(obj.__func__, seen), _canonical(obj.__self__, seen)]
+        if inspect.isroutine(obj) or isinstance(obj, type):
+            name = f"{getattr(obj, '__module__', '')}:{getattr(obj, '__qualname__', repr(obj))}"
+            code = getattr(obj, "__code__", None)
+            if code is None:  # builtins, classes: the name is all there is
+                return name
+            cells = [c.cell_contents if _cell_set(c) else "<empty>" for c in (obj.__closure__ or ())]
+            module_globals = getattr(obj, "__globals__", {})
+            used = {n: module_globals[n] for n in sorted(_global_names(code)) if n in module_globals}
+            return [name, _canonical(code, seen), _canonical(obj.__defaults__, seen),
+                    _canonical(obj.__kwdefaults__, seen), _canonical(cells, seen), _canonical(used, seen)]
+        if hasattr(obj, "__dict__"):
+            return [_qualname(obj), _canonical(_params(obj), seen)]
+        return repr(obj)
+    finally:
+        seen.discard(id(obj))
+
+
+def _global_names(code: types.CodeType) -> set:
+    """Names a function may look up as globals (its own and its nested code objects')."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def _cell_set(cell: Any) -> bool:
+    try:
+        cell.cell_contents
+        return True
+    except ValueError:
+        return False
+
+
+def _qualname(obj: Any) -> str:
+    cls = obj.__class__
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _params(step_obj: Any) -> Dict[str, Any]:
+    return {k: v for k, v in vars(step_obj).items() if not k.startswith("_")}
+
+
+def step_fingerprint(step_obj: Any) -> str:
+    """Step type + constructor parameters (+ optional `cache_version`) as a string."""
+    custom = getattr(step_obj, "cache_key", None)
+    params = custom() if callable(custom) else _params(step_obj)
+    return repr([_qualname(step_obj), getattr(step_obj, "cache_version", None), _canonical(params)])
+
+
+def step_writes(step_obj: Any) -> Optional[Tuple[str, ...]]:
+    """State.data keys a step writes: `writes_state`, else its @validate_io output model (None if unknown)."""
+    writes = getattr(step_obj, "writes_state", None)
+    if writes is not None:
+        return tuple(writes)
+    from .dataflow import step_io  # lazy: dataflow imports pipebase only, but keep cache import-light
+    io = step_io(step_obj)
+    model = io.get("output_model") if io else None
+    if model is None or io.get("output_to", "data") != "data":
+        return None
+    return tuple(f.alias or name for name, f in model.model_fields.items())
+
+
+def _stable(obj: Any) -> Any:
+    """Sets / frozensets sorted (recursively through dicts, lists, tuples): their pickle
+    order follows the string hash seed, which differs between processes."""
+    if isinstance(obj, (set, frozenset)):
+        return (type(obj).__name__, sorted((_stable(v) for v in obj), key=repr))
+    if isinstance(obj, dict):
+        return {k: _stable(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_stable(v) for v in obj]
+    if isinstance(obj, tuple):
+        return tuple(_stable(v) for v in obj)
+    return obj
+
+
+def _digest(obj: Any) -> str:
+    return hashlib.blake2b(pickle.dumps(_stable(obj), protocol=_PROTOCOL), digest_size=20).hexdigest()
+
+
+def _pick(mapping: Dict[str, Any], keys: Any) -> Any:
+    # peek(): keying only reads, so CowDict values are not copied for it
+    if keys is None:
+        return sorted(((k, peek(mapping, k)) for k in mapping), key=lambda kv: repr(kv[0]))
+    return [(k, peek(mapping, k)) for k in keys]
+
+
+class StepCache:
+    """
+    SQLite-backed step result store with size-bounded LRU eviction.
+
+    path:       database file (created if missing); ":memory:" for a process-local cache
+    max_bytes:  total size of stored results; least recently used entries are
+                evicted past it (None = unbounded)
+
+    Counters `hits` / `misses` are per process (worker processes keep their own).
+    The object pickles to its configuration, so it can be shipped to worker processes.
+    """
+
+    def __init__(self, path: "str | Path" = ".ragfine_cache.sqlite", max_bytes: Optional[int] = 1 << 30):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # --- connection ---
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA recursive_triggers=ON")  # REPLACE fires the delete trigger too
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"path": self.path, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, cfg: Dict[str, Any]) -> None:
+        self.__init__(**cfg)
+
+    def __repr__(self) -> str:
+        return f"StepCache(path={self.path!r}, max_bytes={self.max_bytes}, hits={self.hits}, misses={self.misses})"
+
+    # --- keys ---
+    def key(self, step_obj: Any, state: State, variant: Variant) -> Optional[str]:
+        """Cache key for running `step_obj` on (state, variant); None if the step is not cacheable."""
+        if not getattr(step_obj, "cacheable", True):
+            return None
+        reads_state = getattr(step_obj, "reads_state", None)
+        reads_variant = getattr(step_obj, "reads_variant", None)
+        if reads_state is not None and step_writes(step_obj) is None:
+            return None  # a partial key cannot restore a whole state; nothing says which keys to store
+        try:
+            return _digest((
+                _FORMAT,
+                step_fingerprint(step_obj),
+                _pick(state.data, reads_state),
+                _pick(state.meta, None) if reads_state is None else None,
+                _pick(dict(variant), None if reads_variant is None else tuple(reads_variant)),
+            ))
+        except Exception:  # unpicklable inputs: run the step uncached
+            return None
+
+    # --- store ---
+    def get(self, key: str, current: Optional[State] = None) -> Optional[State]:
+        """
+        Cached output for `key`. Entries of reads_state steps hold only the written keys:
+        they are merged into `current` (in place, as the step itself would) and `current` is returned.
+        """
+        with self._lock:
+            row = self._db().execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db().execute("UPDATE entries SET atime = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        data, meta, partial = pickle.loads(row[0])
+        if not partial:
+            return State(data=data, meta=meta)
+        target = current if current is not None else State()
+        target.data.update(data)
+        return target
+
+    def put(self, key: str, state: State, step_obj: Any = None) -> bool:
+        """Store a step's output state (only the keys it writes, for reads_state steps); False if unpicklable."""
+        partial = step_obj is not None and getattr(step_obj, "reads_state", None) is not None
+        if partial:
+            writes = step_writes(step_obj) or ()
+            entry = ({k: peek(state.data, k) for k in writes if k in state.data}, None, True)
+        else:
+            entry = ({k: peek(state.data, k) for k in state.data}, {k: peek(state.meta, k) for k in state.meta}, False)
+        try:
+            blob = pickle.dumps(entry, protocol=_PROTOCOL)
+        except Exception:
+            return False
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, atime) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), time.time()),
+                )
+                if self.max_bytes is not None:
+                    self._evict(db)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        return True
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        total = self._total(db)
+        while total > self.max_bytes:
+            batch = db.execute("SELECT key, size FROM entries ORDER BY atime ASC LIMIT ?", (_EVICT_BATCH,)).fetchall()
+            if not batch:
+                return
+            for key, size in batch:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    return
+
+    @staticmethod
+    def _total(db: sqlite3.Connection) -> int:
+        return db.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM entries")
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._total(self._db())
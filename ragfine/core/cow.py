@@ -0,0 +1,184 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import copy
+
+from .pipebase import State
+
+# Values of these types are never copied (immutable, safe to share)
+_ATOMIC = (str, bytes, int, float, bool, complex, type(None), frozenset, range, type)
+
+COPY_STRATEGIES = ("deepcopy", "cow", "shallow")
+
+
+class CowDict(dict):
+    """
+    Copy-on-write dict used by CowState.
+
+    Forks share value objects structurally; a mutable value is deep-copied the
+    first time this dict hands it out (v[k], get, items, values, ...) so in-place
+    mutation by a step never leaks into other forks, and a key that is only
+    (re)assigned is never copied at all. Cost of a fork is O(number of keys).
+
+    This is copy-on-*access*, not copy-on-write: a plain read cannot tell whether
+    the caller will mutate the value, so it pays for the copy. Steps that only
+    read a large value should use peek(state.data, key), which returns the shared
+    object without copying (and must not be mutated).
+
+    NOTE:
+        Values shared with a plain source dict are copied lazily, so the source
+        should not be mutated in place while forks are alive. Aliasing between
+        two keys that point at the same object is not preserved.
+    """
+    __slots__ = ("_owned",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._owned: set = set()
+
+    @classmethod
+    def fork(cls, source: Dict[str, Any]) -> "CowDict":
+        child = cls()
+        if isinstance(source, CowDict):
+            dict.update(child, dict.items(source))
+            source._owned.clear()  # values are now shared with the child
+        else:
+            dict.update(child, source)
+        return child
+
+    # --- ownership ---
+    def _own(self, key: Any, value: Any) -> Any:
+        if key in self._owned:
+            return value
+        if not isinstance(value, _ATOMIC):
+            value = copy.deepcopy(value)
+            dict.__setitem__(self, key, value)
+        self._owned.add(key)
+        return value
+
+    def _own_all(self) -> None:
+        if len(self._owned) != dict.__len__(self):
+            for k, v in list(dict.items(self)):
+                self._own(k, v)
+
+    # --- reads ---
+    def peek(self, key, default=None):
+        """The value without taking ownership (no copy); the caller must not mutate it."""
+        return dict.get(self, key, default)
+
+    def __getitem__(self, key):
+        return self._own(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self[key]
+        return default
+
+    def __iter__(self):
+        # overriding __iter__ also makes dict(d) / {**d} / f(**d) go through keys() + __getitem__
+        return dict.__iter__(self)
+
+    def items(self):
+        self._own_all()
+        return dict.items(self)
+
+    def values(self):
+        self._own_all()
+        return dict.values(self)
+
+    # --- writes ---
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._owned.discard(key)
+
+    def pop(self, key, *default):
+        if dict.__contains__(self, key):
+            value = self[key]
+            dict.__delitem__(self, key)
+            self._owned.discard(key)
+            return value
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        if key not in self._owned and not isinstance(value, _ATOMIC):
+            value = copy.deepcopy(value)
+        self._owned.discard(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self[key]
+        self[key] = default
+        return default
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def clear(self):
+        dict.clear(self)
+        self._owned.clear()
+
+    # --- copying / pickling ---
+    def copy(self) -> "CowDict":
+        return CowDict.fork(self)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo) -> "CowDict":
+        return CowDict.fork(self)
+
+    def __reduce__(self):
+        return (CowDict, (dict(dict.items(self)),))
+
+
+def peek(mapping: Dict[str, Any], key: str, default: Any = None) -> Any:
+    """Read-only access that never triggers a CowDict copy; plain dict.get for other mappings."""
+    if isinstance(mapping, CowDict):
+        return mapping.peek(key, default)
+    return mapping.get(key, default)
+
+
+@dataclass
+class CowState(State):
+    """State whose data/meta are CowDicts; forking it costs O(keys), not O(size)."""
+
+    def __post_init__(self):
+        if not isinstance(self.data, CowDict):
+            self.data = CowDict.fork(self.data)
+        if not isinstance(self.meta, CowDict):
+            self.meta = CowDict.fork(self.meta)
+
+    @classmethod
+    def fork(cls, state: "State") -> "CowState":
+        return cls(data=CowDict.fork(state.data), meta=CowDict.fork(state.meta))
+
+    def __deepcopy__(self, memo) -> "CowState":
+        return CowState.fork(self)
+
+
+def copy_state(state: "Optional[State]", strategy: str = "deepcopy") -> "State":
+    """
+    Isolate a state for one run according to `strategy`:
+      - "deepcopy": full copy.deepcopy (default, always safe)
+      - "cow":      CowState fork; mutable values are copied on first access
+                    (read them with peek() to avoid the copy)
+      - "shallow":  new data/meta dicts sharing values; safe only if steps replace
+                    values instead of mutating them in place
+    ("none", used internally by run_many, hands the state over without copying.)
+    """
+    state = state if state is not None else State()
+    if strategy == "none":
+        return state
+    if strategy == "deepcopy":
+        return copy.deepcopy(state)
+    if strategy == "cow":
+        return CowState.fork(state)
+    if strategy == "shallow":
+        return State(data=dict(state.data), meta=dict(state.meta))
+    raise ValueError(f"Unknown copy_strategy {strategy!r}; expected one of {COPY_STRATEGIES}")
@@ -0,0 +1,219 @@
+"""
+Build-time dataflow checking of pipelines.
+
+Steps decorated with @validate_io / @validate_io_batch declare what they read
+(input_model) and write (output_model). check_dataflow() walks the steps once,
+in order, and verifies that every declared input is available upstream with a
+compatible type:
+
+  - a key becomes *available* when an upstream step's output model declares it,
+    or an upstream step has validated it as input (and nothing changed it since);
+  - reading an available key with an incompatible type is an error;
+  - a required input that nothing upstream provides comes from the initial
+    state: it is listed in `external` (or is an error when `provided=` says
+    what the initial state holds and it is not there);
+  - steps without declarations are opaque: after one, nothing can be proven.
+
+Steps whose inputs are all guaranteed upstream are `trusted`. Trust belongs to
+the pipeline that was checked (Pipeline.check_dataflow(trust=True)): while it
+runs, trusted_scope() publishes its trusted steps in a context variable and the
+validate_io wrappers of those steps skip their own (redundant) input validation;
+output validation keeps guaranteeing the contracts the proof relies on.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Type, Union, get_args, get_origin
+import contextvars, typing
+
+from .pipebase import FnStep, _CallableStep
+
+Key = Tuple[str, str]  # (State attribute, key), e.g. ("data", "entities")
+
+_TYPE_NAMES = {
+    "str": str, "int": int, "float": float, "bool": bool, "bytes": bytes,
+    "list": list, "dict": dict, "any": Any,
+}
+
+
+class DataflowError(ValueError):
+    """Raised when a pipeline's declared step inputs/outputs do not line up."""
+
+
+@dataclass
+class DataflowReport:
+    errors: List[str] = field(default_factory=list)
+    external: Dict[str, Any] = field(default_factory=dict)   # required inputs taken from the initial state
+    available: Dict[str, Any] = field(default_factory=dict)  # guaranteed keys (annotations) after the last step
+    opaque: List[str] = field(default_factory=list)          # steps without io declarations
+    trusted: List[str] = field(default_factory=list)         # steps whose inputs are guaranteed upstream
+    trusted_at: List[int] = field(default_factory=list)      # their positions in the step list
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def proven(self) -> bool:
+        """Well-typed end to end: no errors and no opaque steps."""
+        return self.ok and not self.opaque
+
+
+def step_io(step_obj: Any) -> Optional[Dict[str, Any]]:
+    """io declaration attached by @validate_io / @validate_io_batch, if any."""
+    io = getattr(getattr(step_obj, "run", None), "__ragfine_io__", None)
+    if io is None and isinstance(step_obj, (FnStep, _CallableStep)):
+        io = getattr(step_obj.fn, "__ragfine_io__", None)
+    return io
+
+
+# --- runtime trust (read by the validate_io wrappers) ---
+# keys: id() of the step object for validated methods, of the validated function for
+# FnStep / callables (ids stay valid while the pipeline holding the steps is alive)
+_TRUSTED: "contextvars.ContextVar[frozenset]" = contextvars.ContextVar("ragfine_dataflow_trusted", default=frozenset())
+
+
+def trust_key(step_obj: Any) -> int:
+    """What a validate_io wrapper sees of its step: `self` for methods, the wrapped function otherwise."""
+    return id(step_obj.fn if isinstance(step_obj, (FnStep, _CallableStep)) else step_obj)
+
+
+def trust_keys(steps: List[Any], positions: "Iterable[int]") -> frozenset:
+    """Trust keys of the steps at `positions`; a key also used at an untrusted position is left out."""
+    positions = set(positions)
+    untrusted = {trust_key(s) for i, s in enumerate(steps) if i not in positions}
+    return frozenset(trust_key(steps[i]) for i in positions) - untrusted
+
+
+@contextmanager
+def trusted_scope(keys: frozenset):
+    """Publish the trust keys of the running pipeline to the validators of its steps."""
+    token = _TRUSTED.set(keys)
+    try:
+        yield
+    finally:
+        _TRUSTED.reset(token)
+
+
+def is_trusted(obj: Any) -> bool:
+    trusted = _TRUSTED.get()
+    return bool(trusted) and id(obj) in trusted
+
+
+def _is_union(origin: Any) -> bool:
+    return origin is Union or (origin is not None and getattr(origin, "__name__", "") == "UnionType")
+
+
+def compatible(prod: Any, cons: Any) -> bool:
+    """Can a value typed `prod` be used where `cons` is expected? Unknown forms count as compatible."""
+    if cons is Any or prod is Any or prod == cons:
+        return True
+    po, co = get_origin(prod), get_origin(cons)
+    if _is_union(po):
+        return all(compatible(p, cons) for p in get_args(prod))
+    if _is_union(co):
+        return any(compatible(prod, c) for c in get_args(cons))
+    if po is typing.Annotated or co is typing.Annotated:
+        return compatible(get_args(prod)[0] if po is typing.Annotated else prod,
+                          get_args(cons)[0] if co is typing.Annotated else cons)
+    p_base, c_base = po or prod, co or cons
+    if isinstance(p_base, type) and isinstance(c_base, type):
+        if not (issubclass(p_base, c_base) or (p_base is int and c_base is float)):
+            return False
+        pa, ca = get_args(prod), get_args(cons)
+        if pa and ca and len(pa) == len(ca):
+            return all(compatible(p, c) for p, c in zip(pa, ca) if p is not Ellipsis and c is not Ellipsis)
+        return True
+    return True
+
+
+def _field_ok(prod: Any, cons: Any) -> bool:
+    """Annotation compatible and every constraint the consumer declares (min_length, ...) guaranteed."""
+    if not compatible(prod.annotation, cons.annotation):
+        return False
+    return all(m in prod.metadata for m in cons.metadata)
+
+
+def _provided_fields(provided: Any) -> Dict[str, Any]:
+    from pydantic import BaseModel
+    from pydantic.fields import FieldInfo
+    if isinstance(provided, type) and issubclass(provided, BaseModel):
+        return dict(provided.model_fields)
+    out = {}
+    for k, t in dict(provided).items():
+        if isinstance(t, str):
+            t = _TYPE_NAMES.get(t.lower(), Any)
+        out[k] = FieldInfo(annotation=t)
+    return out
+
+
+def check_dataflow(
+    steps: List[Any],
+    provided: "Union[Mapping[str, Any], Type[Any], None]" = None,
+) -> DataflowReport:
+    """
+    Check declared step inputs against upstream outputs (see module docstring).
+
+    provided: what the initial State.data holds (mapping key -> type or type name,
+              or a pydantic model); None = unknown, missing inputs become `external`.
+    """
+    report = DataflowReport()
+    avail: Dict[Key, Any] = {}    # key -> FieldInfo that guarantees it
+    origin: Dict[Key, str] = {}   # key -> step that guarantees it
+    given = _provided_fields(provided) if provided is not None else None
+    opaque_seen = False
+
+    for pos, step_obj in enumerate(steps):
+        name = getattr(step_obj, "name", step_obj.__class__.__name__)
+        io = step_io(step_obj)
+        if io is None:
+            report.opaque.append(name)
+            opaque_seen = True
+            avail.clear()  # an opaque step may rewrite anything
+            continue
+
+        src, dst = io["input_from"], io["output_to"]
+        trusted = not opaque_seen
+        validated: Dict[Key, Any] = {}
+        for fname, f in io["input_model"].model_fields.items():
+            key = (src, f.alias or fname)
+            if key in avail:
+                if not _field_ok(avail[key], f):
+                    report.errors.append(
+                        f"{name} reads {src}[{key[1]!r}] as {_fmt(f.annotation)}, "
+                        f"but {origin[key]} provides {_fmt(avail[key].annotation)}"
+                    )
+                    trusted = False
+                continue
+            trusted = False  # comes from the initial state (or an opaque step)
+            validated[key] = f
+            if opaque_seen or not f.is_required():
+                continue
+            if given is None:
+                report.external.setdefault(key[1], f.annotation)
+            elif src != "data" or key[1] not in given:
+                report.errors.append(f"{name} requires {src}[{key[1]!r}], which no upstream step produces")
+            elif not compatible(given[key[1]].annotation, f.annotation):
+                report.errors.append(
+                    f"{name} reads {src}[{key[1]!r}] as {_fmt(f.annotation)}, "
+                    f"but the initial state provides {_fmt(given[key[1]].annotation)}"
+                )
+
+        if trusted:
+            report.trusted.append(name)
+            report.trusted_at.append(pos)
+        for key, f in validated.items():  # validated as input from here on
+            avail[key], origin[key] = f, f"{name} (validated input)"
+        if not io["merge_output"]:
+            for key in [k for k in avail if k[0] == dst]:
+                del avail[key]
+        for fname, f in io["output_model"].model_fields.items():
+            key = (dst, fname)
+            avail[key], origin[key] = f, name
+
+    report.available = {f"{a}.{k}" if a != "data" else k: f.annotation for (a, k), f in avail.items()}
+    return report
+
+
+def _fmt(t: Any) -> str:
+    return getattr(t, "__name__", None) if isinstance(t, type) else str(t).replace("typing.", "")
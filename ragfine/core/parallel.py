@@ -0,0 +1,76 @@
+"""
+Worker-side helpers for Pipeline.run(executor="process").
+
+Each worker process rebuilds the pipeline once (from its spec when it came from
+pipeline_from_spec/_yaml/_json, otherwise from pickled steps) and keeps it,
+together with the initial State, in module globals for all chunks it receives.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+import os, time
+
+from .retention import apply_retention
+from .tracing import trace
+
+if TYPE_CHECKING:
+    from .pipeline import Pipeline
+    from .pipebase import State, PipelineReport, Variant
+
+_WORKER: Dict[str, Any] = {}
+
+
+def pipeline_payload(pipe: "Pipeline") -> Tuple[str, Any, Tuple[int, ...]]:
+    """What is shipped to workers: the spec if known, else the step objects, plus the trusted step positions."""
+    spec = getattr(pipe, "spec", None)
+    if spec is not None:
+        return ("spec", spec, pipe._trusted_at)
+    return ("steps", pipe.steps, pipe._trusted_at)
+
+
+def _build(payload: Tuple[str, Any, Tuple[int, ...]]) -> "Pipeline":
+    kind, body, trusted_at = payload
+    if kind == "spec":
+        import ragfine.steps  # noqa: F401  (registers built-in steps in fresh interpreters)
+        from .builder import _build_pipeline
+        pipe = _build_pipeline(body)  # the parent already ran (and reported) the dataflow check
+    else:
+        from .pipeline import Pipeline
+        pipe = Pipeline(body)
+    pipe._trust(trusted_at)
+    return pipe
+
+
+def _init_worker(
+    payload: Tuple[str, Any], state: "Optional[State]", run_kwargs: Dict[str, Any], cache: Any = None,
+    retain: Any = "all", tracing: bool = False,
+) -> None:
+    _WORKER["pipe"] = _build(payload)
+    _WORKER["pipe"].cache = cache  # StepCache pickles to its config and reopens the store here
+    _WORKER["state"] = state
+    _WORKER["run_kwargs"] = run_kwargs
+    _WORKER["retain"] = retain  # projection applied before results are shipped back
+    _WORKER["tracing"] = tracing
+
+
+def _run_chunk(chunk: "List[Tuple[Optional[State], Variant]]") -> "List[PipelineReport]":
+    """
+    Run a chunk of (state, defaults-merged variant) pairs in this worker (one batch if
+    batched); a None state stands for the initial State shipped by _init_worker.
+    """
+    pipe = _WORKER["pipe"]
+    pid = os.getpid()
+    t_chunk = time.perf_counter()
+    pairs = [(_WORKER["state"] if st is None else st, v) for st, v in chunk]
+    if _WORKER.get("tracing"):
+        with trace() as tracer:
+            reports = pipe._run_chunk(pairs, **_WORKER["run_kwargs"])
+        if reports:
+            reports[0].info["trace"] = tracer.events  # merged into the parent's tracer
+    else:
+        reports = pipe._run_chunk(pairs, **_WORKER["run_kwargs"])
+    chunk_s = round(time.perf_counter() - t_chunk, 6)
+    retain = _WORKER.get("retain", "all")
+    for rep in reports:
+        rep.info.update({"worker_pid": pid, "chunk_s": chunk_s})
+        apply_retention(rep, retain)
+    return reports
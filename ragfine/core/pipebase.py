@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Callable, Protocol, Iterable, Optional, Union
 from .registry import register_step
+from .tracing import span, bind_context
 
 # ---------- Core ----------
 @dataclass
@@ -10,17 +11,205 @@ class State:
 
 Variant = Dict[str, Any]
 
+# --- Variant read tracking (used by Pipeline.run(share_prefixes=True)) ---
+class _TrackedVariant(dict):
+    """
+    Variant dict that records which keys a step reads.
+    Key lookups (v[k], v.get(k), k in v) are recorded one by one; anything that
+    exposes the whole mapping (iteration, keys/items/values, len, copy, **v)
+    marks the step as reading *all* keys (read_keys -> None).
+    """
+    def __init__(self, variant: "Variant"):
+        super().__init__(variant)
+        self._read: "Optional[set]" = set()
+
+    @property
+    def read_keys(self) -> "Optional[set]":
+        return None if self._read is None else set(self._read)
+
+    def _mark(self, key: Any) -> None:
+        if self._read is not None:
+            self._read.add(key)
+
+    def _mark_all(self) -> None:
+        self._read = None
+
+    def __getitem__(self, key):
+        self._mark(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self._mark(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self._mark(key)
+        return super().__contains__(key)
+
+    def __iter__(self):
+        self._mark_all()
+        return super().__iter__()
+
+    def keys(self):
+        self._mark_all()
+        return super().keys()
+
+    def items(self):
+        self._mark_all()
+        return super().items()
+
+    def values(self):
+        self._mark_all()
+        return super().values()
+
+    def __len__(self):
+        self._mark_all()
+        return super().__len__()
+
+    def pop(self, key, *default):
+        self._mark(key)
+        return super().pop(key, *default)
+
+    def setdefault(self, key, default=None):
+        self._mark(key)
+        return super().setdefault(key, default)
+
+    def copy(self):
+        self._mark_all()
+        return dict(super().items())
+
+    def __eq__(self, other):
+        self._mark_all()
+        return super().__eq__(other)
+
+    def __ne__(self, other):
+        self._mark_all()
+        return super().__ne__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._mark_all()
+        return super().__repr__()
+
+    def __or__(self, other):
+        self._mark_all()
+        return dict(super().items()) | other
+
+    def __ror__(self, other):
+        self._mark_all()
+        return other | dict(super().items())
+
+    def __reduce_ex__(self, protocol):
+        # copy/deepcopy/pickle see a plain dict (and everything in it)
+        self._mark_all()
+        return (dict, (dict(super().items()),))
+
+    def _merge(self, read: "Optional[set]") -> None:
+        """Fold in keys read by a copy of this variant elsewhere (a process worker)."""
+        if read is None:
+            self._mark_all()
+        elif self._read is not None:
+            self._read.update(read)
+
+_MISSING = object()
+
+def _same_value(a: Any, b: Any) -> bool:
+    if a is b:
+        return True
+    try:
+        return bool(a == b)
+    except Exception:  # e.g. ambiguous truth value of array comparisons
+        return False
+
+def _variants_agree(a: "Variant", b: "Variant", keys: "Iterable[Any]") -> bool:
+    return all(_same_value(a.get(k, _MISSING), b.get(k, _MISSING)) for k in keys)
+
 # --- Async helpers and imports ---
-import asyncio, inspect
+import asyncio, inspect, contextvars
+from concurrent.futures import ProcessPoolExecutor
+
+# Executor used by _run_step_async for synchronous steps (set by Pipeline.run in async mode)
+_STEP_EXECUTOR: "contextvars.ContextVar[Any]" = contextvars.ContextVar("ragfine_step_executor", default=None)
 
 async def _maybe_await(obj):
     return await obj if inspect.isawaitable(obj) else obj
 
+def _is_async_step(step_obj: Any) -> bool:
+    """True if step.run (or the wrapped fn of FnStep/_CallableStep) is a coroutine function."""
+    if inspect.iscoroutinefunction(getattr(step_obj, "run", None)):
+        return True
+    fn = getattr(step_obj, "fn", None) if isinstance(step_obj, (_CallableStep, FnStep)) else None
+    return fn is not None and inspect.iscoroutinefunction(fn)
+
+def _call_step(step_obj: "Step", state: "State", variant: "Variant") -> Any:
+    # module-level so it can be shipped to a process pool
+    return step_obj.run(state, variant)
+
+def _call_tracked(step_obj: "Step", state: "State", variant: "Variant") -> Any:
+    # process worker side of a tracked variant: track again here, send the reads back
+    tracked = _TrackedVariant(variant)
+    return step_obj.run(state, tracked), tracked.read_keys
+
 async def _run_step_async(step_obj: "Step", state: "State", variant: "Variant", step_timeout: "Optional[float]" = None) -> "State":
-    coro = _maybe_await(step_obj.run(state, variant))
-    if step_timeout is not None:
-        return await asyncio.wait_for(coro, timeout=step_timeout)
-    return await coro
+    """
+    Run one step inside the event loop.
+    Synchronous steps are dispatched to the current step executor (if any, and
+    unless the step sets `offload = False`), so they neither block the loop nor
+    escape step_timeout. On timeout an offloaded step is abandoned: its worker
+    keeps running in the background, but the pipeline moves on / fails fast.
+    """
+    executor = _STEP_EXECUTOR.get()
+    if executor is not None and getattr(step_obj, "offload", True) and not _is_async_step(step_obj):
+        # threads keep the tracing context (nested spans); process workers cannot carry it
+        tracked = isinstance(executor, ProcessPoolExecutor) and isinstance(variant, _TrackedVariant)
+        if tracked:
+            # pickling the tracker would count as reading every key; ship a plain copy instead
+            call, arg = _call_tracked, dict(dict.items(variant))
+        else:
+            call = _call_step if isinstance(executor, ProcessPoolExecutor) else bind_context(_call_step)
+            arg = variant
+
+        async def _invoke():
+            loop = asyncio.get_running_loop()
+            res = await loop.run_in_executor(executor, call, step_obj, state, arg)
+            if tracked:
+                res, read = res
+                variant._merge(read)
+            return await _maybe_await(res)
+    else:
+        async def _invoke():
+            return await _maybe_await(step_obj.run(state, variant))
+    with span(getattr(step_obj, "name", step_obj.__class__.__name__)):
+        coro = _invoke()
+        if step_timeout is not None:
+            return await asyncio.wait_for(coro, timeout=step_timeout)
+        return await coro
+
+# --- Batched step protocol: optional step.run_batch(states, variants) -> List[State] ---
+def _has_run_batch(step_obj: Any) -> bool:
+    return callable(getattr(step_obj, "run_batch", None))
+
+def _run_step_batch(step_obj: "Step", states: List["State"], variants: List["Variant"]) -> List["State"]:
+    """Run one step over aligned states/variants: one run_batch call if the step has it, else per-item run()."""
+    name = getattr(step_obj, "name", step_obj.__class__.__name__)
+    if _has_run_batch(step_obj):
+        with span(name, batch=len(states)):
+            out = step_obj.run_batch(states, variants)
+        if inspect.isawaitable(out):
+            raise RuntimeError(f"Step '{name}' returned awaitable from run_batch in sync mode.")
+        out = list(out)
+        if len(out) != len(states):
+            raise ValueError(f"Step '{name}'.run_batch returned {len(out)} states for {len(states)} inputs")
+        return out
+    out = []
+    for st, v in zip(states, variants):
+        with span(name):
+            res = step_obj.run(st, v)
+        if inspect.isawaitable(res):
+            raise RuntimeError(f"Step '{name}' returned awaitable in sync mode. Set async_mode=True.")
+        out.append(res)
+    return out
 
 # fix _run_steps_inline to normalize before running
 def _run_steps_inline(state: "State", variant: "Variant", steps: List["Step"]) -> "State":
@@ -29,7 +218,8 @@ def _run_steps_inline(state: "State", variant: "Variant", steps: List["Step"]) -
     # normalize once
     norm_steps = [_normalize_step(st) for st in steps]
     for st in norm_steps:
-        s = st.run(s, variant)
+        with span(getattr(st, "name", st.__class__.__name__)):
+            s = st.run(s, variant)
     return s
 
 class _CallableStep:
@@ -61,6 +251,11 @@ def _normalize_step(s: Any):
 
 class Step(Protocol):
     def run(self, state, variant): ...
+    # optional: def run_batch(self, states, variants) -> List[State]  (see _run_step_batch)
+    # optional: offload = False  keep a sync step on the event loop thread in async mode
+    # optional: reads_variant = (...keys)  variant keys run() depends on; () = variant-independent.
+    #           Lets share_prefixes run the step once per group of agreeing variants and
+    #           StepCache key on those keys only (undeclared: tracked / whole variant).
 
 class FnStep:
     def __init__(self, fn: Callable[[Any, Any], Any], name: str | None = None):
@@ -80,4 +275,5 @@ def step(name: str | None = None):
 @dataclass
 class PipelineReport:
     steps: List[Dict[str, Any]]
-    final_state: State
\ No newline at end of file
+    final_state: Optional[State]  # None when dropped by a retain= policy
+    info: Dict[str, Any] = field(default_factory=dict)  # run-level details (worker, timing, ...)
\ No newline at end of file
@@ -1,16 +1,33 @@
 from __future__ import annotations
 from .pipebase import *
-from .pipebase import _normalize_step, _run_step_async
-from itertools import product
+from .pipebase import _normalize_step, _run_step_async, _TrackedVariant, _variants_agree, _STEP_EXECUTOR
+from .pipebase import _has_run_batch, _run_step_batch
+from itertools import islice
 import time, copy
 from .registry import register_step
+from .cow import copy_state, COPY_STRATEGIES
+from .variant_space import VariantSpace
+from .cache import StepCache
+from .plan import CompiledPlan, compile_steps
+from .retention import Retain, apply_retention, check_retain, worker_retain
+from .tracing import span, bind_context, current_tracer
+from .dataflow import DataflowReport, DataflowError, check_dataflow, trust_keys, trusted_scope
 # --- Async helpers and imports ---
 import asyncio, inspect
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import AsyncIterator, Iterator, Tuple
+from contextlib import contextmanager
+from collections.abc import Sequence as SequenceABC
 
 
 class Pipeline:
-    def __init__(self, steps: List[Step]):
+    def __init__(self, steps: List[Step], cache: "Optional[StepCache]" = None):
         self.steps = [_normalize_step(s) for s in steps]
+        self.spec: "Optional[Dict[str, Any]]" = None  # set by pipeline_from_spec
+        self.cache = cache  # opt-in persistent step result cache (see core/cache.py)
+        self.dataflow: "Optional[DataflowReport]" = None  # set by check_dataflow()
+        self._trusted_at: "Tuple[int, ...]" = ()  # positions of steps whose input validation is skipped
+        self._trusted: frozenset = frozenset()    # their trust keys, published while this pipeline runs
 
     # --- batch run over iterable of Variants ---
     def run(
@@ -23,92 +40,900 @@ class Pipeline:
         step_timeout: "Optional[float]" = None,
         overall_timeout: "Optional[float]" = None,
         variant_concurrency: "Optional[int]" = None,
+        share_prefixes: bool = False,
+        copy_strategy: str = "deepcopy",
+        executor: "Optional[str]" = None,
+        max_workers: "Optional[int]" = None,
+        chunksize: int = 1,
+        step_executor: "Union[str, Executor, None]" = "thread",
+        batch_size: "Optional[int]" = None,
+        retain: "Retain" = "all",
     ) -> "List[PipelineReport]":
-        # Normalize Variants to a list
-        if variants is None:
-            Variants_list: "List[Variant]" = [{}]
-        elif isinstance(variants, dict):
-            Variants_list = [variants]
-        else:
-            Variants_list = list(variants)
+        """
+        Run the pipeline once per variant and return one PipelineReport per variant
+        (in input order). See run_iter() for a streaming version.
 
-        defaults = defaults or {}
+        share_prefixes:
+            execute the variant grid as a prefix tree: a step runs once for every
+            group of variants that agree on the variant keys it reads, and state is
+            forked only where variant-dependent steps begin. Keys read by a step come
+            from its `reads_variant` attribute (iterable of keys) or, when absent, are
+            recorded while it runs. Assumes steps are deterministic; step records get
+            an extra "shared" field (number of variants that reused the execution).
+            In async mode overall_timeout then applies to the whole grid and
+            variant_concurrency bounds concurrent step executions.
+        copy_strategy:
+            how each run (and each prefix-tree fork) gets its own State:
+            "deepcopy" (default), "cow" (CowState: structural sharing, mutable
+            values copied on first access) or "shallow" (new dicts, shared values).
+        executor, max_workers, chunksize:
+            sync mode only. executor="process" fans the variants out to a
+            ProcessPoolExecutor in chunks of `chunksize`; every worker rebuilds the
+            pipeline once from `self.spec` (pipelines from pipeline_from_yaml/json/spec)
+            or from pickled steps otherwise, so custom steps must be registered /
+            defined at import time of an importable module. executor="thread" does the
+            same with a ThreadPoolExecutor. Reports come back in input order, with
+            worker details in `report.info` ("worker_pid", "wall_s", "chunk_s").
+        step_executor:
+            async mode only. Where synchronous steps run so they do not block the
+            event loop: "thread" (default; a ThreadPoolExecutor of `max_workers`,
+            falling back to variant_concurrency), "process" (steps, states and
+            variants must be picklable), an Executor instance, or None to call them
+            all inline on the loop. Offloading makes variant_concurrency effective for
+            blocking sync steps and lets step_timeout abandon a slow one. A step that
+            is not thread-safe or must run on the loop thread opts out with
+            `offload = False` (it then runs inline and step_timeout cannot interrupt it).
+        batch_size:
+            sync mode only. When a step defines run_batch(states, variants), variants
+            are processed step-major in batches of `batch_size` (default 64; with an
+            executor each chunk is one batch) and that step is called once per batch;
+            steps without run_batch fall back to per-item run(). Step records of a
+            batched call carry "batch" (batch size) and the per-item share of its time.
 
-        # Synchronous mode (backward compatible)
-        if not async_mode:
-            reports: "List[PipelineReport]" = []
-            for v in Variants_list:
-                variant = {**defaults, **v}  # per-run Variant params
-                report: "List[Dict[str, Any]]" = []
-                st = copy.deepcopy(state or State())  # isolate each run
+        With Pipeline(cache=StepCache(...)) every cacheable step is looked up before
+        it runs and its output stored afterwards; its step record then carries
+        "cache": "hit" or "miss". (Prefix-tree runs, share_prefixes=True, bypass the cache.)
 
-                for step_obj in self.steps:
-                    t0 = time.perf_counter()
-                    ok, err = True, None
-                    try:
+        retain:
+            what each returned report keeps, so large grids do not hold every final
+            State: "all" (default), "summary" (step records only), a list of data
+            keys, a SpillStore (final states appended to disk) or a callable invoked
+            with each full report before its state is dropped. Non-"all" policies
+            also store step records compactly (StepRecord). See core/retention.py.
+        """
+        _check_copy_strategy(copy_strategy)
+        check_retain(retain)
+
+        if share_prefixes:
+            if executor is not None:
+                raise ValueError("executor= is not supported together with share_prefixes")
+            merged = list(_iter_variants(variants, defaults))
+            if not async_mode:
+                reports = self._run_shared(state, merged, copy_strategy)
+            else:
+                reports = asyncio.run(self._run_shared_async(
+                    state, merged, step_timeout, overall_timeout, variant_concurrency, copy_strategy,
+                    step_executor, max_workers,
+                ))
+            return [apply_retention(r, retain) for r in reports]
+
+        return list(self._iter_reports(
+            state, variants, defaults, async_mode, step_timeout, overall_timeout,
+            variant_concurrency, copy_strategy, executor, max_workers, chunksize,
+            step_executor, window=None, ordered=True, batch_size=batch_size, retain=retain,
+        ))
+
+    # --- streaming runs ---
+    def run_iter(
+        self,
+        state: "Optional[State]" = None,
+        *,
+        variants: "Union[Variant, Iterable[Variant], None]" = None,
+        defaults: "Optional[Variant]" = None,
+        async_mode: bool = False,
+        step_timeout: "Optional[float]" = None,
+        overall_timeout: "Optional[float]" = None,
+        variant_concurrency: "Optional[int]" = None,
+        copy_strategy: str = "deepcopy",
+        executor: "Optional[str]" = None,
+        max_workers: "Optional[int]" = None,
+        chunksize: int = 1,
+        step_executor: "Union[str, Executor, None]" = "thread",
+        window: "Optional[int]" = None,
+        ordered: bool = True,
+        batch_size: "Optional[int]" = None,
+        retain: "Retain" = "all",
+    ) -> "Iterator[PipelineReport]":
+        """
+        Like run(), but consumes `variants` lazily and yields each PipelineReport as
+        soon as it is available, so a sweep never holds more than `window` runs
+        (async: variants; executor: chunks) in flight or buffered.
+
+        window:   in-flight bound; defaults to variant_concurrency (async) or
+                  2 * max_workers (executor), else 64.
+        ordered:  yield in input order (default) or, with False, in completion order.
+                  report.info["index"] is the variant's input position either way.
+        Options not listed here behave as in run(); share_prefixes needs the whole
+        grid up front and is therefore only available on run().
+        """
+        _check_copy_strategy(copy_strategy)
+        check_retain(retain)
+        if window is None:
+            window = (variant_concurrency if async_mode else 2 * max_workers if max_workers else None) \
+                or _DEFAULT_WINDOW
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        return self._iter_reports(
+            state, variants, defaults, async_mode, step_timeout, overall_timeout,
+            variant_concurrency, copy_strategy, executor, max_workers, chunksize,
+            step_executor, window=window, ordered=ordered, batch_size=batch_size, retain=retain,
+        )
+
+    async def arun_iter(
+        self,
+        state: "Optional[State]" = None,
+        *,
+        variants: "Union[Variant, Iterable[Variant], None]" = None,
+        defaults: "Optional[Variant]" = None,
+        step_timeout: "Optional[float]" = None,
+        overall_timeout: "Optional[float]" = None,
+        variant_concurrency: "Optional[int]" = None,
+        copy_strategy: str = "deepcopy",
+        max_workers: "Optional[int]" = None,
+        step_executor: "Union[str, Executor, None]" = "thread",
+        window: "Optional[int]" = None,
+        ordered: bool = True,
+        retain: "Retain" = "all",
+    ) -> "AsyncIterator[PipelineReport]":
+        """Async-generator form of run_iter(async_mode=True), for use inside a running event loop."""
+        _check_copy_strategy(copy_strategy)
+        check_retain(retain)
+        if window is None:
+            window = variant_concurrency or _DEFAULT_WINDOW
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        items = ((state, v, {"index": i}) for i, v in enumerate(_iter_variants(variants, defaults)))
+        async for rep in self._aiter_items(
+            items, step_timeout, overall_timeout, variant_concurrency,
+            copy_strategy, step_executor, max_workers, window, ordered,
+        ):
+            yield apply_retention(rep, retain)
+
+    def _iter_reports(
+        self, state, variants, defaults, async_mode, step_timeout, overall_timeout,
+        variant_concurrency, copy_strategy, executor, max_workers, chunksize,
+        step_executor, *, window: "Optional[int]", ordered: bool, batch_size: "Optional[int]" = None,
+        retain: "Retain" = "all",
+    ) -> "Iterator[PipelineReport]":
+        """Work items for one initial state × variants; see _dispatch()."""
+        items = ((state, v, {"index": i}) for i, v in enumerate(_iter_variants(variants, defaults)))
+        return self._dispatch(
+            items, async_mode, step_timeout, overall_timeout, variant_concurrency,
+            copy_strategy, executor, max_workers, chunksize, step_executor,
+            window=window, ordered=ordered, batch_size=batch_size, base_state=state, retain=retain,
+        )
+
+    def _dispatch(
+        self, items, async_mode, step_timeout, overall_timeout, variant_concurrency,
+        copy_strategy, executor, max_workers, chunksize, step_executor, *,
+        window: "Optional[int]", ordered: bool, batch_size: "Optional[int]", base_state: "Optional[State]",
+        retain: "Retain" = "all",
+    ) -> "Iterator[PipelineReport]":
+        """
+        Run work items (state, variant, tag) on the serial / pooled / async runner;
+        `tag` is merged into report.info. window=None means unbounded. base_state is
+        the state shared by all items (shipped once to worker processes), if any.
+        """
+        reports = self._dispatch_raw(
+            items, async_mode, step_timeout, overall_timeout, variant_concurrency,
+            copy_strategy, executor, max_workers, chunksize, step_executor,
+            window=window, ordered=ordered, batch_size=batch_size, base_state=base_state, retain=retain,
+        )
+        return reports if isinstance(retain, str) and retain == "all" else _retained(reports, retain)
+
+    def _dispatch_raw(
+        self, items, async_mode, step_timeout, overall_timeout, variant_concurrency,
+        copy_strategy, executor, max_workers, chunksize, step_executor, *,
+        window, ordered, batch_size, base_state, retain,
+    ) -> "Iterator[PipelineReport]":
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        if executor is not None:
+            if async_mode:
+                raise ValueError("executor= is supported only in sync mode (see step_executor=)")
+            if chunksize < 1:
+                raise ValueError("chunksize must be >= 1")
+            if executor not in ("process", "thread"):
+                raise ValueError(f"Unknown executor {executor!r}; expected 'process' or 'thread'")
+            return self._iter_pooled(
+                items, base_state, executor, max_workers, chunksize, copy_strategy, window, ordered, retain,
+            )
+        if async_mode:
+            return _drive_async_iter(self._aiter_items(
+                items, step_timeout, overall_timeout, variant_concurrency,
+                copy_strategy, step_executor, max_workers, window, ordered,
+            ))
+        return self._iter_serial(items, copy_strategy, batch_size)
+
+    def _iter_serial(self, items, copy_strategy, batch_size=None) -> "Iterator[PipelineReport]":
+        if not self.batched:
+            for st, variant, tag in items:
+                rep = self._run_variant(st, variant, copy_strategy)
+                rep.info.update(tag)
+                yield rep
+            return
+        for chunk in _chunked(items, batch_size or _DEFAULT_BATCH):
+            reports = self._run_batch([(st, v) for st, v, _ in chunk], copy_strategy)
+            for rep, (_, _, tag) in zip(reports, chunk):
+                rep.info.update(tag)
+                yield rep
+
+    # --- corpus mode ---
+    def run_many(
+        self,
+        states: "Iterable[State]",
+        *,
+        variants: "Union[Variant, Iterable[Variant], None]" = None,
+        defaults: "Optional[Variant]" = None,
+        async_mode: bool = False,
+        step_timeout: "Optional[float]" = None,
+        overall_timeout: "Optional[float]" = None,
+        variant_concurrency: "Optional[int]" = None,
+        copy_strategy: str = "deepcopy",
+        executor: "Optional[str]" = None,
+        max_workers: "Optional[int]" = None,
+        chunksize: int = 1,
+        step_executor: "Union[str, Executor, None]" = "thread",
+        window: "Optional[int]" = None,
+        ordered: bool = True,
+        batch_size: "Optional[int]" = None,
+        retain: "Retain" = "all",
+    ) -> "Iterator[PipelineReport]":
+        """
+        Corpus mode: push every State of `states` (consumed lazily) through the
+        pipeline once per variant and yield one PipelineReport per (document, variant);
+        report.info["doc"] / ["index"] are the document and variant positions.
+
+        Input states are handed over to the run: with a single variant (the default)
+        each document's State is processed in place, without any copy; with several
+        variants the extra runs get copies made with copy_strategy ("cow" forks all of
+        them and leaves the input untouched). Parallelism, window and ordering work as
+        in run_iter(), so memory stays bounded by the in-flight window.
+        """
+        _check_copy_strategy(copy_strategy)
+        check_retain(retain)
+        if window is None:
+            window = (variant_concurrency if async_mode else 2 * max_workers if max_workers else None) \
+                or _DEFAULT_WINDOW
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        items = _corpus_items(states, variants, defaults, copy_strategy)
+        return self._dispatch(
+            items, async_mode, step_timeout, overall_timeout, variant_concurrency,
+            "none", executor, max_workers, chunksize, step_executor,
+            window=window, ordered=ordered, batch_size=batch_size, base_state=None, retain=retain,
+        )
+
+    @property
+    def batched(self) -> bool:
+        """True if any step implements run_batch (sync runs then go step-major per batch)."""
+        return any(_has_run_batch(s) for s in self.steps)
+
+    # --- build-time checks ---
+    def check_dataflow(
+        self, provided: "Optional[Any]" = None, *, trust: bool = False, raise_on_error: bool = False,
+    ) -> "DataflowReport":
+        """
+        Check once that every declared step input (validate_io models) is produced
+        upstream with a compatible type; see core/dataflow.py. With trust=True,
+        steps whose inputs are proven skip their runtime input validation when run
+        by this pipeline (or a plan compiled from it after the check).
+        """
+        report = check_dataflow(self.steps, provided)
+        if raise_on_error and report.errors:
+            raise DataflowError("Pipeline dataflow check failed:\n  " + "\n  ".join(report.errors))
+        self.dataflow = report
+        self._trust(report.trusted_at if trust else ())
+        return report
+
+    def _trust(self, positions: "Iterable[int]") -> None:
+        # trust lives on the pipeline, not on the step objects: the same step in
+        # another pipeline (or at an unproven position of this one) still validates
+        self._trusted_at = tuple(positions)
+        self._trusted = trust_keys(self.steps, self._trusted_at)
+
+    # --- compiled plan ---
+    def compile(self, instrument: str = "steps") -> "CompiledPlan":
+        """
+        Frozen execution plan for repeated single runs: step names and sync/async
+        nature resolved once, consecutive sync steps grouped into segments, and
+        instrumentation ("steps" | "segments" | "off") chosen here. See core/plan.py.
+        """
+        return compile_steps(self.steps, instrument, self._trusted)
+
+    # --- step result cache ---
+    def _cache_lookup(self, step_obj: Any, st: "State", variant: "Variant") -> "Tuple[Optional[str], Optional[State]]":
+        """(key, cached output state) for one step execution; (None, None) when caching does not apply."""
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(step_obj, st, variant)
+        return key, (self.cache.get(key, st) if key is not None else None)
+
+    def _cache_store(self, key: "Optional[str]", st: "State", step_obj: Any = None) -> None:
+        if key is not None and self.cache is not None:
+            self.cache.put(key, st, step_obj)
+
+    # --- single-variant runners ---
+    def _run_variant(self, state: "Optional[State]", variant: "Variant", copy_strategy: str = "deepcopy") -> "PipelineReport":
+        """Synchronous mode (backward compatible): all steps for one (defaults-merged) variant."""
+        report: "List[Dict[str, Any]]" = []
+        st = copy_state(state, copy_strategy)  # isolate each run
+
+        with span("variant", "variant"), trusted_scope(self._trusted):
+            return self._run_steps(st, variant, report)
+
+    def _run_steps(self, st: "State", variant: "Variant", report: "List[Dict[str, Any]]") -> "PipelineReport":
+        traced = current_tracer() is not None  # resolved once: no per-step cost when tracing is off
+        for step_obj in self.steps:
+            t0 = time.perf_counter()
+            ok, err = True, None
+            key, cached = self._cache_lookup(step_obj, st, variant)
+            try:
+                if cached is not None:
+                    st = cached
+                else:
+                    if traced:
+                        with span(getattr(step_obj, "name", step_obj.__class__.__name__)):
+                            res = step_obj.run(st, variant)
+                    else:
                         res = step_obj.run(st, variant)
-                        # Guard: do not allow awaitables in sync mode
-                        if inspect.isawaitable(res):
-                            raise RuntimeError(
-                                f"Step '{getattr(step_obj, 'name', step_obj.__class__.__name__)}' returned awaitable in sync mode. Set async_mode=True."
-                            )
-                        st = res
-                    except Exception as e:
-                        ok, err = False, repr(e)
-                        raise
-                    finally:
-                        report.append({
-                            "name": getattr(step_obj, "name", step_obj.__class__.__name__),
-                            "ok": ok,
-                            "error": err,
-                            "duration_s": round(time.perf_counter() - t0, 6),
-                        })
-                reports.append(PipelineReport(report, st))
+                    # Guard: do not allow awaitables in sync mode
+                    if inspect.isawaitable(res):
+                        raise RuntimeError(
+                            f"Step '{getattr(step_obj, 'name', step_obj.__class__.__name__)}' returned awaitable in sync mode. Set async_mode=True."
+                        )
+                    st = res
+                    self._cache_store(key, st, step_obj)
+            except Exception as e:
+                ok, err = False, repr(e)
+                raise
+            finally:
+                report.append(_cache_mark({
+                    "name": getattr(step_obj, "name", step_obj.__class__.__name__),
+                    "ok": ok,
+                    "error": err,
+                    "duration_s": round(time.perf_counter() - t0, 6),
+                }, key, cached))
+        return PipelineReport(report, st)
+
+    def _run_batch(self, pairs: "List[Tuple[Optional[State], Variant]]", copy_strategy: str = "deepcopy") -> "List[PipelineReport]":
+        """Sync, step-major over (state, variant) pairs: every step sees the whole batch (run_batch once, or run() per item)."""
+        n = len(pairs)
+        states = [copy_state(st, copy_strategy) for st, _ in pairs]
+        variants = [v for _, v in pairs]
+        with span("batch", "variant", size=n), trusted_scope(self._trusted):
+            return self._run_steps_batched(states, variants)
+
+    def _run_steps_batched(self, states: "List[State]", variants: "List[Variant]",
+                           records: "Optional[List[List[Dict[str, Any]]]]" = None) -> "List[PipelineReport]":
+        n = len(states)
+        if records is None:
+            records = [[] for _ in states]
+        for step_obj in self.steps:
+            name = getattr(step_obj, "name", step_obj.__class__.__name__)
+            if _has_run_batch(step_obj):
+                t0 = time.perf_counter()
+                ok, err = True, None
+                lookups = [self._cache_lookup(step_obj, states[k], variants[k]) for k in range(n)]
+                todo = [k for k in range(n) if lookups[k][1] is None]
+                try:
+                    for k in range(n):
+                        if lookups[k][1] is not None:
+                            states[k] = lookups[k][1]
+                    if todo:
+                        out = _run_step_batch(step_obj, [states[k] for k in todo], [variants[k] for k in todo])
+                        for k, st in zip(todo, out):
+                            states[k] = st
+                            self._cache_store(lookups[k][0], st, step_obj)
+                except Exception as e:
+                    ok, err = False, repr(e)  # the whole batch call failed: every item it ran gets the error
+                    raise
+                finally:
+                    share = round((time.perf_counter() - t0) / max(n, 1), 6)
+                    failed = set() if ok else set(todo)
+                    for k, rec in enumerate(records):
+                        rec.append(_cache_mark({
+                            "name": name,
+                            "ok": k not in failed,
+                            "error": err if k in failed else None,
+                            "duration_s": share,
+                            "batch": len(todo),
+                        }, *lookups[k]))
+                continue
+            for k in range(n):
+                t0 = time.perf_counter()
+                ok, err = True, None
+                key, cached = self._cache_lookup(step_obj, states[k], variants[k])
+                try:
+                    if cached is not None:
+                        states[k] = cached
+                    else:
+                        states[k] = _run_step_batch(step_obj, [states[k]], [variants[k]])[0]
+                        self._cache_store(key, states[k], step_obj)
+                except Exception as e:
+                    ok, err = False, repr(e)
+                    raise
+                finally:
+                    records[k].append(_cache_mark({
+                        "name": name,
+                        "ok": ok,
+                        "error": err,
+                        "duration_s": round(time.perf_counter() - t0, 6),
+                    }, key, cached))
+        return [PipelineReport(records[k], states[k]) for k in range(n)]
+
+    def _run_chunk(self, pairs: "List[Tuple[Optional[State], Variant]]", copy_strategy: str = "deepcopy") -> "List[PipelineReport]":
+        """One executor chunk of (state, variant) pairs: a single batch if the pipeline is batched, else one by one."""
+        t0 = time.perf_counter()
+        if self.batched:
+            reports = self._run_batch(pairs, copy_strategy)
+            wall = round((time.perf_counter() - t0) / max(len(pairs), 1), 6)
+            for rep in reports:
+                rep.info["wall_s"] = wall
             return reports
+        reports = []
+        for st, v in pairs:
+            rep = self._run_variant(st, v, copy_strategy)
+            rep.info["wall_s"] = round(time.perf_counter() - t0, 6)
+            reports.append(rep)
+            t0 = time.perf_counter()
+        return reports
 
-        # Async mode: run steps with await/timeout; optionally parallelize variants
-        async def _run_one_variant(v: "Variant") -> "PipelineReport":
-            variant = {**defaults, **v}
-            report: "List[Dict[str, Any]]" = []
-            st = copy.deepcopy(state or State())
-
-            async def _execute_all():
-                nonlocal st
-                for step_obj in self.steps:
-                    t0 = time.perf_counter()
-                    ok, err = True, None
-                    try:
+    async def _arun_variant(
+        self,
+        state: "Optional[State]",
+        variant: "Variant",
+        step_timeout: "Optional[float]",
+        overall_timeout: "Optional[float]",
+        copy_strategy: str,
+        executor: "Optional[Executor]",
+    ) -> "PipelineReport":
+        """Async mode: run steps with await/timeout for one (defaults-merged) variant."""
+        _STEP_EXECUTOR.set(executor)  # task-local: each variant runs in its own task
+        report: "List[Dict[str, Any]]" = []
+        st = copy_state(state, copy_strategy)
+
+        async def _execute_all():
+            nonlocal st
+            for step_obj in self.steps:
+                t0 = time.perf_counter()
+                ok, err = True, None
+                key, cached = self._cache_lookup(step_obj, st, variant)
+                try:
+                    if cached is not None:
+                        st = cached
+                    else:
                         st = await _run_step_async(step_obj, st, variant, step_timeout)
-                    except Exception as e:
-                        ok, err = False, repr(e)
-                        raise
-                    finally:
-                        report.append({
-                            "name": getattr(step_obj, "name", step_obj.__class__.__name__),
-                            "ok": ok,
-                            "error": err,
-                            "duration_s": round(time.perf_counter() - t0, 6),
-                        })
+                        self._cache_store(key, st, step_obj)
+                except Exception as e:
+                    ok, err = False, repr(e)
+                    raise
+                finally:
+                    report.append(_cache_mark({
+                        "name": getattr(step_obj, "name", step_obj.__class__.__name__),
+                        "ok": ok,
+                        "error": err,
+                        "duration_s": round(time.perf_counter() - t0, 6),
+                    }, key, cached))
 
+        with span("variant", "variant"), trusted_scope(self._trusted):
             if overall_timeout is not None:
                 await asyncio.wait_for(_execute_all(), timeout=overall_timeout)
             else:
                 await _execute_all()
 
-            return PipelineReport(report, st)
+        return PipelineReport(report, st)
 
+    # --- async streaming (bounded window of variant tasks) ---
+    async def _aiter_items(
+        self, items, step_timeout, overall_timeout, variant_concurrency,
+        copy_strategy, step_executor, max_workers, window: "Optional[int]", ordered: bool,
+    ) -> "AsyncIterator[PipelineReport]":
+        executor, owned = _open_step_executor(step_executor, max_workers or variant_concurrency)
         sem = asyncio.Semaphore(variant_concurrency) if variant_concurrency else None
 
-        async def _run_all_async():
-            async def _guard(v: "Variant") -> "PipelineReport":
+        async def _guard(st: "Optional[State]", v: "Variant", tag: "Dict[str, Any]") -> "PipelineReport":
+            if sem:
+                async with sem:
+                    rep = await self._arun_variant(st, v, step_timeout, overall_timeout, copy_strategy, executor)
+            else:
+                rep = await self._arun_variant(st, v, step_timeout, overall_timeout, copy_strategy, executor)
+            rep.info.update(tag)
+            return rep
+
+        source = enumerate(items)
+        pending: "Dict[asyncio.Future, int]" = {}
+        ready: "Dict[int, PipelineReport]" = {}  # finished but not yet yielded (ordered mode)
+        next_out, exhausted = 0, False
+        try:
+            while True:
+                while not exhausted and (window is None or len(pending) + len(ready) < window):
+                    try:
+                        i, (st, v, tag) = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[asyncio.ensure_future(_guard(st, v, tag))] = i
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in sorted(done, key=pending.__getitem__):
+                    i = pending.pop(fut)
+                    rep = fut.result()
+                    if not ordered:
+                        yield rep
+                    else:
+                        ready[i] = rep
+                while next_out in ready:
+                    yield ready.pop(next_out)
+                    next_out += 1
+        finally:
+            for fut in pending:
+                fut.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            _close_step_executor(owned)
+
+    # --- pooled execution (executor="process" / "thread") ---
+    def _iter_pooled(
+        self,
+        items: "Iterator[Tuple[Optional[State], Variant, Dict[str, Any]]]",
+        base_state: "Optional[State]",
+        executor: str,
+        max_workers: "Optional[int]",
+        chunksize: int,
+        copy_strategy: str,
+        window: "Optional[int]",
+        ordered: bool,
+        retain: "Retain" = "all",
+    ) -> "Iterator[PipelineReport]":
+        from . import parallel
+
+        run_kwargs = {"copy_strategy": copy_strategy}
+        tracer = current_tracer()
+        if executor == "process":
+            pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=parallel._init_worker,
+                initargs=(
+                    parallel.pipeline_payload(self), base_state, run_kwargs, self.cache,
+                    worker_retain(retain), tracer is not None,
+                ),
+            )
+
+            def submit(chunk):
+                # the shared initial state already lives in every worker; ship only per-item states
+                payload = [(None if st is base_state else st, v) for st, v, _ in chunk]
+                return pool.submit(parallel._run_chunk, payload)
+        else:
+            pool = ThreadPoolExecutor(max_workers=max_workers)
+
+            def submit(chunk):
+                return pool.submit(bind_context(self._run_chunk), [(st, v) for st, v, _ in chunk], copy_strategy)
+
+        source = enumerate(_chunked(items, chunksize))
+        pending: "Dict[Any, Tuple[int, List[Dict[str, Any]]]]" = {}  # future -> (chunk no, tags)
+        ready: "Dict[int, List[PipelineReport]]" = {}
+        next_out, exhausted = 0, False
+        try:
+            while True:
+                while not exhausted and (window is None or len(pending) + len(ready) < window):
+                    try:
+                        n, chunk = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[submit(chunk)] = (n, [tag for _, _, tag in chunk])
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in sorted(done, key=lambda f: pending[f][0]):
+                    n, tags = pending.pop(fut)
+                    reports = fut.result()
+                    for rep, tag in zip(reports, tags):
+                        rep.info.update(tag)
+                        events = rep.info.pop("trace", None)  # spans recorded in a worker process
+                        if events and tracer is not None:
+                            tracer.merge(events)
+                    if not ordered:
+                        yield from reports
+                    else:
+                        ready[n] = reports
+                while next_out in ready:
+                    yield from ready.pop(next_out)
+                    next_out += 1
+        finally:
+            for fut in pending:
+                fut.cancel()
+            pool.shutdown(wait=True)
+
+    # --- prefix-tree execution (share_prefixes=True) ---
+    def _step_groups(self, step_obj: Any, members: "List[int]", variants: "List[Variant]") -> "Optional[List[List[int]]]":
+        """Groups of members that agree on the step's declared `reads_variant` keys (None if undeclared)."""
+        keys = getattr(step_obj, "reads_variant", None)
+        if keys is None:
+            return None
+        return self._partition(members, tuple(keys), variants)
+
+    @staticmethod
+    def _partition(members: "List[int]", keys: "Iterable[Any]", variants: "List[Variant]") -> "List[List[int]]":
+        """Groups of members whose variants agree on `keys` (first-seen order)."""
+        groups: "List[List[int]]" = []
+        for m in members:
+            for g in groups:
+                if _variants_agree(variants[g[0]], variants[m], keys):
+                    g.append(m)
+                    break
+            else:
+                groups.append([m])
+        return groups
+
+    @staticmethod
+    def _claim(pending: "List[int]", rep: int, read: "Optional[set]", variants: "List[Variant]"):
+        """Split pending members into those that can reuse rep's execution and the rest."""
+        if read is None:
+            return [rep], [m for m in pending if m != rep]
+        same, rest = [], []
+        for m in pending:
+            (same if _variants_agree(variants[rep], variants[m], read) else rest).append(m)
+        return same, rest
+
+    @staticmethod
+    def _finish(st: "State", members: "List[int]", finals: "List[Optional[State]]", copy_strategy: str) -> None:
+        finals[members[0]] = st
+        for m in members[1:]:
+            finals[m] = copy_state(st, copy_strategy)
+
+    def _run_shared(self, state: "Optional[State]", variants: "List[Variant]", copy_strategy: str = "deepcopy") -> "List[PipelineReport]":
+        records: "List[List[Dict[str, Any]]]" = [[] for _ in variants]
+        finals: "List[Optional[State]]" = [None] * len(variants)
+
+        def _exec(step_obj, st, variant, members):
+            t0 = time.perf_counter()
+            name = getattr(step_obj, "name", step_obj.__class__.__name__)
+            try:
+                with span(name, shared=True):
+                    res = step_obj.run(st, variant)
+                if inspect.isawaitable(res):
+                    raise RuntimeError(f"Step '{name}' returned awaitable in sync mode. Set async_mode=True.")
+            except Exception as e:
+                # every variant that would have shared this execution gets the failure record
+                _record(members, {"name": name, "ok": False, "error": repr(e),
+                                  "duration_s": round(time.perf_counter() - t0, 6)})
+                raise
+            return res, {"name": name, "ok": True, "error": None, "duration_s": round(time.perf_counter() - t0, 6)}
+
+        def _record(members, entry):
+            for m in members:
+                records[m].append({**entry, "shared": len(members)})
+
+        def _node(st: "State", members: "List[int]", i: int) -> None:
+            if i == len(self.steps):
+                self._finish(st, members, finals, copy_strategy)
+                return
+            step_obj = self.steps[i]
+            groups = self._step_groups(step_obj, members, variants)
+            if groups is not None:
+                for gi, g in enumerate(groups):
+                    src = st if gi == len(groups) - 1 else copy_state(st, copy_strategy)
+                    out, entry = _exec(step_obj, src, variants[g[0]], g)
+                    _record(g, entry)
+                    _node(out, g, i + 1)
+                return
+            # undeclared reads: run on a representative and record what it reads
+            pending = list(members)
+            while pending:
+                rep = pending[0]
+                src = st if len(pending) == 1 else copy_state(st, copy_strategy)
+                tracked = _TrackedVariant(variants[rep])
+                out, entry = _exec(step_obj, src, tracked, pending)
+                same, pending = self._claim(pending, rep, tracked.read_keys, variants)
+                _record(same, entry)
+                _node(out, same, i + 1)
+
+        if variants:
+            with trusted_scope(self._trusted):
+                _node(copy_state(state, copy_strategy), list(range(len(variants))), 0)
+        return [PipelineReport(records[i], finals[i]) for i in range(len(variants))]
+
+    async def _run_shared_async(
+        self,
+        state: "Optional[State]",
+        variants: "List[Variant]",
+        step_timeout: "Optional[float]",
+        overall_timeout: "Optional[float]",
+        variant_concurrency: "Optional[int]",
+        copy_strategy: str = "deepcopy",
+        step_executor: "Union[str, Executor, None]" = "thread",
+        max_workers: "Optional[int]" = None,
+    ) -> "List[PipelineReport]":
+        records: "List[List[Dict[str, Any]]]" = [[] for _ in variants]
+        finals: "List[Optional[State]]" = [None] * len(variants)
+        sem = asyncio.Semaphore(variant_concurrency) if variant_concurrency else None
+
+        async def _exec(step_obj, st, variant, members):
+            t0 = time.perf_counter()
+            name = getattr(step_obj, "name", step_obj.__class__.__name__)
+            try:
                 if sem:
                     async with sem:
-                        return await _run_one_variant(v)
-                return await _run_one_variant(v)
-            tasks = [asyncio.create_task(_guard(v)) for v in Variants_list]
-            return await asyncio.gather(*tasks)
+                        out = await _run_step_async(step_obj, st, variant, step_timeout)
+                else:
+                    out = await _run_step_async(step_obj, st, variant, step_timeout)
+            except Exception as e:
+                _record(members, {"name": name, "ok": False, "error": repr(e),
+                                  "duration_s": round(time.perf_counter() - t0, 6)})
+                raise
+            return out, {"name": name, "ok": True, "error": None, "duration_s": round(time.perf_counter() - t0, 6)}
+
+        def _record(members, entry):
+            for m in members:
+                records[m].append({**entry, "shared": len(members)})
+
+        async def _node(st: "State", members: "List[int]", i: int) -> None:
+            if i == len(self.steps):
+                self._finish(st, members, finals, copy_strategy)
+                return
+            step_obj = self.steps[i]
+            groups = self._step_groups(step_obj, members, variants)
+            if groups is not None:
+                srcs = [st if gi == len(groups) - 1 else copy_state(st, copy_strategy) for gi in range(len(groups))]
 
-        return asyncio.run(_run_all_async())
+                async def _branch(g, src):
+                    out, entry = await _exec(step_obj, src, variants[g[0]], g)
+                    _record(g, entry)
+                    await _node(out, g, i + 1)
+
+                await asyncio.gather(*(_branch(g, src) for g, src in zip(groups, srcs)))
+                return
+            # undeclared reads: one representative first; once its reads are known, the
+            # members it could not cover are split on those keys and probed concurrently
+            children = []
+
+            async def _probe(part, src):
+                rep = part[0]
+                tracked = _TrackedVariant(variants[rep])
+                out, entry = await _exec(step_obj, src, tracked, part)
+                same, rest = self._claim(part, rep, tracked.read_keys, variants)
+                _record(same, entry)
+                children.append(asyncio.ensure_future(_node(out, same, i + 1)))
+                return rest, tracked.read_keys
+
+            parts = [list(members)]
+            while parts:
+                last = len(parts) == 1 and len(parts[0]) == 1
+                done = await asyncio.gather(*(
+                    _probe(p, st if last else copy_state(st, copy_strategy)) for p in parts
+                ))
+                rest = [m for r, _ in done for m in r]
+                reads = [k for _, k in done]
+                if any(k is None for k in reads):
+                    parts = [[m] for m in rest]
+                else:
+                    parts = self._partition(rest, set().union(*reads), variants)
+            await asyncio.gather(*children)
+
+        if variants:
+            with _step_executor_scope(step_executor, max_workers or variant_concurrency), \
+                    trusted_scope(self._trusted):
+                root = _node(copy_state(state, copy_strategy), list(range(len(variants))), 0)
+                if overall_timeout is not None:
+                    await asyncio.wait_for(root, timeout=overall_timeout)
+                else:
+                    await root
+        return [PipelineReport(records[i], finals[i]) for i in range(len(variants))]
+
+_DEFAULT_WINDOW = 64
+_DEFAULT_BATCH = 64
+
+def _check_copy_strategy(copy_strategy: str) -> None:
+    if copy_strategy not in COPY_STRATEGIES:
+        raise ValueError(f"Unknown copy_strategy {copy_strategy!r}; expected one of {COPY_STRATEGIES}")
+
+def _iter_variants(variants: "Union[Variant, Iterable[Variant], None]", defaults: "Optional[Variant]") -> "Iterator[Variant]":
+    """Lazily normalize `variants` (None / one dict / iterable) and merge defaults into each."""
+    defaults = defaults or {}
+    if variants is None:
+        variants = [{}]
+    elif isinstance(variants, dict):
+        variants = [variants]
+    for v in variants:
+        yield {**defaults, **v}  # per-run Variant params
+
+def _retained(reports: "Iterator[PipelineReport]", retain: "Retain") -> "Iterator[PipelineReport]":
+    try:
+        for rep in reports:
+            yield apply_retention(rep, retain)
+    finally:
+        reports.close()  # stop the runner (cancel in-flight work) when the consumer stops early
+
+def _cache_mark(record: "Dict[str, Any]", key: "Optional[str]", cached: "Optional[State]") -> "Dict[str, Any]":
+    if key is not None:
+        record["cache"] = "miss" if cached is None else "hit"
+    return record
+
+def _corpus_items(
+    states: "Iterable[State]",
+    variants: "Union[Variant, Iterable[Variant], None]",
+    defaults: "Optional[Variant]",
+    copy_strategy: str,
+) -> "Iterator[Tuple[State, Variant, Dict[str, Any]]]":
+    """(state, variant, tag) work items for run_many: every document × every variant."""
+    if isinstance(variants, SequenceABC) and not isinstance(variants, (str, bytes)):
+        vseq = variants  # e.g. a VariantSpace: re-indexed per document, never materialised
+    else:
+        vseq = list(_iter_variants(variants, None))
+    defaults = defaults or {}
+    n = len(vseq)
+    for d, st in enumerate(states):
+        for j in range(n):
+            v = {**defaults, **vseq[j]}
+            # last run takes the document itself, unless copies must stay COW-safe
+            in_place = j == n - 1 and copy_strategy != "cow"
+            yield (st if in_place else copy_state(st, copy_strategy)), v, {"doc": d, "index": j}
+
+def _chunked(it: "Iterable[Any]", size: int) -> "Iterator[List[Any]]":
+    it = iter(it)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _drive_async_iter(agen: "AsyncIterator[Any]") -> "Iterator[Any]":
+    """Consume an async generator from sync code on a private event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                item = loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+            yield item
+    finally:
+        try:
+            loop.run_until_complete(agen.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+def _open_step_executor(step_executor: "Union[str, Executor, None]", max_workers: "Optional[int]"):
+    """Resolve step_executor to (executor, owned); `owned` is a pool created here (or None)."""
+    if step_executor is None or isinstance(step_executor, Executor):
+        return step_executor, None
+    if step_executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ragfine-step")
+    elif step_executor == "process":
+        pool = ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        raise ValueError(f"Unknown step_executor {step_executor!r}; expected 'thread', 'process', an Executor or None")
+    return pool, pool
+
+def _close_step_executor(owned: "Optional[Executor]") -> None:
+    if owned is not None:
+        # don't wait for steps abandoned by step_timeout
+        owned.shutdown(wait=False, cancel_futures=True)
+
+@contextmanager
+def _step_executor_scope(step_executor: "Union[str, Executor, None]", max_workers: "Optional[int]"):
+    """Make `step_executor` current for _run_step_async; pools created here are shut down on exit."""
+    executor, owned = _open_step_executor(step_executor, max_workers)
+    token = _STEP_EXECUTOR.set(executor)
+    try:
+        yield executor
+    finally:
+        _STEP_EXECUTOR.reset(token)
+        _close_step_executor(owned)
 
 def _is_expandable(value: Any) -> bool:
     """Traktuj jako rozwijalne, jeśli to iterowalne i nie jest str/bytes/dict."""
@@ -125,9 +950,9 @@ def combine(
     defaults: Dict[str, Any] | None = None,
     *,
     mode: str = "cartesian"
-) -> List[Variant]:
+) -> VariantSpace:
     """
-    Rozwija słownik parametrów w listę słowników wariantów.
+    Rozwija słownik parametrów w (leniwą) sekwencję słowników wariantów.
 
     mode:
         - "cartesian" (domyślnie): iloczyn kartezjański po wszystkich iterowalnych wartościach.
@@ -136,10 +961,15 @@ def combine(
     Wartości nieiterowalne traktowane są jako stałe.
     Parametr `defaults` (opcjonalny) zostanie dołączony do każdego wariantu.
 
+    Zwraca VariantSpace: siatka nie jest materializowana — można ją iterować,
+    indeksować (space[i]), ciąć (space[a:b]), dzielić na shardy (space.shard(i, n))
+    i próbkować (space.sample(n, "random" | "lhs" | "sobol", seed=...)).
+    list(combine(...)) daje dawną listę słowników.
+
     Przykład:
         params = {"style": ["A", "B"], "answer": ["Yes", "No"], "meta": True}
         defaults = {"lang": "en"}
-        combine(params, defaults)
+        list(combine(params, defaults))
         -> [
             {'style': 'A', 'answer': 'Yes', 'meta': True, 'lang': 'en'},
             {'style': 'A', 'answer': 'No',  'meta': True, 'lang': 'en'},
@@ -147,33 +977,14 @@ def combine(
             {'style': 'B', 'answer': 'No',  'meta': True, 'lang': 'en'}
         ]
     """
-    defaults = defaults or {}
-
     # Podział na klucze rozwijalne (listy/iterowalne) i stałe
-    expand_keys = []
-    expand_values = []
+    axes: Dict[str, Any] = {}
     fixed_items = {}
 
     for k, v in params.items():
         if _is_expandable(v):
-            expand_keys.append(k)
-            expand_values.append(list(v))  # materializacja generatorów/range
+            axes[k] = v  # generatory są materializowane w VariantSpace, range/listy nie
         else:
             fixed_items[k] = v
 
-    # Jeśli nie ma czego rozwijać → zwróć pojedynczą kombinację (defaults + params)
-    if not expand_keys:
-        merged = dict(defaults)
-        merged.update(params)
-        return [merged]
-
-    # Iloczyn kartezjański po wartościach kluczy rozwijalnych
-    combos: List[Variant] = []
-    for combo in product(*expand_values):
-        c = dict(defaults)         # defaults na start
-        c.update(fixed_items)      # stałe parametry
-        c.update(zip(expand_keys, combo))  # rozwinięte wartości
-        combos.append(c)
-    return combos
-
-
+    return VariantSpace(axes, fixed_items, defaults, mode=mode)
@@ -0,0 +1,182 @@
+"""
+Pre-resolved execution plans (Pipeline.compile()).
+
+A plan resolves step names and sync/async nature once, groups each run of
+consecutive synchronous steps into one segment (a loop over their run methods,
+each result still checked for an awaitable), and picks the instrumentation
+level up front, so plan.run(state, variant) pays no per-step getattr / cache /
+report bookkeeping unless asked to. Steps are not fused into one function.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio, inspect, time
+
+from .pipebase import State, Variant, PipelineReport, _is_async_step
+from .dataflow import trusted_scope
+
+INSTRUMENT_LEVELS = ("steps", "segments", "off")
+
+
+def _awaitable_error(name: str) -> RuntimeError:
+    return RuntimeError(f"Step '{name}' returned awaitable in sync mode. Set async_mode=True.")
+
+
+def _chain(names: Tuple[str, ...], runs: Tuple[Callable[..., Any], ...]) -> Callable[[Any, Any], Any]:
+    """One callable running the given run(state, variant) callables back to back."""
+    steps = tuple(zip(names, runs))
+
+    def _segment(s, v):
+        for name, fn in steps:
+            s = fn(s, v)
+            if inspect.isawaitable(s):
+                raise _awaitable_error(name)
+        return s
+    return _segment
+
+
+@dataclass(frozen=True)
+class Segment:
+    names: Tuple[str, ...]
+    runs: Tuple[Callable[..., Any], ...]  # bound step.run callables
+    is_async: bool                         # async segments hold exactly one step
+    call: Callable[[Any, Any], Any]        # the whole segment as one run(state, variant)
+
+    @property
+    def name(self) -> str:
+        return "+".join(self.names)
+
+
+@dataclass(frozen=True)
+class CompiledPlan:
+    """
+    Frozen plan of a Pipeline.
+
+    instrument:
+        - "steps":    one record per step (name, ok, error, duration_s), as Pipeline.run
+        - "segments": one record per segment ("name" joins step names with '+',
+                      "steps" gives their count)
+        - "off":      no records (report.steps == [])
+    A failing step (or segment) still gets its record, with ok=False and error,
+    before the exception propagates. Steps count as async only when their run is a
+    coroutine function; a synchronous run returning an awaitable raises RuntimeError.
+    The plan runs steps on the state it is given (no copy; use copy_state() first
+    if the input must survive) and bypasses Pipeline(cache=...).
+    """
+    segments: Tuple[Segment, ...]
+    instrument: str = "steps"
+    trusted: frozenset = frozenset()  # dataflow trust keys of the compiled pipeline
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(n for seg in self.segments for n in seg.names)
+
+    @property
+    def is_async(self) -> bool:
+        return any(seg.is_async for seg in self.segments)
+
+    # --- sync entry point ---
+    def run(self, state: Optional[State] = None, variant: Optional[Variant] = None) -> PipelineReport:
+        if self.is_async:
+            return asyncio.run(self.arun(state, variant))
+        if self.trusted:
+            with trusted_scope(self.trusted):
+                return self._run(state, variant)
+        return self._run(state, variant)
+
+    def _run(self, state: Optional[State], variant: Optional[Variant]) -> PipelineReport:
+        st = state if state is not None else State()
+        v = variant if variant is not None else {}
+        if self.instrument == "off":
+            for seg in self.segments:
+                st = seg.call(st, v)
+            return PipelineReport([], st)
+        records: List[Dict[str, Any]] = []
+        if self.instrument == "segments":
+            for seg in self.segments:
+                st = _timed(records, seg.name, seg.call, st, v, len(seg.runs))
+            return PipelineReport(records, st)
+        for seg in self.segments:
+            for name, fn in zip(seg.names, seg.runs):
+                st = _timed(records, name, fn, st, v)
+        return PipelineReport(records, st)
+
+    # --- async entry point (sync segments run inline on the loop) ---
+    async def arun(self, state: Optional[State] = None, variant: Optional[Variant] = None) -> PipelineReport:
+        if self.trusted:
+            with trusted_scope(self.trusted):
+                return await self._arun(state, variant)
+        return await self._arun(state, variant)
+
+    async def _arun(self, state: Optional[State], variant: Optional[Variant]) -> PipelineReport:
+        st = state if state is not None else State()
+        v = variant if variant is not None else {}
+        records: List[Dict[str, Any]] = []
+        clock = time.perf_counter
+        for seg in self.segments:
+            if self.instrument == "steps" and not seg.is_async:
+                for name, fn in zip(seg.names, seg.runs):
+                    st = _timed(records, name, fn, st, v)
+                continue
+            if not seg.is_async:
+                st = seg.call(st, v) if self.instrument == "off" else \
+                    _timed(records, seg.name, seg.call, st, v, len(seg.runs))
+                continue
+            t0 = clock()
+            ok, err = True, None
+            try:
+                st = await seg.call(st, v)
+            except Exception as e:
+                ok, err = False, repr(e)
+                raise
+            finally:
+                if self.instrument != "off":
+                    rec = {"name": seg.name, "ok": ok, "error": err, "duration_s": round(clock() - t0, 6)}
+                    if self.instrument == "segments":
+                        rec["steps"] = 1
+                    records.append(rec)
+        return PipelineReport(records, st)
+
+
+def _timed(records: List[Dict[str, Any]], name: str, fn: Callable[..., Any], st: Any, v: Any,
+           steps: Optional[int] = None) -> Any:
+    """Run one sync step/segment, appending its record (also on failure)."""
+    t0 = time.perf_counter()
+    ok, err = True, None
+    try:
+        st = fn(st, v)
+        if inspect.isawaitable(st):
+            raise _awaitable_error(name)
+        return st
+    except Exception as e:
+        ok, err = False, repr(e)
+        raise
+    finally:
+        rec = {"name": name, "ok": ok, "error": err, "duration_s": round(time.perf_counter() - t0, 6)}
+        if steps is not None:
+            rec["steps"] = steps
+        records.append(rec)
+
+
+def compile_steps(steps: List[Any], instrument: str = "steps", trusted: frozenset = frozenset()) -> CompiledPlan:
+    """Build a CompiledPlan from normalized step objects."""
+    if instrument not in INSTRUMENT_LEVELS:
+        raise ValueError(f"Unknown instrument level {instrument!r}; expected one of {INSTRUMENT_LEVELS}")
+    segments: List[Segment] = []
+    pending: List[Tuple[str, Callable[..., Any]]] = []
+
+    def _flush() -> None:
+        if pending:
+            names, runs = zip(*pending)
+            segments.append(Segment(tuple(names), tuple(runs), False, _chain(tuple(names), tuple(runs))))
+            pending.clear()
+
+    for step_obj in steps:
+        name = getattr(step_obj, "name", step_obj.__class__.__name__)
+        if _is_async_step(step_obj):
+            _flush()
+            segments.append(Segment((name,), (step_obj.run,), True, step_obj.run))
+        else:
+            pending.append((name, step_obj.run))
+    _flush()
+    return CompiledPlan(tuple(segments), instrument, trusted)
@@ -0,0 +1,145 @@
+"""
+Report retention for large grids (Pipeline.run(retain=...)).
+
+retain:
+    - "all":      keep every report as produced (default)
+    - "summary":  keep only the step records; final_state is dropped (None)
+    - [keys]:     keep only these State.data keys (meta is kept as is)
+    - SpillStore: write each final state to an append-only file and keep its
+                  location in report.info["spill"] (load with SpillStore.load / load_spilled)
+    - callable:   called with each full report, then final_state is dropped
+Any policy other than "all" also stores step records as compact StepRecord
+objects (__slots__, read-only mapping interface) instead of dicts.
+"""
+from __future__ import annotations
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import os, pickle, threading
+
+from .pipebase import State, PipelineReport
+
+_BASE_FIELDS = ("name", "ok", "error", "duration_s")
+
+
+class StepRecord(Mapping):
+    """Compact, read-only step record; behaves like the dict it replaces (r["name"], r.get("cache"), ...)."""
+    __slots__ = ("name", "ok", "error", "duration_s", "extra")
+
+    def __init__(self, name: str, ok: bool = True, error: Optional[str] = None,
+                 duration_s: float = 0.0, extra: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.ok = ok
+        self.error = error
+        self.duration_s = duration_s
+        self.extra = extra or None  # rare fields ("shared", "batch", "cache", ...)
+
+    @classmethod
+    def from_dict(cls, rec: Dict[str, Any]) -> "StepRecord":
+        extra = {k: v for k, v in rec.items() if k not in _BASE_FIELDS}
+        return cls(rec.get("name"), rec.get("ok", True), rec.get("error"), rec.get("duration_s", 0.0), extra)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _BASE_FIELDS:
+            return getattr(self, key)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from _BASE_FIELDS
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return len(_BASE_FIELDS) + (len(self.extra) if self.extra else 0)
+
+    def __repr__(self) -> str:
+        return f"StepRecord({dict(self)!r})"
+
+    def __reduce__(self):
+        return (StepRecord, (self.name, self.ok, self.error, self.duration_s, self.extra))
+
+
+def compact_steps(steps: Sequence[Any]) -> List[StepRecord]:
+    return [s if isinstance(s, StepRecord) else StepRecord.from_dict(s) for s in steps]
+
+
+class SpillStore:
+    """Append-only pickle file of final states; report.info["spill"] = (path, offset)."""
+
+    def __init__(self, path: "Union[str, Path]"):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write(self, state: State) -> int:
+        blob = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock, open(self.path, "ab") as fh:
+            offset = fh.seek(0, os.SEEK_END)
+            fh.write(blob)
+        return offset
+
+    def load(self, offset: int) -> State:
+        with open(self.path, "rb") as fh:
+            fh.seek(offset)
+            return pickle.load(fh)
+
+    def __iter__(self) -> Iterator[State]:
+        """All spilled states in write order."""
+        with open(self.path, "rb") as fh:
+            while True:
+                try:
+                    yield pickle.load(fh)
+                except EOFError:
+                    return
+
+
+def load_spilled(report: PipelineReport) -> Optional[State]:
+    """Final state of a report produced with retain=SpillStore(...)."""
+    loc: "Optional[Tuple[str, int]]" = report.info.get("spill")
+    if loc is None:
+        return report.final_state
+    path, offset = loc
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        return pickle.load(fh)
+
+
+Retain = Union[str, Sequence[str], SpillStore, Callable[[PipelineReport], Any]]
+
+
+def check_retain(retain: Retain) -> None:
+    if isinstance(retain, str):
+        if retain not in ("all", "summary"):
+            raise ValueError(f"Unknown retain policy {retain!r}; expected 'all', 'summary', "
+                             "a list of data keys, a SpillStore or a callable")
+    elif not (isinstance(retain, SpillStore) or callable(retain) or isinstance(retain, (list, tuple, set, frozenset))):
+        raise TypeError(f"Unsupported retain policy: {type(retain)}")
+
+
+def worker_retain(retain: Retain) -> Retain:
+    """The part of a policy that can run inside worker processes (saves shipping states back)."""
+    if isinstance(retain, (str, list, tuple, set, frozenset)):
+        return retain
+    return "all"  # spilling / callbacks need the full state in the parent
+
+
+def apply_retention(report: PipelineReport, retain: Retain) -> PipelineReport:
+    if isinstance(retain, str) and retain == "all":
+        return report
+    report.steps = compact_steps(report.steps)
+    st = report.final_state
+    if isinstance(retain, str):  # "summary"
+        report.final_state = None
+    elif isinstance(retain, (list, tuple, set, frozenset)):
+        if st is not None:
+            report.final_state = State(data={k: st.data[k] for k in retain if k in st.data}, meta=dict(st.meta))
+    elif isinstance(retain, SpillStore):
+        if st is not None:
+            report.info["spill"] = (retain.path, retain.write(st))
+        report.final_state = None
+    else:
+        retain(report)
+        report.final_state = None
+    return report
@@ -0,0 +1,170 @@
+"""
+Span tracing of pipeline runs, exportable to Chrome trace / Perfetto JSON.
+
+    from ragfine.core.tracing import trace
+    with trace() as tracer:
+        pipe.run(state, variants=grid, async_mode=True)
+    tracer.export_chrome("run.trace.json")   # open in chrome://tracing or ui.perfetto.dev
+
+Spans nest variant → step → sub-step / item (BranchStep, SplitMerge,
+AsyncSplitMerge) and carry start/end timestamps plus the thread or asyncio
+task they ran on, so concurrent variants show up as parallel tracks. Spans
+from executor="process" workers are collected and merged as well.
+
+When no tracer is active, span() returns a shared no-op context manager: the
+cost is one ContextVar lookup per step.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import asyncio, contextvars, itertools, json, os, threading, time
+
+_TRACER: "contextvars.ContextVar[Optional[Tracer]]" = contextvars.ContextVar("ragfine_tracer", default=None)
+_PARENT: "contextvars.ContextVar[Optional[int]]" = contextvars.ContextVar("ragfine_span_parent", default=None)
+
+# (name, cat, start_ns, end_ns, pid, track, span id, parent id, args)
+Event = Tuple[str, str, int, int, int, str, int, Optional[int], Dict[str, Any]]
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "id", "parent", "t0", "token")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.id = next(tracer._ids)
+
+    def set(self, **args: Any) -> None:
+        """Attach extra args to the span (e.g. results known only at the end)."""
+        self.args.update(args)
+
+    def __enter__(self) -> "_Span":
+        self.parent = _PARENT.get()
+        self.token = _PARENT.set(self.id)
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        t1 = time.perf_counter_ns()
+        try:
+            _PARENT.reset(self.token)
+        except ValueError:  # exited in another context (e.g. a cancelled task); nesting is already recorded
+            pass
+        if exc_type is not None:
+            self.args["error"] = repr(exc)
+        self.tracer._events.append((
+            self.name, self.cat, self.t0, t1, os.getpid(), _track(), self.id, self.parent, self.args,
+        ))
+        return False
+
+
+def _track() -> str:
+    """Timeline row: the asyncio task if inside one, else the thread."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return f"task {task.get_name()}"
+    return f"thread {threading.current_thread().name}"
+
+
+class Tracer:
+    """Collects spans (list appends are thread-safe) and exports them."""
+
+    def __init__(self):
+        self._events: List[Event] = []
+        self._ids = itertools.count(1)
+        self.t0_ns = time.perf_counter_ns()
+
+    def span(self, name: str, cat: str = "step", **args: Any) -> _Span:
+        return _Span(self, name, cat, args)
+
+    @property
+    def events(self) -> List[Event]:
+        return list(self._events)
+
+    def merge(self, events: List[Event]) -> None:
+        """Add spans recorded elsewhere (worker processes); ids are remapped to stay unique."""
+        remap: Dict[int, int] = {}
+        for ev in events:
+            remap[ev[6]] = next(self._ids)
+        for name, cat, t0, t1, pid, track, sid, parent, args in events:
+            self._events.append((name, cat, t0, t1, pid, track, remap[sid], remap.get(parent, parent), args))
+
+    # --- export ---
+    def to_chrome(self) -> Dict[str, Any]:
+        """Chrome trace-event JSON object ("X" complete events + track names)."""
+        tids: Dict[Tuple[int, str], int] = {}
+        out: List[Dict[str, Any]] = []
+        for name, cat, t0, t1, pid, track, sid, parent, args in sorted(self._events, key=lambda e: e[2]):
+            tid = tids.setdefault((pid, track), len(tids) + 1)
+            out.append({
+                "name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+                "ts": (t0 - self.t0_ns) / 1000.0, "dur": (t1 - t0) / 1000.0,
+                "args": {"id": sid, "parent": parent, **{k: _jsonable(v) for k, v in args.items()}},
+            })
+        for (pid, track), tid in tids.items():
+            out.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": track}})
+        return {"traceEvents": out, "displayTimeUnit": "ms"}
+
+    def export_chrome(self, path: str) -> str:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_chrome(), fh)
+        return path
+
+
+def _jsonable(v: Any) -> Any:
+    return v if isinstance(v, (str, int, float, bool, type(None))) else repr(v)
+
+
+def span(name: str, cat: str = "step", **args: Any):
+    """Span in the active tracer, or a no-op context manager when tracing is off."""
+    tracer = _TRACER.get()
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, name, cat, args)
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _TRACER.get()
+
+
+@contextmanager
+def trace(tracer: Optional[Tracer] = None) -> Iterator[Tracer]:
+    """Activate a tracer for the enclosed runs (inherited by tasks and pooled threads)."""
+    tracer = tracer or Tracer()
+    token = _TRACER.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _TRACER.reset(token)
+
+
+def bind_context(fn):
+    """Wrap fn so it runs in (a copy of) the caller's context when tracing; plain fn otherwise."""
+    if _TRACER.get() is None:
+        return fn
+    ctx = contextvars.copy_context()
+
+    def _bound(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+    return _bound
@@ -0,0 +1,241 @@
+"""
+Lazy variant grids returned by combine().
+
+A VariantSpace never materialises the grid: variant number `i` is decoded from
+its position (mixed radix over the expanded axes, last axis varying fastest,
+exactly like itertools.product), so a space can be iterated, indexed, sliced,
+sharded and sampled in O(1) memory per variant.
+"""
+from __future__ import annotations
+from collections.abc import Sequence
+from itertools import product
+from typing import Any, Dict, Iterator, List, Optional, Union
+import math, random
+
+Variant = Dict[str, Any]
+
+SAMPLING_METHODS = ("random", "lhs", "sobol")
+
+# Joe & Kuo (2008) direction numbers (new-joe-kuo-6.21201), dimensions 2..21: (s, a, m_1..m_s)
+_SOBOL_PARAMS = [
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+    (5, 11, (1, 1, 5, 1, 1)),
+    (5, 13, (1, 1, 1, 3, 11)),
+    (5, 14, (1, 3, 5, 5, 31)),
+    (6, 1, (1, 3, 3, 9, 7, 49)),
+    (6, 13, (1, 1, 1, 15, 21, 21)),
+    (6, 16, (1, 3, 1, 13, 27, 49)),
+    (6, 19, (1, 1, 1, 15, 7, 5)),
+    (6, 22, (1, 3, 1, 15, 13, 25)),
+    (6, 25, (1, 1, 5, 5, 19, 61)),
+    (7, 1, (1, 3, 7, 11, 23, 15, 103)),
+    (7, 4, (1, 3, 7, 13, 13, 15, 69)),
+]
+_SOBOL_BITS = 32
+SOBOL_MAX_DIM = len(_SOBOL_PARAMS) + 1
+
+
+def _sobol_directions(dim: int) -> List[int]:
+    """Direction numbers V[1..BITS] (index 0 unused) for Sobol dimension `dim` (0-based)."""
+    bits = _SOBOL_BITS
+    v = [0] * (bits + 1)
+    if dim == 0:
+        for i in range(1, bits + 1):
+            v[i] = 1 << (bits - i)
+        return v
+    s, a, m = _SOBOL_PARAMS[dim - 1]
+    for i in range(1, s + 1):
+        v[i] = m[i - 1] << (bits - i)
+    for i in range(s + 1, bits + 1):
+        v[i] = v[i - s] ^ (v[i - s] >> s)
+        for k in range(1, s):
+            v[i] ^= ((a >> (s - 1 - k)) & 1) * v[i - k]
+    return v
+
+
+def sobol_points(n: int, dims: int, seed: Optional[int] = None) -> Iterator[List[float]]:
+    """
+    First `n` points of a `dims`-dimensional Sobol sequence in [0, 1)^dims (Gray-code order).
+    With a seed, every dimension gets a random digital shift (keeps the net properties).
+    """
+    if dims > SOBOL_MAX_DIM:
+        raise ValueError(f"Sobol sampling supports at most {SOBOL_MAX_DIM} dimensions, got {dims}")
+    directions = [_sobol_directions(d) for d in range(dims)]
+    rng = random.Random(seed)
+    shifts = [rng.getrandbits(_SOBOL_BITS) if seed is not None else 0 for _ in range(dims)]
+    scale = float(1 << _SOBOL_BITS)
+    x = [0] * dims
+    for i in range(n):
+        if i:
+            c = ((i - 1) ^ i).bit_length()  # 1-based position of the lowest zero bit of i-1
+            for d in range(dims):
+                x[d] ^= directions[d][c]
+        yield [(x[d] ^ shifts[d]) / scale for d in range(dims)]
+
+
+def lhs_points(n: int, dims: int, seed: Optional[int] = None) -> Iterator[List[float]]:
+    """Latin-hypercube sample of `n` points in [0, 1)^dims: one point per stratum on every axis."""
+    rng = random.Random(seed)
+    columns = []
+    for _ in range(dims):
+        strata = list(range(n))
+        rng.shuffle(strata)
+        columns.append([(k + rng.random()) / n for k in strata])
+    for i in range(n):
+        yield [col[i] for col in columns]
+
+
+class VariantSpace(Sequence):
+    """
+    Sized, lazily decoded sequence of variant dicts.
+
+    mode:
+        - "cartesian": cartesian product of the expanded axes (len = product of sizes)
+        - "zip":       axes advance together, truncated to the shortest (len = min size)
+    """
+
+    def __init__(
+        self,
+        axes: Dict[str, List[Any]],
+        fixed: Optional[Variant] = None,
+        defaults: Optional[Variant] = None,
+        *,
+        mode: str = "cartesian",
+        _indices: "Optional[Sequence[int]]" = None,
+    ):
+        if mode not in ("cartesian", "zip"):
+            raise ValueError(f"Unknown combine mode {mode!r}; expected 'cartesian' or 'zip'")
+        self.mode = mode
+        self._keys = list(axes)
+        # sequences (list, tuple, range, ...) are indexed in place; other iterables are materialised
+        self._values = [v if isinstance(v, Sequence) else list(v) for v in axes.values()]
+        self._fixed = dict(fixed or {})
+        self._defaults = dict(defaults or {})
+        if not self._keys:
+            self._size = 1
+        elif mode == "zip":
+            self._size = min(len(v) for v in self._values)
+        else:
+            self._size = math.prod(len(v) for v in self._values)
+        self._indices = _indices  # None = the whole grid, in grid order
+
+    # --- sizes / positions ---
+    def __len__(self) -> int:
+        return self._size if self._indices is None else len(self._indices)
+
+    @property
+    def grid_size(self) -> int:
+        """Size of the underlying (unsliced, unsampled) grid."""
+        return self._size
+
+    def _position(self, i: int) -> int:
+        return i if self._indices is None else self._indices[i]
+
+    def _view(self, indices: "Sequence[int]") -> "VariantSpace":
+        view = VariantSpace.__new__(VariantSpace)
+        view.__dict__.update(self.__dict__)
+        view._indices = indices
+        return view
+
+    def _decode(self, pos: int) -> Variant:
+        v = dict(self._defaults)  # defaults na start
+        v.update(self._fixed)     # stałe parametry
+        if self.mode == "zip":
+            v.update((k, vals[pos]) for k, vals in zip(self._keys, self._values))
+            return v
+        picked = []
+        for vals in reversed(self._values):
+            pos, r = divmod(pos, len(vals))
+            picked.append(vals[r])
+        v.update(zip(self._keys, reversed(picked)))
+        return v
+
+    # --- Sequence protocol ---
+    def __getitem__(self, item: Union[int, slice]) -> Union[Variant, "VariantSpace"]:
+        if isinstance(item, slice):
+            base = range(self._size) if self._indices is None else self._indices
+            return self._view(base[item])
+        n = len(self)
+        if item < 0:
+            item += n
+        if not 0 <= item < n:
+            raise IndexError("VariantSpace index out of range")
+        return self._decode(self._position(item))
+
+    def __iter__(self) -> Iterator[Variant]:
+        if self._indices is None and self._keys and self.mode == "cartesian":
+            head = {**self._defaults, **self._fixed}
+            for combo in product(*self._values):
+                c = dict(head)
+                c.update(zip(self._keys, combo))
+                yield c
+            return
+        for i in range(len(self)):
+            yield self._decode(self._position(i))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (VariantSpace, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        axes = ", ".join(f"{k}[{len(v)}]" for k, v in zip(self._keys, self._values))
+        return f"VariantSpace(mode={self.mode!r}, axes=({axes}), len={len(self)})"
+
+    # --- partitioning ---
+    def shard(self, index: int, count: int) -> "VariantSpace":
+        """Every `count`-th variant starting at `index` (shards are disjoint and cover the space)."""
+        if not 0 <= index < count:
+            raise ValueError("shard index must satisfy 0 <= index < count")
+        return self[index::count]
+
+    # --- sampling ---
+    def sample(self, n: int, method: str = "random", *, seed: Optional[int] = None) -> "VariantSpace":
+        """
+        Pick `n` variants from this space without materialising it.
+
+        method:
+            - "random": n distinct variants uniformly at random
+            - "lhs":    Latin hypercube over the expanded axes
+            - "sobol":  Sobol low-discrepancy sequence over the expanded axes
+                        (scrambled with a digital shift when `seed` is given)
+        "lhs" / "sobol" map points onto axis values and drop duplicates, so they may
+        return fewer than `n` variants on small axes. Sampling a sliced or zip-mode
+        space works on positions (a single axis).
+        """
+        if method not in SAMPLING_METHODS:
+            raise ValueError(f"Unknown sampling method {method!r}; expected one of {SAMPLING_METHODS}")
+        total = len(self)
+        if n < 0:
+            raise ValueError("n must be >= 0")
+        if method == "random":
+            if n > total:
+                raise ValueError(f"Cannot sample {n} distinct variants from a space of {total}")
+            return self._view([self._position(i) for i in random.Random(seed).sample(range(total), n)])
+
+        per_axis = self._indices is None and self.mode == "cartesian" and self._keys
+        sizes = [len(v) for v in self._values] if per_axis else [total]
+        points = (sobol_points if method == "sobol" else lhs_points)(n, len(sizes), seed)
+        picked, seen = [], set()
+        for u in points:
+            coords = [min(int(x * size), size - 1) for x, size in zip(u, sizes)]
+            if per_axis:
+                pos = 0
+                for c, size in zip(coords, sizes):
+                    pos = pos * size + c
+            else:
+                pos = self._position(coords[0])
+            if pos not in seen:
+                seen.add(pos)
+                picked.append(pos)
+        return self._view(picked)
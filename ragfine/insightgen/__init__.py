@@ -1,11 +1,15 @@
 """
 ragfine.insightgen
 ------------------
-Insight generation steps (entity→Q→A→integrate→refine→rebase).
+Insight generation steps (entity→Q→A→integrate→refine→rebase) plus the Gazetteer
+dictionary matcher and the Chunker for long (memory-mapped) documents.
 Importing this package registers its steps via module side-effects.
 """
 
 from .entifier import Entifier, entify
+from .gazetteer import Gazetteer, AhoCorasick, compile_gazetteer
+from .chunker import Chunker, iter_chunks, chunk_items, chunk_to_state
+from .documents import Chunk, MappedDocument
 from .questor import Questor, quest
 from .solver import Solver, solve
 from .integrator import Integrator, integrate
@@ -16,6 +20,8 @@ from . import utils, io_models
 
 __all__ = [
     "Entifier", "entify",
+    "Gazetteer", "AhoCorasick", "compile_gazetteer",
+    "Chunker", "iter_chunks", "chunk_items", "chunk_to_state", "Chunk", "MappedDocument",
     "Questor", "quest",
     "Solver", "solve",
     "Integrator", "integrate",
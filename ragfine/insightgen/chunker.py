@@ -0,0 +1,230 @@
+"""
+Chunker: split long documents into offset-exact chunks.
+
+Source: state.data['path'] (a UTF-8 file read through mmap; offsets are byte
+offsets into the file, other encodings are rejected) or state.data['text'] (offsets are str indices).
+Chunks are small Chunk objects (document, start, end, index); the text of a
+chunk is decoded only when .text is read, and copying / pickling a chunk never
+copies the document (a mapped file is reopened by path in worker processes).
+
+modes:
+    - "size":     `size` bytes (chars) per chunk, consecutive chunks share `overlap`
+                  (UTF-8 sequences are never split)
+    - "sentence": `size` sentences per chunk (split_sentences rules), `overlap` sentences shared
+    - "window":   sliding window of `size` words, advancing by size - overlap words
+
+Fan-out without per-chunk copies of the parent:
+    SplitMerge("per_chunk", chunk_items, [Entifier()], map_item_to_state=chunk_to_state)
+"""
+from __future__ import annotations
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+import codecs, re
+
+from ..core.pipebase import State
+from ..core.registry import register_step, register_fn
+from ..steps.validators import validate_io
+from .io_models import ChunkerInput, ChunkerOutput
+from .utils import _SENT_SPLIT
+from .documents import Chunk, MappedDocument
+
+Variant = Dict[str, Any]
+
+CHUNK_MODES = ("size", "sentence", "window")
+
+# bytes twins of the str patterns (regexes run on the mmap directly, no decoding).
+# Bytes \s is ASCII-only, so whitespace is spelled out as the UTF-8 encodings of
+# everything str.isspace() accepts (\x1c-\x1f, NEL, NBSP, U+1680, U+2000-200A,
+# U+2028/2029, U+202F, U+205F, U+3000); a non-space is one whole UTF-8 sequence.
+# À-Ö / Ø-ö / ø-ÿ are C3 80-96 / C3 98-B6 / C3 B8-BF.
+_WS_B = (rb"(?:[\t-\r\x1c-\x20]|\xc2[\x85\xa0]|\xe1\x9a\x80"
+         rb"|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)")
+_NS_B = rb"(?:(?!" + _WS_B + rb")(?:[\x00-\x7f]|[\xc0-\xff][\x80-\xbf]*))"
+_SENT_SPLIT_B = re.compile(rb"(?<=[.!?])" + _WS_B + rb"+(?=[A-Z]|\xc3[\x80-\x96\x98-\xb6\xb8-\xbf])")
+_TRAIL_WS_B = re.compile(_WS_B + rb"+\Z")
+_WORD_RE = re.compile(r"\S+")
+_WORD_RE_B = re.compile(_NS_B + rb"+")
+
+
+def _check_utf8(encoding: str) -> None:
+    # byte offsets, sequence boundaries and the bytes regexes above all assume UTF-8
+    if codecs.lookup(encoding).name != "utf-8":
+        raise ValueError(f"Chunker reads mapped files as UTF-8 only (got encoding={encoding!r})")
+
+
+# --- span generators (work on str and on bytes / mmap buffers) ---
+def _utf8_back(buf: Any, pos: int) -> int:
+    """Move pos back to the start of a UTF-8 sequence (no-op for str)."""
+    if isinstance(buf, str):
+        return pos
+    while pos > 0 and pos < len(buf) and buf[pos] & 0xC0 == 0x80:
+        pos -= 1
+    return pos
+
+
+def _size_spans(buf: Any, size: int, overlap: int) -> Iterator[Tuple[int, int]]:
+    n = len(buf)
+    start = 0
+    while start < n:
+        end = _utf8_back(buf, min(start + size, n))
+        if end <= start:  # size smaller than one character
+            end = start + 1
+            while end < n and not isinstance(buf, str) and buf[end] & 0xC0 == 0x80:
+                end += 1
+        yield start, end
+        if end >= n:
+            return
+        nxt = _utf8_back(buf, end - overlap)
+        start = nxt if nxt > start else end
+
+
+def _sentence_spans(buf: Any) -> Iterator[Tuple[int, int]]:
+    """Sentences as split_sentences() finds them, as (start, end) offsets."""
+    is_str = isinstance(buf, str)
+    n = len(buf)
+    first = _WORD_RE.search(buf) if is_str else _WORD_RE_B.search(buf)
+    if first is None:
+        return
+    start = first.start()
+    for m in (_SENT_SPLIT if is_str else _SENT_SPLIT_B).finditer(buf, start):
+        yield start, m.start()
+        start = m.end()
+    if is_str:
+        end = n
+        while end > start and buf[end - 1].isspace():
+            end -= 1
+    else:
+        trail = _TRAIL_WS_B.search(buf, start)
+        end = trail.start() if trail else n
+    yield start, end
+
+
+@lru_cache(maxsize=32)
+def _word_window_res(size: int, step: int, is_bytes: bool) -> "Tuple[re.Pattern, re.Pattern]":
+    window = r"\S+(?:\s+\S+){0,%d}" % (size - 1)  # up to `size` words
+    skip = r"(?:\S+\s+){%d}" % step                 # exactly `step` words ahead
+    if is_bytes:
+        def _b(pat: str) -> bytes:
+            return pat.encode().replace(rb"\S", _NS_B).replace(rb"\s", _WS_B)
+        return re.compile(_b(window)), re.compile(_b(skip))
+    return re.compile(window), re.compile(skip)
+
+
+def _word_windows(buf: Any, size: int, overlap: int) -> Iterator[Tuple[int, int]]:
+    """Sliding word windows; the regex engine walks the words, Python only sees windows."""
+    is_bytes = not isinstance(buf, str)
+    window_re, skip_re = _word_window_res(size, size - overlap, is_bytes)
+    word_re = _WORD_RE_B if is_bytes else _WORD_RE
+    first = word_re.search(buf)
+    if first is None:
+        return
+    pos = first.start()
+    while True:
+        end = window_re.match(buf, pos).end()
+        yield pos, end
+        nxt = word_re.search(buf, end)
+        if nxt is None:  # the rest is already covered
+            return
+        # words remain, so this window was full and `step` words exist
+        pos = nxt.start() if not overlap else skip_re.match(buf, pos).end()
+
+
+def _windows(spans: Iterable[Tuple[int, int]], size: int, overlap: int) -> Iterator[Tuple[int, int]]:
+    """Group consecutive spans `size` at a time, sharing `overlap` between windows; a last partial window is kept."""
+    step = size - overlap
+    window: "deque[Tuple[int, int]]" = deque()
+    fresh = 0  # spans not covered by an emitted window yet
+    for sp in spans:
+        window.append(sp)
+        fresh += 1
+        if len(window) == size:
+            yield window[0][0], window[-1][1]
+            for _ in range(step):
+                window.popleft()
+            fresh = 0
+    if fresh:
+        yield window[0][0], window[-1][1]
+
+
+def iter_chunks(
+    doc: Union[MappedDocument, str], mode: str = "size", size: int = 2000, overlap: int = 0,
+) -> Iterator[Chunk]:
+    """Chunks of a mapped document or a str, lazily (see module docstring for modes)."""
+    if not isinstance(doc, str):
+        _check_utf8(doc.encoding)
+    buf = doc if isinstance(doc, str) else doc.buffer
+    if mode == "size":
+        spans = _size_spans(buf, size, overlap)
+    elif mode == "sentence":
+        spans = _windows(_sentence_spans(buf), size, overlap)
+    elif mode == "window":
+        spans = _word_windows(buf, size, overlap)
+    else:
+        raise ValueError(f"Unknown chunk mode {mode!r}; expected one of {CHUNK_MODES}")
+    for i, (start, end) in enumerate(spans):
+        yield Chunk(doc, start, end, i)
+
+
+# --- step ---
+class Chunker:
+    """
+    Splits state.data['path'] (mmap'ed file) or state.data['text'] into chunks.
+    Stores state.data['chunks'] (list[Chunk]); chunk text is decoded lazily (chunk.text).
+    A mapped file stays open and is owned by the chunks: the consumer releases it with
+    chunks[0].doc.close() (or `with chunks[0].doc:`), otherwise it goes with the last chunk.
+    """
+    reads_variant = ()  # mode / size / overlap are constructor arguments
+
+    def __init__(self, name: str = "Chunker", mode: str = "size", size: int = 2000,
+                 overlap: int = 0, encoding: str = "utf-8"):
+        if mode not in CHUNK_MODES:
+            raise ValueError(f"Unknown chunk mode {mode!r}; expected one of {CHUNK_MODES}")
+        if size < 1 or not 0 <= overlap < size:
+            raise ValueError(f"Chunker needs size >= 1 and 0 <= overlap < size (got size={size}, overlap={overlap})")
+        self.name = name
+        self.mode = mode
+        self.size = size
+        self.overlap = overlap
+        _check_utf8(encoding)
+        self.encoding = encoding
+
+    def _document(self, state: State) -> Union[MappedDocument, str]:
+        path = state.data.get("path")
+        return MappedDocument(path, self.encoding) if path else (state.data.get("text", "") or "")
+
+    def chunks(self, state: State) -> Iterator[Chunk]:
+        """Lazy chunks; a mapped file stays open until chunk.doc.close() (or garbage collection)."""
+        return iter_chunks(self._document(state), self.mode, self.size, self.overlap)
+
+    @validate_io(input_model=ChunkerInput, output_model=ChunkerOutput)
+    def run(self, state: State, variant: Variant) -> State:
+        doc = self._document(state)
+        try:
+            state.data["chunks"] = list(iter_chunks(doc, self.mode, self.size, self.overlap))
+        except BaseException:
+            if isinstance(doc, MappedDocument):
+                doc.close()
+            raise
+        return state
+
+register_step("Chunker", lambda **kw: Chunker(**kw))
+
+
+# --- SplitMerge / AsyncSplitMerge helpers ---
+def chunk_items(state: State, variant: Variant) -> List[Chunk]:
+    """items_fn: the chunks stored by Chunker."""
+    return state.data.get("chunks") or []
+
+def chunk_to_state(chunk: Chunk, parent: State) -> State:
+    """
+    map_item_to_state: a fresh sub-state holding only this chunk (decoded text + offsets),
+    instead of a deep copy of the parent with the whole document in it.
+    """
+    return State(
+        data={"item": chunk, "text": chunk.text, "chunk_span": chunk.span, "chunk_index": chunk.index},
+        meta=dict(parent.meta),
+    )
+
+register_fn("chunk_items", chunk_items)
+register_fn("chunk_to_state", chunk_to_state)
@@ -0,0 +1,124 @@
+"""
+Memory-mapped documents and the chunks that point into them (see chunker.py).
+"""
+from __future__ import annotations
+from typing import Any, Dict, Optional, Tuple, Union
+import mmap, threading
+
+
+class MappedDocument:
+    """
+    Read-only memory map of a text file; slices are decoded on demand.
+    close() releases the map; a closed document maps the file again on its next
+    read (under a lock, so concurrent readers share one map), so chunks outlive
+    the step that produced them.
+    """
+    __slots__ = ("path", "encoding", "_buf", "_lock")
+
+    def __init__(self, path: str, encoding: str = "utf-8"):
+        self.path = str(path)
+        self.encoding = encoding
+        self._lock = threading.Lock()
+        self._buf: Union[mmap.mmap, bytes, None] = self._open()
+
+    def _open(self) -> Union[mmap.mmap, bytes]:
+        with open(self.path, "rb") as fh:
+            try:
+                return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file: nothing to map
+                return b""
+
+    @property
+    def buffer(self) -> Union[mmap.mmap, bytes]:
+        buf = self._buf
+        if buf is None:
+            with self._lock:
+                if self._buf is None:
+                    self._buf = self._open()
+                buf = self._buf
+        return buf
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def text(self, start: int = 0, end: Optional[int] = None) -> str:
+        return self.buffer[start:end].decode(self.encoding)
+
+    def close(self) -> None:
+        with self._lock:
+            if isinstance(self._buf, mmap.mmap):
+                self._buf.close()
+            self._buf = None
+
+    @property
+    def closed(self) -> bool:
+        return self._buf is None
+
+    def __enter__(self) -> "MappedDocument":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # shared, never copied: forks / deep copies of a state keep pointing at the same map
+    def __copy__(self) -> "MappedDocument":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "MappedDocument":
+        return self
+
+    def __reduce__(self):
+        return (MappedDocument, (self.path, self.encoding))
+
+    def __repr__(self) -> str:
+        return f"MappedDocument({self.path!r})"
+
+
+class Chunk:
+    """One chunk: (start, end) offsets into `doc` (a MappedDocument or a str)."""
+    __slots__ = ("doc", "start", "end", "index")
+
+    def __init__(self, doc: Union[MappedDocument, str], start: int, end: int, index: int):
+        self.doc = doc
+        self.start = start
+        self.end = end
+        self.index = index
+
+    @property
+    def text(self) -> str:
+        if isinstance(self.doc, str):
+            return self.doc[self.start:self.end]
+        return self.doc.text(self.start, self.end)
+
+    @property
+    def span(self) -> Tuple[int, int]:
+        return self.start, self.end
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Chunk):
+            return NotImplemented
+        return (self.start, self.end, self.index) == (other.start, other.end, other.index) and (
+            self.doc is other.doc or _doc_id(self.doc) == _doc_id(other.doc))
+
+    def __hash__(self) -> int:
+        return hash((self.start, self.end, self.index))
+
+    def __copy__(self) -> "Chunk":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "Chunk":
+        return self  # immutable; the document is shared
+
+    def __reduce__(self):
+        return (Chunk, (self.doc, self.start, self.end, self.index))
+
+    def __repr__(self) -> str:
+        src = self.doc.path if isinstance(self.doc, MappedDocument) else f"<text:{len(self.doc)}>"
+        return f"Chunk({src!r}, {self.start}, {self.end}, index={self.index})"
+
+
+def _doc_id(doc: Union[MappedDocument, str]) -> Any:
+    return doc.path if isinstance(doc, MappedDocument) else doc
@@ -1,31 +1,49 @@
 from __future__ import annotations
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from ..core.pipebase import State
 from ..core.registry import register_step
-from ..steps.validators import validate_io
+from ..steps.validators import validate_io, validate_io_batch
 from .io_models import EntifierInput, EntifierOutput
-from .utils import WORD_RE, EMAIL_RE, URL_RE, unique
+from .utils import scan_entities
 
 Variant = Dict[str, Any]
 
 class Entifier:
-    def __init__(self, name: str = "Entifier"):
+    """
+    Extracts TitleCase names, emails and URLs in a single scan.
+    Stores state.data['entities'] (list[str]) and, with spans=True,
+    state.data['entity_spans'] (list of (entity, kind, start, end)).
+    """
+    reads_variant = ()  # entities depend on the text only
+
+    def __init__(self, name: str = "Entifier", spans: bool = False):
         self.name = name
+        self.spans = spans
 
     @validate_io(input_model=EntifierInput, output_model=EntifierOutput)
     def run(self, state: State, variant: Variant) -> State:
-        text = state.data.get("text", "") or ""
-        words = WORD_RE.findall(text)
-        titlecase = [w for w in words if w[:1].isupper() and w.lower() != w]
-        emails = EMAIL_RE.findall(text)
-        urls = URL_RE.findall(text)
-        state.data["entities"] = unique(titlecase + emails + urls)
+        self._store(state, *scan_entities(state.data.get("text", "") or "", self.spans))
         return state
 
+    def _store(self, state: State, entities: List[str], spans: List[Any]) -> None:
+        state.data["entities"] = list(entities)
+        if self.spans:
+            state.data["entity_spans"] = list(spans)
+
+    @validate_io_batch(input_model=EntifierInput, output_model=EntifierOutput)
+    def run_batch(self, states: List[State], variants: List[Variant]) -> List[State]:
+        memo: Dict[str, Any] = {}  # variants of one document share the same text
+        for state in states:
+            text = state.data.get("text", "") or ""
+            if text not in memo:
+                memo[text] = scan_entities(text, self.spans)
+            self._store(state, *memo[text])
+        return states
+
 register_step("Entifier", lambda **kw: Entifier(**kw))
 
-def entify(name: str = "Entifier") -> Entifier:
-    return Entifier(name=name)
+def entify(name: str = "Entifier", spans: bool = False) -> Entifier:
+    return Entifier(name=name, spans=spans)
 
 register_step("entify", lambda **kw: entify(**kw))
\ No newline at end of file
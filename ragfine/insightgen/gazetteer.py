@@ -0,0 +1,277 @@
+"""
+Gazetteer: dictionary entity matching with an Aho-Corasick automaton.
+
+The term list (inline, a file or a CALLABLE_REGISTRY function) is compiled
+once, when the step is built; each document is then matched in one linear
+pass, whatever the number of terms. With cache_path= the compiled automaton
+is pickled to disk and reused as long as the term list and options match.
+
+Terms file: one term per line, optionally "term<TAB>label"; blank lines and
+lines starting with '#' are skipped.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import hashlib, heapq, os, pickle
+
+from ..core.pipebase import State
+from ..core.registry import register_step, CALLABLE_REGISTRY
+from ..steps.validators import validate_io, validate_io_batch
+from .io_models import GazetteerInput, GazetteerOutput
+
+Variant = Dict[str, Any]
+Term = Tuple[str, Optional[str]]            # (term, label)
+Match = Tuple[str, Optional[str], int, int]  # (term, label, start, end)
+
+_CACHE_FORMAT = 2
+
+
+def _fold(text: str) -> str:
+    """Lowercase without changing offsets (chars whose lowercase is longer stay as they are)."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _is_word(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over characters: goto dicts, failure links and
+    per-node outputs (term ids, failure-chain outputs already merged in).
+    """
+    __slots__ = ("terms", "lengths", "max_len", "case_sensitive", "whole_words", "goto", "fail", "out", "digest")
+
+    def __init__(self, terms: Iterable[Term], case_sensitive: bool = False, whole_words: bool = True):
+        self.case_sensitive = case_sensitive
+        self.whole_words = whole_words
+        self.terms: List[Term] = []
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Tuple[int, ...]] = [()]
+        seen: Dict[str, int] = {}
+        for term, label in terms:
+            key = term if case_sensitive else _fold(term)
+            if not key or key in seen:  # first occurrence wins (its label too)
+                continue
+            seen[key] = len(self.terms)
+            self.terms.append((term, label))
+            node = 0
+            for ch in key:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = goto[node][ch] = len(goto)
+                    goto.append({})
+                    out.append(())
+                node = nxt
+            out[node] = (seen[key],)
+
+        # BFS: failure links + outputs of the failure chain
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:
+            for ch, nxt in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+                queue.append(nxt)
+        self.goto, self.fail, self.out = goto, fail, out
+        self.lengths = [len(t) for t, _ in self.terms]  # per term id, so matching never touches the term list
+        self.max_len = max(self.lengths, default=0)
+        self.digest = _digest(self.terms, case_sensitive, whole_words)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    @property
+    def nodes(self) -> int:
+        return len(self.goto)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """All (term id, start, end) occurrences, overlapping ones included, by end offset."""
+        goto, fail, out, terms_len = self.goto, self.fail, self.out, self.lengths
+        haystack = text if self.case_sensitive else _fold(text)
+        whole, n = self.whole_words, len(text)
+        node = 0
+        for i, ch in enumerate(haystack):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            end = i + 1
+            for tid in out[node]:
+                start = end - terms_len[tid]
+                if whole and ((start and _is_word(text[start - 1])) or (end < n and _is_word(text[end]))):
+                    continue
+                yield tid, start, end
+
+    def find(self, text: str, overlapping: bool = False) -> List[Match]:
+        """
+        Matches as (term, label, start, end) by start, longest first. Without overlapping,
+        the leftmost-longest match wins and the scan resumes after it.
+        """
+        terms = self.terms
+        if overlapping:
+            found = sorted(self.iter_matches(text), key=lambda m: (m[1], -m[2]))
+            return [(terms[t][0], terms[t][1], s, e) for t, s, e in found]
+        # matches arrive by end offset; one ending at e starts at e - max_len or later, so
+        # every pending match starting before that is settled (leftmost, then longest)
+        result: List[Match] = []
+        pending: List[Tuple[int, int, int]] = []
+        pos, max_len = 0, self.max_len
+
+        def _settle(limit: int) -> None:
+            nonlocal pos
+            while pending and pending[0][0] < limit:
+                s, neg_e, t = heapq.heappop(pending)
+                if s >= pos:
+                    result.append((terms[t][0], terms[t][1], s, -neg_e))
+                    pos = -neg_e
+
+        for t, s, e in self.iter_matches(text):
+            _settle(e - max_len)
+            if s >= pos:
+                heapq.heappush(pending, (s, -e, t))
+        _settle(len(text) + 1)
+        return result
+
+
+# --- term sources ---
+def read_terms(path: "Union[str, Path]") -> List[Term]:
+    terms: List[Term] = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.rstrip("\n\r")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            term, _, label = line.partition("\t")
+            terms.append((term.strip(), label.strip() or None))
+    return terms
+
+
+def _as_terms(items: Iterable[Any], label: Optional[str]) -> List[Term]:
+    terms: List[Term] = []
+    for item in items:
+        if isinstance(item, str):
+            terms.append((item, label))
+        else:
+            term, item_label = item
+            terms.append((term, item_label if item_label is not None else label))
+    return terms
+
+
+def _digest(terms: Sequence[Term], case_sensitive: bool, whole_words: bool) -> str:
+    h = hashlib.sha256(f"{_CACHE_FORMAT}|{case_sensitive}|{whole_words}".encode())
+    for term, label in terms:
+        h.update(f"\x00{term}\x01{label or ''}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def compile_gazetteer(
+    terms: Sequence[Term],
+    case_sensitive: bool = False,
+    whole_words: bool = True,
+    cache_path: "Union[str, Path, None]" = None,
+) -> AhoCorasick:
+    """Build the automaton, or load it from cache_path when it was built from the same terms/options."""
+    if cache_path is None:
+        return AhoCorasick(terms, case_sensitive, whole_words)
+    digest = _digest(terms, case_sensitive, whole_words)  # of the source list, checked before building
+    try:
+        with open(cache_path, "rb") as fh:
+            cached = pickle.load(fh)
+        if cached.get("format") == _CACHE_FORMAT and cached.get("digest") == digest:
+            return cached["automaton"]
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, TypeError):
+        pass  # missing / stale / unreadable: rebuild
+    automaton = AhoCorasick(terms, case_sensitive, whole_words)
+    Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        pickle.dump({"format": _CACHE_FORMAT, "digest": digest, "automaton": automaton}, fh,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_path)  # atomic: concurrent builders never see a partial file
+    return automaton
+
+
+# --- step ---
+class Gazetteer:
+    """
+    Matches a term dictionary (product / organisation names, ...) in state.data['text'].
+    Stores state.data['gazetteer'] (matched terms, first occurrence order) and, with
+    spans=True, state.data['gazetteer_spans'] (list of (term, label, start, end)).
+    merge_entities=True also appends new matches to state.data['entities'].
+
+    Terms come from `terms` (strings or (term, label) pairs), `terms_file` and/or
+    `terms_fn` (name of a CALLABLE_REGISTRY function returning such items).
+    """
+    reads_variant = ()  # the term dictionary is fixed at construction
+
+    def __init__(
+        self,
+        name: str = "Gazetteer",
+        terms: Optional[Iterable[Any]] = None,
+        terms_file: Optional[str] = None,
+        terms_fn: Optional[str] = None,
+        label: Optional[str] = None,
+        case_sensitive: bool = False,
+        whole_words: bool = True,
+        overlapping: bool = False,
+        spans: bool = False,
+        merge_entities: bool = False,
+        cache_path: Optional[str] = None,
+    ):
+        self.name = name
+        self.overlapping = overlapping
+        self.spans = spans
+        self.merge_entities = merge_entities
+        collected: List[Term] = []
+        if terms is not None:
+            collected += _as_terms(terms, label)
+        if terms_file is not None:
+            collected += [(t, l if l is not None else label) for t, l in read_terms(terms_file)]
+        if terms_fn is not None:
+            if terms_fn not in CALLABLE_REGISTRY:
+                raise KeyError(f"Callable '{terms_fn}' not found in CALLABLE_REGISTRY")
+            collected += _as_terms(CALLABLE_REGISTRY[terms_fn](), label)
+        self.automaton = compile_gazetteer(collected, case_sensitive, whole_words, cache_path)
+
+    def cache_key(self) -> Any:
+        # step cache fingerprint: the automaton itself is too big to hash per lookup
+        return (self.automaton.digest, self.overlapping, self.spans, self.merge_entities)
+
+    def match(self, text: str) -> Tuple[List[str], List[Match]]:
+        found = self.automaton.find(text, self.overlapping)
+        return list(dict.fromkeys(m[0] for m in found)), found
+
+    def _store(self, state: State, terms: List[str], found: List[Match]) -> None:
+        state.data["gazetteer"] = list(terms)
+        if self.spans:
+            state.data["gazetteer_spans"] = list(found)
+        if self.merge_entities:
+            entities = list(state.data.get("entities") or [])
+            known = set(entities)
+            state.data["entities"] = entities + [t for t in terms if t not in known]
+
+    @validate_io(input_model=GazetteerInput, output_model=GazetteerOutput)
+    def run(self, state: State, variant: Variant) -> State:
+        self._store(state, *self.match(state.data.get("text", "") or ""))
+        return state
+
+    @validate_io_batch(input_model=GazetteerInput, output_model=GazetteerOutput)
+    def run_batch(self, states: List[State], variants: List[Variant]) -> List[State]:
+        memo: Dict[str, Any] = {}  # variants of one document share the same text
+        for state in states:
+            text = state.data.get("text", "") or ""
+            if text not in memo:
+                memo[text] = self.match(text)
+            self._store(state, *memo[text])
+        return states
+
+register_step("Gazetteer", lambda **kw: Gazetteer(**kw))
@@ -5,6 +5,7 @@ from ..core.pipebase import State
 from ..core.registry import register_step
 from ..steps.validators import validate_io
 from .io_models import IntegratorInput, IntegratorOutput
+from .utils import aligned_records
 
 Variant = Dict[str, Any]
 
@@ -12,12 +13,15 @@ class Integrator:
     """
     Stitches Q/A into markdown-ish lines; writes 'summary' and 'result'.
     """
+    reads_variant = ()  # only pairs Q/A; styling is Rebaser's job
+
     def __init__(self, name: str = "Integrator"):
         self.name = name
 
     @validate_io(input_model=IntegratorInput, output_model=IntegratorOutput)
     def run(self, state: State, variant: Variant) -> State:
-        qs: List[str] = state.data.get("questions", []) or []
+        records = aligned_records(state.data)
+        qs: List[str] = records.questions if records is not None else (state.data.get("questions", []) or [])
         ans: List[str] = state.data.get("answers", []) or []
 
         lines: List[str] = []
@@ -1,6 +1,9 @@
 from __future__ import annotations
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+from .utils import QuestionRecords
+from .documents import Chunk
 
 # Entifier
 class EntifierInput(BaseModel):
@@ -15,18 +18,24 @@ class QuestorInput(BaseModel):
     entities: Optional[List[str]] = None
 
 class QuestorOutput(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)  # QuestionRecords: isinstance check only
     questions: List[str]
+    question_records: QuestionRecords
 
 # Solver
 class SolverInput(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
     questions: List[str] = Field(default_factory=list)
+    question_records: Optional[QuestionRecords] = None
 
 class SolverOutput(BaseModel):
     answers: List[str]
 
 # Integrator
 class IntegratorInput(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
     questions: List[str] = Field(default_factory=list)
+    question_records: Optional[QuestionRecords] = None
     answers: List[str] = Field(default_factory=list)
 
 class IntegratorOutput(BaseModel):
@@ -45,4 +54,19 @@ class RebaserInput(BaseModel):
     result: str = ""
 
 class RebaserOutput(BaseModel):
-    result: str
\ No newline at end of file
+    result: str
+# Gazetteer
+class GazetteerInput(BaseModel):
+    text: str = Field(..., min_length=1)
+
+class GazetteerOutput(BaseModel):
+    gazetteer: List[str]
+
+# Chunker
+class ChunkerInput(BaseModel):
+    path: Optional[str] = None   # file to mmap; takes precedence over text
+    text: Optional[str] = None
+
+class ChunkerOutput(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    chunks: List[Chunk]
@@ -1,44 +1,73 @@
 from __future__ import annotations
-from typing import Any, Dict, List
-import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from ..core.pipebase import State
 from ..core.registry import register_step
-from ..steps.validators import validate_io
+from ..steps.validators import validate_io, validate_io_batch
 from .io_models import QuestorInput, QuestorOutput
-from .utils import split_sentences, unique
+from .utils import QUESTION_TEMPLATES, QuestionRecords, entity_kind, first_offsets, split_sentences
 
 Variant = Dict[str, Any]
 
 class Questor:
     """
     Generates naive questions about entities or per sentence.
-    Stores state.data['questions'] (list[str]).
+    Stores state.data['questions'] (list[str]) and, aligned with it,
+    state.data['question_records'] (QuestionRecords: entity, kind, offset, question)
+    so Solver / Integrator need not parse the question strings back.
     """
+    reads_variant = ()  # questions come from entities / sentences alone
+
     def __init__(self, name: str = "Questor"):
         self.name = name
 
     @validate_io(input_model=QuestorInput, output_model=QuestorOutput)
     def run(self, state: State, variant: Variant) -> State:
-        text = state.data.get("text", "") or ""
-        ents: List[str] = state.data.get("entities", []) or []
-        sents = split_sentences(text)
-
-        qs: List[str] = []
-        if ents:
-            for e in ents:
-                if "@" in e:
-                    qs.append(f"Who uses the email '{e}'?")
-                elif e.startswith("http"):
-                    qs.append(f"What is the purpose of the URL '{e}'?")
-                else:
-                    qs.append(f"What is {e}?")
-        else:
-            qs = [f"What is the main point of: '{s}'?" for s in sents]
-
-        state.data["questions"] = unique(qs)
+        records = _questions(state.data.get("text", "") or "", state.data.get("entities", []) or [],
+                             state.data.get("entity_spans"))
+        state.data["questions"] = list(records.questions)
+        state.data["question_records"] = records
         return state
 
+    @validate_io_batch(input_model=QuestorInput, output_model=QuestorOutput)
+    def run_batch(self, states: List[State], variants: List[Variant]) -> List[State]:
+        memo: Dict[Any, QuestionRecords] = {}  # variants of one document share text/entities
+        for state in states:
+            text = state.data.get("text", "") or ""
+            ents = state.data.get("entities", []) or []
+            key = (text, tuple(ents))
+            if key not in memo:
+                memo[key] = _questions(text, ents, state.data.get("entity_spans"))
+            state.data["questions"] = list(memo[key].questions)
+            state.data["question_records"] = memo[key].copy()
+        return states
+
+def _sentences(text: str) -> Tuple[List[str], List[int]]:
+    sents = split_sentences(text)
+    offsets: List[int] = []
+    pos = 0
+    for s in sents:
+        off = text.find(s, pos)
+        offsets.append(off)
+        pos = off + len(s) if off >= 0 else pos
+    return sents, offsets
+
+def _questions(text: str, ents: List[str], spans: Optional[Sequence[Any]] = None) -> QuestionRecords:
+    if ents:
+        items = [(e, entity_kind(e)) for e in ents]
+        offsets = first_offsets(text, ents, spans)
+    else:
+        sents, offsets = _sentences(text)
+        items = [(s, "sentence") for s in sents]
+    records = QuestionRecords()
+    seen = set()
+    for (entity, kind), off in zip(items, offsets):
+        q = QUESTION_TEMPLATES[kind].format(entity)
+        if q not in seen:  # unique questions, first occurrence wins
+            seen.add(q)
+            records.append(entity, kind, off, q)
+    return records
+
 register_step("Questor", lambda **kw: Questor(**kw))
 
 def quest(name: str = "Questor") -> Questor:
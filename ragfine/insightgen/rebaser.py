@@ -12,6 +12,8 @@ class Rebaser:
     """
     Final cosmetic changes driven by Variant (style_prefix/suffix).
     """
+    reads_variant = ("style_prefix", "style_suffix")
+
     def __init__(self, name: str = "Rebaser"):
         self.name = name
 
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Iterator, Optional
 import re
 
 from ..core.pipebase import State
@@ -9,32 +9,109 @@ from .io_models import RefinerInput, RefinerOutput
 
 Variant = Dict[str, Any]
 
+# One pass for all three rules. A match is a whole run of whitespace / arrows (anchored at
+# its start) that contains a newline or an arrow; runs are independent, so each is fixed
+# up on its own:
+#   - with arrows: all whitespace goes, each arrow becomes " → "
+#   - newlines only: [ \t] before each newline dropped, 3+ newlines squeezed to 2
+# Runs that are already normal ("\n", "\n\n", " → " between words) are skipped by the
+# lookahead, so typical text is copied at C speed without a Python call per line.
+_REFINE_RE = re.compile(r"(?=[\s→])(?<![\s→])(?!\n\n?[^\s→]| → [^\s→])[\s→]*[\n→][\s→]*")
+_NL3_RE = re.compile(r"\n{3,}")
+
+def _fix_run(m: "re.Match[str]") -> str:
+    run = m.group()
+    arrows = run.count("→")
+    if arrows:
+        return " → " * arrows
+    segs = run.split("\n")
+    run = "\n".join([s.rstrip(" \t") for s in segs[:-1]] + [segs[-1]])
+    return _NL3_RE.sub("\n\n", run)
+
+def refine_text(text: str, ensure_trailing_newline: bool = False) -> str:
+    """
+    Single-pass equivalent of: drop [ \\t] before newlines, squeeze 3+ newlines to one blank
+    line, normalise whitespace around '→' to ' → ', strip (+ optional trailing newline).
+    """
+    result = _REFINE_RE.sub(_fix_run, text).strip()
+    if ensure_trailing_newline and not result.endswith("\n"):
+        result += "\n"
+    return result
+
+def _held_from(text: str) -> int:
+    """Start of the trailing whitespace/arrow run: it may still merge with what comes next."""
+    i = len(text)
+    while i and (text[i - 1].isspace() or text[i - 1] == "→"):
+        i -= 1
+    return i
+
+class RefineStream:
+    """
+    Incremental refine_text: feed() chunks as they arrive and get back the refined text
+    that is final so far; close() returns the rest. "".join(outputs) == refine_text(full).
+    Only the trailing whitespace/arrow run of the input is held back between chunks.
+    """
+    __slots__ = ("ensure_trailing_newline", "_held", "_started")
+
+    def __init__(self, ensure_trailing_newline: bool = False):
+        self.ensure_trailing_newline = ensure_trailing_newline
+        self._held = ""
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        text = self._held + chunk if self._held else chunk
+        cut = _held_from(text)
+        self._held = text[cut:]
+        if not cut:
+            return ""
+        out = _REFINE_RE.sub(_fix_run, text[:cut] if cut < len(text) else text)
+        if not self._started:
+            out = out.lstrip()
+            self._started = True  # `out` ends with a non-space character
+        return out
+
+    def close(self) -> str:
+        out = _REFINE_RE.sub(_fix_run, self._held).rstrip() if self._held else ""
+        self._held = ""
+        if not self._started:
+            out = out.lstrip()
+        if self.ensure_trailing_newline:
+            out += "\n"  # the refined text never ends with whitespace
+        return out
+
+def refine_stream(chunks: Iterable[str], ensure_trailing_newline: bool = False) -> Iterator[str]:
+    """Refine an iterable of text chunks lazily (e.g. streamed model output)."""
+    stream = RefineStream(ensure_trailing_newline)
+    for chunk in chunks:
+        out = stream.feed(chunk)
+        if out:
+            yield out
+    tail = stream.close()
+    if tail:
+        yield tail
+
 class Refiner:
     """
     Light formatting: squeeze blank lines, trim, unify arrows, optional trailing newline.
+    Done in one pass (refine_text); stream() gives an incremental RefineStream.
     """
+    reads_variant = ()  # formatting rules are fixed at construction
+
     def __init__(self, name: str = "Refiner", ensure_trailing_newline: bool = False):
         self.name = name
         self.ensure_trailing_newline = ensure_trailing_newline
 
     @validate_io(input_model=RefinerInput, output_model=RefinerOutput)
     def run(self, state: State, variant: Variant) -> State:
-        result = state.data.get("result", "") or ""
-
-        result = re.sub(r"[ \t]+\n", "\n", result)
-        result = re.sub(r"\n{3,}", "\n\n", result)
-        result = re.sub(r"\s*→\s*", " → ", result)
-        result = result.strip()
-
-        if self.ensure_trailing_newline and not result.endswith("\n"):
-            result += "\n"
-
-        state.data["result"] = result
+        state.data["result"] = refine_text(state.data.get("result", "") or "", self.ensure_trailing_newline)
         return state
 
+    def stream(self) -> RefineStream:
+        return RefineStream(self.ensure_trailing_newline)
+
 register_step("Refiner", lambda **kw: Refiner(**kw))
 
 def refine(name: str = "Refiner", *, ensure_trailing_newline: bool = False) -> Refiner:
     return Refiner(name=name, ensure_trailing_newline=ensure_trailing_newline)
 
-register_step("refine", lambda **kw: refine(**kw))
\ No newline at end of file
+register_step("refine", lambda **kw: refine(**kw))
@@ -1,45 +1,50 @@
 from __future__ import annotations
 from typing import Any, Dict, List
-import re
 
 from ..core.pipebase import State
 from ..core.registry import register_step
 from ..steps.validators import validate_io
 from .io_models import SolverInput, SolverOutput
+from .utils import aligned_records, question_parts
 
 Variant = Dict[str, Any]
 
 class Solver:
     """
     Produces naive answers aligned with state.data['questions'].
-    Writes state.data['answers'].
+    Writes state.data['answers']. Uses Questor's question_records (entity + kind)
+    when present; otherwise the same (entity, kind) is parsed back from each
+    question, so both paths give identical answers.
     """
+    reads_variant = ()  # answers depend on the questions only
+
     def __init__(self, name: str = "Solver"):
         self.name = name
 
     @validate_io(input_model=SolverInput, output_model=SolverOutput)
     def run(self, state: State, variant: Variant) -> State:
+        records = aligned_records(state.data)
+        if records is not None:
+            state.data["answers"] = [_ANSWERS[kind].format(entity) for entity, kind in zip(records.entities, records.kinds)]
+            return state
         qs: List[str] = state.data.get("questions", []) or []
-        answers: List[str] = []
-
-        for q in qs:
-            m = re.search(r"'([^']+)'", q)
-            token = m.group(1) if m else None
-
-            if token and "@" in token:
-                answers.append(f"'{token}' appears to be a contact detail (email).")
-            elif token and token.startswith("http"):
-                answers.append(f"'{token}' is a referenced web link (URL).")
-            else:
-                cap = re.search(r"\b([A-ZÀ-ÖØ-öø-ÿ][\w'-]+)\b", q)
-                if cap:
-                    answers.append(f"{cap.group(1)} looks like a named entity mentioned in the text.")
-                else:
-                    answers.append("It refers to a key point inferred from the sentence.")
-
-        state.data["answers"] = answers
+        state.data["answers"] = [_answer(q) for q in qs]
         return state
 
+def _answer(question: str) -> str:
+    parts = question_parts(question)
+    if parts is not None:
+        entity, kind = parts
+        return _ANSWERS[kind].format(entity)
+    return _ANSWERS["sentence"]  # not a Questor question: nothing to point at
+
+_ANSWERS = {
+    "email": "'{}' appears to be a contact detail (email).",
+    "url": "'{}' is a referenced web link (URL).",
+    "name": "{} looks like a named entity mentioned in the text.",
+    "sentence": "It refers to a key point inferred from the sentence.",
+}
+
 register_step("Solver", lambda **kw: Solver(**kw))
 
 def solve(name: str = "Solver") -> Solver:
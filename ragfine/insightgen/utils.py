@@ -1,11 +1,57 @@
 from __future__ import annotations
+from array import array
 import re
-from typing import Iterable, List
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 WORD_RE = re.compile(r"[A-Za-zÀ-ÖØ-öø-ÿ]+(?:[-'][A-Za-zÀ-ÖØ-öø-ÿ]+)*")
 EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
 URL_RE = re.compile(r"\bhttps?://[^\s)]+", flags=re.IGNORECASE)
 
+# Single-pass entity scanner (see scan_entities). Emails and URLs are tried before
+# names, so TitleCase fragments inside them are not reported as names.
+ENTITY_RE = re.compile(
+    r"(?P<email>(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,})"
+    r"|(?P<url>[hH][tT][tT][pP][sS]?://[^\s)]+)"
+    r"|(?P<name>[A-ZÀ-ÖØ-Þ][A-Za-zÀ-ÖØ-öø-ÿ]*(?:[-'][A-Za-zÀ-ÖØ-öø-ÿ]+)*)"
+)
+_LETTERS = frozenset(
+    chr(c) for lo, hi in ((0x41, 0x5A), (0x61, 0x7A), (0xC0, 0xD6), (0xD8, 0xF6), (0xF8, 0xFF))
+    for c in range(lo, hi + 1)
+)
+ENTITY_KINDS = ("name", "email", "url")
+
+Span = Tuple[str, str, int, int]  # (entity, kind, start, end)
+
+def scan_entities(text: str, spans: bool = False) -> Tuple[List[str], List[Span]]:
+    """
+    One pass over `text`: TitleCase words ("name"), emails and URLs, deduplicated as
+    they are found. Returns (entities, spans); entities are ordered names, emails,
+    urls (first occurrence within each kind), as WORD_RE/EMAIL_RE/URL_RE used to give.
+    With spans=True every occurrence is also returned as (entity, kind, start, end).
+    """
+    names: Dict[str, None] = {}
+    emails: Dict[str, None] = {}
+    urls: Dict[str, None] = {}
+    occurrences: List[Span] = []
+    letters = _LETTERS
+    for m in ENTITY_RE.finditer(text):
+        kind = m.lastgroup
+        p = m.start()
+        if kind == "name":
+            # boundaries the regex leaves out (lookbehinds are slow): not inside a word like "eBay" / "non-Alice"
+            if p and (text[p - 1] in letters or (text[p - 1] in "-'" and p > 1 and text[p - 2] in letters)):
+                continue
+            names[m.group()] = None
+        elif kind == "email":
+            emails[m.group()] = None
+        else:
+            if p and (text[p - 1].isalnum() or text[p - 1] == "_"):  # URL_RE's leading \b
+                continue
+            urls[m.group()] = None
+        if spans:
+            occurrences.append((m.group(), kind, p, m.end()))
+    return [*names, *emails, *urls], occurrences
+
 _SENT_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-ZÀ-ÖØ-öø-ÿ])")
 
 def unique(seq: Iterable[str]) -> List[str]:
@@ -21,4 +67,119 @@ def split_sentences(text: str) -> List[str]:
     if not text:
         return []
     parts = _SENT_SPLIT.split(text.strip())
-    return [p.strip() for p in parts if p.strip()]
\ No newline at end of file
+    return [p.strip() for p in parts if p.strip()]
+
+# --- structured question records (Questor -> Solver / Integrator) ---
+Question = Tuple[str, str, int, str]  # (entity, kind, offset, question)
+
+def entity_kind(entity: str) -> str:
+    """'email', 'url' or 'name' for an entity string (as Questor always classified them)."""
+    if "@" in entity:
+        return "email"
+    if entity.startswith("http"):
+        return "url"
+    return "name"
+
+# Questor's question per entity kind (Solver parses them back with question_parts)
+QUESTION_TEMPLATES = {
+    "email": "Who uses the email '{}'?",
+    "url": "What is the purpose of the URL '{}'?",
+    "name": "What is {}?",
+    "sentence": "What is the main point of: '{}'?",
+}
+
+# most specific first: "What is {}?" would also match the url / sentence questions
+_QUESTION_RES = [
+    (kind, re.compile(re.escape(QUESTION_TEMPLATES[kind]).replace(re.escape("{}"), "(.+)"), re.S))
+    for kind in ("email", "url", "sentence", "name")
+]
+
+def question_parts(question: str) -> Optional[Tuple[str, str]]:
+    """(entity, kind) of a question built from QUESTION_TEMPLATES; None for any other question."""
+    for kind, rx in _QUESTION_RES:
+        m = rx.fullmatch(question)
+        if m:
+            entity = m.group(1)
+            return entity, (kind if kind == "sentence" else entity_kind(entity))
+    return None
+
+class QuestionRecords:
+    """
+    Column-backed question records: parallel entities / kinds / offsets / questions.
+    kind is one of ENTITY_KINDS or "sentence" (entity is then the sentence itself);
+    offset is the first position of the entity (sentence) in the source text, -1 if unknown.
+    Iterating yields (entity, kind, offset, question) tuples.
+    """
+    __slots__ = ("entities", "kinds", "offsets", "questions")
+
+    def __init__(self, entities: Sequence[str] = (), kinds: Sequence[str] = (),
+                 offsets: Iterable[int] = (), questions: Sequence[str] = ()):
+        self.entities: List[str] = list(entities)
+        self.kinds: List[str] = list(kinds)
+        self.offsets = array("q", offsets)
+        self.questions: List[str] = list(questions)
+
+    def append(self, entity: str, kind: str, offset: int, question: str) -> None:
+        self.entities.append(entity)
+        self.kinds.append(kind)
+        self.offsets.append(offset)
+        self.questions.append(question)
+
+    def copy(self) -> "QuestionRecords":
+        return QuestionRecords(self.entities, self.kinds, self.offsets, self.questions)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __getitem__(self, i: int) -> Question:
+        return self.entities[i], self.kinds[i], self.offsets[i], self.questions[i]
+
+    def __iter__(self) -> Iterator[Question]:
+        return zip(self.entities, self.kinds, self.offsets, self.questions)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, QuestionRecords):
+            return NotImplemented
+        return (self.questions == other.questions and self.entities == other.entities
+                and self.kinds == other.kinds and self.offsets == other.offsets)
+
+    def __repr__(self) -> str:
+        return f"QuestionRecords({list(self)!r})"
+
+    def __reduce__(self):
+        return (QuestionRecords, (self.entities, self.kinds, self.offsets, self.questions))
+
+def first_offsets(text: str, entities: Sequence[str], spans: Optional[Sequence[Span]] = None) -> List[int]:
+    """
+    First offset of each entity in text (-1 if absent). Exact from entity_spans when given;
+    otherwise str.find, resuming per kind after the previous hit (entities of one kind are
+    listed in first-occurrence order), so the common case stays one pass over the text.
+    """
+    known: Dict[str, int] = {}
+    if spans:
+        for ent, _, start, _ in spans:
+            known.setdefault(ent, start)
+    hints: Dict[str, int] = {}
+    out: List[int] = []
+    for e in entities:
+        off = known.get(e)
+        if off is None:
+            kind = entity_kind(e)
+            hint = hints.get(kind, 0)
+            off = text.find(e, hint)
+            if off < 0 and hint:
+                off = text.find(e)
+            if off >= 0:
+                hints[kind] = off
+        out.append(off)
+    return out
+
+def aligned_records(data: Dict[str, object]) -> Optional[QuestionRecords]:
+    """state.data['question_records'] if it still matches state.data['questions'], else None."""
+    records = data.get("question_records")
+    if not isinstance(records, QuestionRecords):
+        return None
+    qs = data.get("questions")
+    if qs is not None and qs != records.questions:  # questions edited after Questor
+        return None
+    return records
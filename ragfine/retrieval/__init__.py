@@ -0,0 +1,22 @@
+"""
+ragfine.retrieval
+-----------------
+Retrieval steps over local indexes (BM25, exact dense) and retrieval-quality metrics
+(recall@k, MRR, nDCG). Requires numpy (optional dependency: `pip install ragfine[retrieval]`).
+Load explicitly with: `from ragfine.steps import load_retrieval; load_retrieval()`
+or: `import ragfine.retrieval`
+"""
+
+from .bm25 import BM25Index, Retriever, TextStore, tokenize, read_corpus, open_bm25_index, hit_records, corpus_digest
+from .dense import DenseIndex, DenseRetriever, hashing_embedder, open_dense_index
+from .evaluation import RetrievalEvaluator, RetrievalEval, evaluate_rankings, rank_metrics, read_qrels
+
+from . import io_models
+
+__all__ = [
+    "BM25Index", "Retriever", "TextStore", "tokenize", "read_corpus", "open_bm25_index", "hit_records",
+    "corpus_digest",
+    "DenseIndex", "DenseRetriever", "hashing_embedder", "open_dense_index",
+    "RetrievalEvaluator", "RetrievalEval", "evaluate_rankings", "rank_metrics", "read_qrels",
+    "io_models",
+]
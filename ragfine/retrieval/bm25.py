@@ -0,0 +1,330 @@
+"""
+BM25 retrieval over an inverted index held in NumPy arrays.
+
+The index is CSR by term: postings of term t are docs[offsets[t]:offsets[t+1]]
+(ascending doc numbers, int32) with their precomputed BM25 weights (float32,
+k1 / b fixed at build time). A query gathers the postings of its terms,
+accumulates them per document in one vectorised pass and selects the top k
+with a partition (ties at the k-th score go to the lower doc number).
+
+    index = BM25Index.build(texts, ids=ids)
+    index.save("corpus.bm25")                       # directory of .npy + json
+    index = BM25Index.load("corpus.bm25")           # np.load(mmap_mode="r"), no re-tokenising
+    hits = index.search("who founded acme", k=10)   # [(doc number, score), ...]
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import hashlib, json, math, re
+
+import numpy as np
+
+from ..core.pipebase import State
+from ..core.registry import register_step
+from ..steps.validators import validate_io, validate_io_batch
+from .io_models import RetrieverInput, RetrieverOutput
+
+Variant = Dict[str, Any]
+Hit = Tuple[int, float]  # (doc number, score)
+
+_FORMAT = 1
+_TOKEN_RE = re.compile(r"\w+")
+_ARRAYS = ("docs", "weights", "offsets", "doc_len")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased \\w+ tokens (index and queries must use the same rule)."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def corpus_digest(texts: Iterable[str], ids: Optional[Sequence[Any]] = None) -> str:
+    """sha256 of the document texts and ids: which corpus an index was built from (meta["corpus"])."""
+    h = hashlib.sha256()
+    for text in texts:
+        raw = text.encode("utf-8")
+        h.update(len(raw).to_bytes(8, "little"))
+        h.update(raw)
+    h.update(json.dumps(list(ids) if ids is not None else None, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _is_current(meta: Dict[str, Any], corpus: Optional[Sequence[str]], ids: Optional[Sequence[Any]],
+                params: Dict[str, Any]) -> bool:
+    """
+    A saved index still matches the given corpus and the build parameters it records.
+    Without a corpus nothing could be rebuilt, so the saved index is taken as it is.
+    """
+    if corpus is None:
+        return True
+    if any(k in meta and meta[k] != v for k, v in params.items()):
+        return False
+    return meta.get("corpus") == corpus_digest(corpus, ids)
+
+
+class TextStore:
+    """Document texts as one UTF-8 blob + offsets; a text is decoded only when asked for."""
+    __slots__ = ("blob", "offsets")
+
+    def __init__(self, blob: "np.ndarray", offsets: "np.ndarray"):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> "TextStore":
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class BM25Index:
+    def __init__(self, vocab: Dict[str, int], docs: "np.ndarray", weights: "np.ndarray",
+                 offsets: "np.ndarray", doc_len: "np.ndarray", meta: Dict[str, Any],
+                 ids: Optional[List[Any]] = None, texts: Optional[TextStore] = None):
+        self.vocab = vocab
+        self.docs = docs
+        self.weights = weights
+        self.offsets = offsets
+        self.doc_len = doc_len
+        self.meta = meta
+        self.ids = ids
+        self.texts = texts
+
+    def __len__(self) -> int:
+        return int(self.meta["n_docs"])
+
+    # --- build ---
+    @classmethod
+    def build(cls, texts: Sequence[str], ids: Optional[Sequence[Any]] = None, *, k1: float = 1.5,
+              b: float = 0.75, store_texts: bool = True, block: int = 50_000) -> "BM25Index":
+        """
+        Tokenise once and build the postings. Documents are processed in blocks: each block's
+        (term, doc) pairs are counted with np.unique, so memory stays O(unique pairs).
+        """
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError(f"ids has {len(ids)} entries for {len(texts)} texts")
+        vocab: Dict[str, int] = {}
+        n = len(texts)
+        doc_len = np.zeros(n, dtype=np.int32)
+        blocks: List[Tuple["np.ndarray", "np.ndarray", "np.ndarray"]] = []
+        for lo in range(0, n, block):
+            term_ids: List[int] = []
+            lens: List[int] = []
+            for text in texts[lo:lo + block]:
+                toks = tokenize(text)
+                term_ids.extend([vocab.setdefault(t, len(vocab)) for t in toks])
+                lens.append(len(toks))
+            lens_arr = np.asarray(lens, dtype=np.int32)
+            doc_len[lo:lo + len(lens)] = lens_arr
+            doc_of_token = np.repeat(np.arange(lo, lo + len(lens), dtype=np.int64), lens_arr)
+            pairs, tf = np.unique(np.asarray(term_ids, dtype=np.int64) * n + doc_of_token, return_counts=True)
+            blocks.append((pairs // n, pairs % n, tf))
+
+        terms = np.concatenate([t for t, _, _ in blocks]) if blocks else np.zeros(0, np.int64)
+        docs = np.concatenate([d for _, d, _ in blocks]) if blocks else np.zeros(0, np.int64)
+        tf = np.concatenate([f for _, _, f in blocks]).astype(np.float32) if blocks else np.zeros(0, np.float32)
+        order = np.argsort(terms, kind="stable")  # blocks are in doc order: docs stay ascending per term
+        terms, docs, tf = terms[order], docs[order], tf[order]
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=offsets[1:])
+
+        avgdl = float(doc_len.mean()) if n else 0.0
+        df = np.diff(offsets).astype(np.float64)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        norm = k1 * (1.0 - b + b * doc_len / (avgdl or 1.0))
+        weights = (idf[terms] * tf * (k1 + 1.0) / (tf + norm[docs])).astype(np.float32)
+
+        meta = {"format": _FORMAT, "n_docs": n, "avgdl": avgdl, "k1": k1, "b": b,
+                "corpus": corpus_digest(texts, ids)}
+        return cls(vocab, docs.astype(np.int32), weights, offsets, doc_len, meta,
+                   list(ids) if ids is not None else None,
+                   TextStore.from_texts(texts) if store_texts else None)
+
+    # --- persistence ---
+    def save(self, path: "Union[str, Path]") -> str:
+        out = Path(path)
+        out.mkdir(parents=True, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(out / f"{name}.npy", getattr(self, name))
+        if self.texts is not None:
+            np.save(out / "texts.npy", self.texts.blob)
+            np.save(out / "text_offsets.npy", self.texts.offsets)
+        terms = [""] * len(self.vocab)
+        for t, i in self.vocab.items():
+            terms[i] = t
+        with open(out / "vocab.json", "w", encoding="utf-8") as fh:
+            json.dump(terms, fh, ensure_ascii=False)
+        with open(out / "meta.json", "w", encoding="utf-8") as fh:
+            json.dump({**self.meta, "ids": self.ids}, fh, ensure_ascii=False)
+        return str(out)
+
+    @classmethod
+    def load(cls, path: "Union[str, Path]", mmap: bool = True) -> "BM25Index":
+        """Arrays come back memory-mapped (mmap=True): pages are read on first use only."""
+        src = Path(path)
+        mode = "r" if mmap else None
+        with open(src / "meta.json", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if meta.get("format") != _FORMAT:
+            raise ValueError(f"Unsupported BM25 index format {meta.get('format')!r} in {src}")
+        ids = meta.pop("ids", None)
+        with open(src / "vocab.json", encoding="utf-8") as fh:
+            vocab = {t: i for i, t in enumerate(json.load(fh))}
+        arrays = {name: np.load(src / f"{name}.npy", mmap_mode=mode) for name in _ARRAYS}
+        texts = None
+        if (src / "texts.npy").exists():
+            texts = TextStore(np.load(src / "texts.npy", mmap_mode=mode),
+                              np.load(src / "text_offsets.npy", mmap_mode=mode))
+        return cls(vocab, meta=meta, ids=ids, texts=texts, **arrays)
+
+    # --- search ---
+    def _gather(self, query: str) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Postings (docs, weights) of the query terms, repeated terms counted once per occurrence."""
+        counts: Dict[int, int] = {}
+        for tok in tokenize(query):
+            tid = self.vocab.get(tok)
+            if tid is not None:
+                counts[tid] = counts.get(tid, 0) + 1
+        if not counts:
+            return np.zeros(0, np.int32), np.zeros(0, np.float32)
+        offs = self.offsets
+        parts = [(offs[t], offs[t + 1], c) for t, c in counts.items()]
+        docs = np.concatenate([self.docs[lo:hi] for lo, hi, _ in parts])
+        weights = np.concatenate([self.weights[lo:hi] * c if c > 1 else self.weights[lo:hi] for lo, hi, c in parts])
+        return docs, weights
+
+    def search(self, query: str, k: int = 10) -> List[Hit]:
+        """Top-k (doc number, score) by BM25, best first; ties go to the lower doc number."""
+        docs, weights = self._gather(query)
+        if not len(docs) or k <= 0:
+            return []
+        n = len(self)
+        if len(docs) * 8 >= n:  # dense accumulator is cheaper than sorting the candidates
+            scores = np.bincount(docs, weights=weights, minlength=n)
+            cand = np.flatnonzero(scores)
+            cand_scores = scores[cand]
+        else:
+            cand, inverse = np.unique(docs, return_inverse=True)
+            cand_scores = np.bincount(inverse.ravel(), weights=weights)
+        if len(cand) > k:
+            # argpartition picks arbitrarily among scores tied with the k-th one:
+            # keep all of them and let the lexsort below prefer lower doc numbers
+            kth = np.partition(cand_scores, len(cand) - k)[len(cand) - k]
+            top = np.flatnonzero(cand_scores >= kth)
+            cand, cand_scores = cand[top], cand_scores[top]
+        order = np.lexsort((cand, -cand_scores))[:k]
+        return [(int(cand[i]), float(cand_scores[i])) for i in order]
+
+    def search_many(self, queries: Iterable[str], k: int = 10) -> List[List[Hit]]:
+        return [self.search(q, k) for q in queries]
+
+    def doc_id(self, i: int) -> Any:
+        return self.ids[i] if self.ids is not None else i
+
+    def hits(self, query: str, k: int = 10, with_text: bool = True) -> List[Dict[str, Any]]:
+        """search() as records: {"id", "score", "rank"[, "text"]}."""
+        return hit_records(self.search(query, k), self.ids, self.texts if with_text else None)
+
+
+def hit_records(hits: List[Hit], ids: Optional[List[Any]] = None,
+                texts: Optional[TextStore] = None) -> List[Dict[str, Any]]:
+    """(doc number, score) pairs as the records retrieval steps store in state.data['retrieved']."""
+    out = []
+    for rank, (i, score) in enumerate(hits):
+        rec: Dict[str, Any] = {"id": ids[i] if ids is not None else i, "score": score, "rank": rank}
+        if texts is not None:
+            rec["text"] = texts[i]
+        out.append(rec)
+    return out
+
+
+# --- corpus sources ---
+def read_corpus(path: "Union[str, Path]") -> Tuple[List[str], Optional[List[Any]]]:
+    """*.jsonl with {"id", "text"} per line, else plain text with one document per line."""
+    texts: List[str] = []
+    ids: List[Any] = []
+    jsonl = str(path).endswith(".jsonl")
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if jsonl:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                texts.append(rec["text"])
+                ids.append(rec.get("id", len(ids)))
+            else:
+                texts.append(line.rstrip("\n"))
+    return texts, (ids if jsonl else None)
+
+
+def open_bm25_index(index_path: Optional[str] = None, corpus: Optional[Sequence[str]] = None,
+                    corpus_file: Optional[str] = None, ids: Optional[Sequence[Any]] = None,
+                    **build_kw: Any) -> BM25Index:
+    """
+    Load index_path if it exists, else build from corpus / corpus_file (and save to index_path).
+    A saved index built from another corpus (meta["corpus"] digest) or with other k1 / b is rebuilt.
+    """
+    if corpus is None and corpus_file is not None:
+        corpus, file_ids = read_corpus(corpus_file)
+        ids = ids if ids is not None else file_ids
+    if index_path and (Path(index_path) / "meta.json").exists():
+        index = BM25Index.load(index_path)
+        if _is_current(index.meta, corpus, ids, build_kw):
+            return index
+        del index  # stale: its mapped files are about to be overwritten
+    if corpus is None:
+        raise ValueError(f"BM25 index {index_path!r} not found and no corpus / corpus_file to build it from")
+    index = BM25Index.build(corpus, ids, **build_kw)
+    if index_path:
+        index.save(index_path)
+    return index
+
+
+# --- step ---
+class Retriever:
+    """
+    BM25 retrieval for state.data['query'].
+    Stores state.data['retrieved'] (list of {"id", "score", "rank", "text"}), best first.
+    The index is loaded (or built) once, when the step is constructed; variant['top_k']
+    overrides k.
+    """
+    reads_variant = ("top_k",)
+
+    def __init__(self, name: str = "Retriever", index_path: Optional[str] = None,
+                 corpus: Optional[Sequence[str]] = None, corpus_file: Optional[str] = None,
+                 ids: Optional[Sequence[Any]] = None, k: int = 10, k1: float = 1.5, b: float = 0.75,
+                 with_text: bool = True):
+        self.name = name
+        self.index_path = index_path
+        self.k = k
+        self.with_text = with_text
+        self.index = open_bm25_index(index_path, corpus, corpus_file, ids, k1=k1, b=b)
+
+    def cache_key(self) -> Any:
+        # step cache fingerprint: meta carries the corpus digest and k1 / b (the arrays are not hashed)
+        return (self.index_path, self.index.meta, len(self.index.vocab), self.k, self.with_text)
+
+    @validate_io(input_model=RetrieverInput, output_model=RetrieverOutput)
+    def run(self, state: State, variant: Variant) -> State:
+        k = int(variant.get("top_k", self.k))
+        state.data["retrieved"] = self.index.hits(state.data.get("query", "") or "", k, self.with_text)
+        return state
+
+    @validate_io_batch(input_model=RetrieverInput, output_model=RetrieverOutput)
+    def run_batch(self, states: List[State], variants: List[Variant]) -> List[State]:
+        memo: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}  # variants of one query share hits
+        for state, variant in zip(states, variants):
+            key = (state.data.get("query", "") or "", int(variant.get("top_k", self.k)))
+            if key not in memo:
+                memo[key] = self.index.hits(key[0], key[1], self.with_text)
+            state.data["retrieved"] = [dict(h) for h in memo[key]]
+        return states
+
+register_step("Retriever", lambda **kw: Retriever(**kw))
+register_step("bm25", lambda **kw: Retriever(**kw))
@@ -0,0 +1,280 @@
+"""
+Exact (brute-force) dense retrieval over a memory-mapped float32 matrix.
+
+Embeddings live in a .npy file opened with np.load(mmap_mode="r"). Queries are
+answered in batches: the matrix is walked in row blocks, each block is scored
+against all queries with one matrix multiply, and a running top-k per query is
+kept with a partition (ties at the k-th score go to the lower doc number), so
+only one block is resident at a time.
+
+Query (and corpus) vectors come from an embedder: a CALLABLE_REGISTRY name of a
+function List[str] -> (n, dim) array. "hashing_embedder" is built in: a signed
+feature-hashing vectoriser, deterministic and offline (for tests and smoke runs).
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import json, tempfile, zlib
+
+import numpy as np
+
+from ..core.pipebase import State
+from ..core.registry import register_step, register_fn, CALLABLE_REGISTRY
+from ..steps.validators import validate_io, validate_io_batch
+from .bm25 import TextStore, Hit, corpus_digest, hit_records, read_corpus, tokenize, _is_current
+from .io_models import RetrieverInput, RetrieverOutput
+
+Variant = Dict[str, Any]
+Embedder = Callable[[List[str]], Any]
+
+_FORMAT = 1
+METRICS = ("cosine", "ip")
+
+
+# --- built-in embedder ---
+def hashing_embedder(texts: Sequence[str], dim: int = 256) -> "np.ndarray":
+    """Signed feature hashing of tokenize() tokens (crc32, stable across runs), L2-normalised."""
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for tok in tokenize(text):
+            h = zlib.crc32(tok.encode("utf-8"))
+            out[row, h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    np.divide(out, norms, out=out, where=norms > 0)
+    return out
+
+register_fn("hashing_embedder", hashing_embedder)
+
+
+def resolve_embedder(embedder: "Union[str, Embedder]") -> Embedder:
+    if callable(embedder):
+        return embedder
+    if embedder not in CALLABLE_REGISTRY:
+        raise KeyError(f"Callable '{embedder}' not found in CALLABLE_REGISTRY")
+    return CALLABLE_REGISTRY[embedder]
+
+
+def _as_matrix(vectors: Any) -> "np.ndarray":
+    arr = np.asarray(vectors, dtype=np.float32)
+    return arr.reshape(1, -1) if arr.ndim == 1 else arr
+
+
+def _normalize(arr: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    return np.divide(arr, norms, out=np.zeros_like(arr), where=norms > 0)
+
+
+def _top_columns(scores: "np.ndarray", k: int) -> "np.ndarray":
+    """
+    (rows, k) column indices of each row's k best scores, in ascending column order.
+    Unlike argpartition, scores tied with the k-th one go to the leftmost columns.
+    """
+    kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1:k]
+    better = scores > kth
+    tied = scores == kth
+    need = k - better.sum(axis=1, keepdims=True)
+    keep = better | (tied & (np.cumsum(tied, axis=1) <= need))
+    return np.nonzero(keep)[1].reshape(len(scores), k)
+
+
+class DenseIndex:
+    def __init__(self, matrix: "np.ndarray", meta: Dict[str, Any],
+                 ids: Optional[List[Any]] = None, texts: Optional[TextStore] = None):
+        self.matrix = matrix  # (n, dim) float32, usually an np.memmap
+        self.meta = meta
+        self.ids = ids
+        self.texts = texts
+
+    def __len__(self) -> int:
+        return int(self.matrix.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1])
+
+    # --- build / persistence ---
+    @classmethod
+    def build(cls, path: "Union[str, Path]", texts: Sequence[str], embedder: Embedder,
+              ids: Optional[Sequence[Any]] = None, *, metric: str = "cosine",
+              store_texts: bool = True, batch: int = 1024) -> "DenseIndex":
+        """Embed texts in batches straight into <path>/vectors.npy (never all in RAM) and open it mapped."""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}")
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError(f"ids has {len(ids)} entries for {len(texts)} texts")
+        out = Path(path)
+        out.mkdir(parents=True, exist_ok=True)
+        first = _as_matrix(embedder(list(texts[:batch])))
+        mat = np.lib.format.open_memmap(out / "vectors.npy", mode="w+", dtype=np.float32,
+                                        shape=(len(texts), first.shape[1]))
+        for lo in range(0, len(texts), batch):
+            block = first if lo == 0 else _as_matrix(embedder(list(texts[lo:lo + batch])))
+            mat[lo:lo + len(block)] = _normalize(block) if metric == "cosine" else block
+        mat.flush()
+        del mat
+        if store_texts:
+            store = TextStore.from_texts(texts)
+            np.save(out / "texts.npy", store.blob)
+            np.save(out / "text_offsets.npy", store.offsets)
+        with open(out / "meta.json", "w", encoding="utf-8") as fh:
+            json.dump({"format": _FORMAT, "metric": metric, "corpus": corpus_digest(texts, ids),
+                       "ids": list(ids) if ids is not None else None}, fh, ensure_ascii=False)
+        return cls.load(out)
+
+    @classmethod
+    def from_vectors(cls, path: "Union[str, Path]", vectors: Any, ids: Optional[Sequence[Any]] = None,
+                     metric: str = "ip") -> "DenseIndex":
+        """Save precomputed embeddings (e.g. from an external model) as an index."""
+        out = Path(path)
+        out.mkdir(parents=True, exist_ok=True)
+        mat = _as_matrix(vectors)
+        np.save(out / "vectors.npy", _normalize(mat) if metric == "cosine" else mat)
+        with open(out / "meta.json", "w", encoding="utf-8") as fh:
+            json.dump({"format": _FORMAT, "metric": metric, "ids": list(ids) if ids is not None else None},
+                      fh, ensure_ascii=False)
+        return cls.load(out)
+
+    @classmethod
+    def load(cls, path: "Union[str, Path]") -> "DenseIndex":
+        src = Path(path)
+        with open(src / "meta.json", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if meta.get("format") != _FORMAT:
+            raise ValueError(f"Unsupported dense index format {meta.get('format')!r} in {src}")
+        ids = meta.pop("ids", None)
+        texts = None
+        if (src / "texts.npy").exists():
+            texts = TextStore(np.load(src / "texts.npy", mmap_mode="r"),
+                              np.load(src / "text_offsets.npy", mmap_mode="r"))
+        return cls(np.load(src / "vectors.npy", mmap_mode="r"), meta, ids, texts)
+
+    # --- search ---
+    def _block_rows(self) -> int:
+        return max(1024, (64 << 20) // max(self.dim * 4, 1))  # ~64 MB of the matrix per block
+
+    def search_many(self, queries: Any, k: int = 10, block_rows: Optional[int] = None) -> List[List[Hit]]:
+        """
+        Top-k (doc number, score) per query row, best first (ties: lower doc number).
+        One pass over the matrix for the whole batch.
+        """
+        q = _as_matrix(queries)
+        if self.meta.get("metric") == "cosine":
+            q = _normalize(q)
+        n, m = len(self), q.shape[0]
+        k = min(k, n)
+        if k <= 0 or m == 0:
+            return [[] for _ in range(m)]
+        rows = block_rows or self._block_rows()
+        best_idx = np.zeros((m, 0), dtype=np.int64)
+        best_val = np.zeros((m, 0), dtype=np.float32)
+        for lo in range(0, n, rows):
+            scores = q @ np.asarray(self.matrix[lo:lo + rows]).T  # (m, block): rows stay contiguous
+            if scores.shape[1] > k:
+                part = _top_columns(scores, k)
+                vals = np.take_along_axis(scores, part, axis=1)
+            else:
+                part, vals = np.broadcast_to(np.arange(scores.shape[1]), scores.shape), scores
+            # columns stay in ascending doc order (earlier blocks first), so "leftmost" = lower doc
+            idx = np.concatenate([best_idx, part + lo], axis=1)
+            val = np.concatenate([best_val, vals], axis=1)
+            if idx.shape[1] > k:  # keep the running top k per query
+                keep = _top_columns(val, k)
+                idx, val = np.take_along_axis(idx, keep, axis=1), np.take_along_axis(val, keep, axis=1)
+            best_idx, best_val = idx, val
+        results = []
+        for j in range(m):
+            order = np.lexsort((best_idx[j], -best_val[j]))
+            results.append([(int(best_idx[j, i]), float(best_val[j, i])) for i in order])
+        return results
+
+    def search(self, query_vector: Any, k: int = 10) -> List[Hit]:
+        return self.search_many(query_vector, k)[0]
+
+    def doc_id(self, i: int) -> Any:
+        return self.ids[i] if self.ids is not None else i
+
+    def records(self, hits: List[Hit], with_text: bool = True) -> List[Dict[str, Any]]:
+        return hit_records(hits, self.ids, self.texts if with_text else None)
+
+
+def open_dense_index(index_path: str, embedder: Embedder, corpus: Optional[Sequence[str]] = None,
+                     corpus_file: Optional[str] = None, ids: Optional[Sequence[Any]] = None,
+                     **build_kw: Any) -> DenseIndex:
+    """
+    Load index_path if it exists, else embed corpus / corpus_file into it.
+    A saved index built from another corpus (meta["corpus"] digest) or metric is rebuilt.
+    """
+    if corpus is None and corpus_file is not None:
+        corpus, file_ids = read_corpus(corpus_file)
+        ids = ids if ids is not None else file_ids
+    if (Path(index_path) / "meta.json").exists():
+        index = DenseIndex.load(index_path)
+        if _is_current(index.meta, corpus, ids, build_kw):
+            return index
+        del index  # stale: its mapped files are about to be overwritten
+    if corpus is None:
+        raise ValueError(f"Dense index {index_path!r} not found and no corpus / corpus_file to build it from")
+    return DenseIndex.build(index_path, corpus, embedder, ids, **build_kw)
+
+
+# --- step ---
+class DenseRetriever:
+    """
+    Exact dense retrieval for state.data['query'] against a memory-mapped embedding matrix.
+    Stores state.data['retrieved'] (list of {"id", "score", "rank", "text"}), like Retriever.
+    `embedder` names a CALLABLE_REGISTRY function (texts -> vectors); run_batch embeds and
+    scores all queries of a batch together. variant['top_k'] overrides k.
+    Without index_path the corpus is embedded into a temporary directory owned by the step
+    (removed with it); with one, the index is saved there and reused while the corpus matches.
+    """
+    reads_variant = ("top_k",)
+
+    def __init__(self, name: str = "DenseRetriever", index_path: Optional[str] = None,
+                 embedder: str = "hashing_embedder", corpus: Optional[Sequence[str]] = None,
+                 corpus_file: Optional[str] = None, ids: Optional[Sequence[Any]] = None,
+                 k: int = 10, metric: str = "cosine", block_rows: Optional[int] = None,
+                 with_text: bool = True):
+        self.name = name
+        self.index_path = index_path
+        self.embedder = embedder
+        self.k = k
+        self.block_rows = block_rows
+        self.with_text = with_text
+        self._embed = resolve_embedder(embedder)
+        self._tmp: Optional[tempfile.TemporaryDirectory] = None
+        if index_path is None:
+            if corpus is None and corpus_file is None:
+                raise ValueError("DenseRetriever needs index_path (a saved index) or a corpus / corpus_file")
+            self._tmp = tempfile.TemporaryDirectory(prefix="ragfine-dense-")
+        self.index = open_dense_index(index_path or self._tmp.name, self._embed, corpus, corpus_file, ids,
+                                      metric=metric)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # the temporary directory stays with the original; a copy carries the index arrays
+        return {**self.__dict__, "_tmp": None}
+
+    def cache_key(self) -> Any:
+        # meta carries the corpus digest, so a rebuilt or temporary index is keyed by its content
+        return (self.index_path, self.embedder, self.index.meta, len(self.index), self.k, self.with_text)
+
+    def _retrieve(self, queries: List[str], ks: List[int]) -> List[List[Dict[str, Any]]]:
+        uniq = list(dict.fromkeys(queries))
+        hits = self.index.search_many(self._embed(uniq), max(ks), self.block_rows)
+        by_query = dict(zip(uniq, hits))
+        return [self.index.records(by_query[q][:k], self.with_text) for q, k in zip(queries, ks)]
+
+    @validate_io(input_model=RetrieverInput, output_model=RetrieverOutput)
+    def run(self, state: State, variant: Variant) -> State:
+        k = int(variant.get("top_k", self.k))
+        state.data["retrieved"] = self._retrieve([state.data.get("query", "") or ""], [k])[0]
+        return state
+
+    @validate_io_batch(input_model=RetrieverInput, output_model=RetrieverOutput)
+    def run_batch(self, states: List[State], variants: List[Variant]) -> List[State]:
+        queries = [s.data.get("query", "") or "" for s in states]
+        ks = [int(v.get("top_k", self.k)) for v in variants]
+        for state, hits in zip(states, self._retrieve(queries, ks)):
+            state.data["retrieved"] = hits
+        return states
+
+register_step("DenseRetriever", lambda **kw: DenseRetriever(**kw))
@@ -0,0 +1,309 @@
+"""
+Retrieval-quality metrics (recall@k, MRR, nDCG@k) for many queries × variants at once.
+
+Relevance judgements (qrels) are {query id: {doc id: grade}} (or an iterable of
+relevant doc ids per query, grade 1). Ranked lists are turned into one
+(rows, depth) gain matrix and every metric is a handful of NumPy operations
+over it; ideal DCGs are computed once per query, when qrels are loaded.
+
+RetrievalEvaluator streams: rankings are buffered and scored `batch` rows at a
+time, and only per-variant sums are kept, so a sweep can drop its reports:
+
+    ev = RetrievalEvaluator(qrels, ks=(1, 5, 10), variants=grid)
+    for _ in pipe.run_many(queries, variants=grid, retain=ev):  # ev(report), then final_state is dropped
+        pass
+    ev.rows()  # [{"index": 0, "variant": {...}, "queries": 100, "recall@1": ..., "mrr": ...}, ...]
+
+Gains are linear in the grade (trec_eval's default); a doc id repeated in a
+ranking counts once, at its first position. recall@k / nDCG@k look at the top k,
+MRR at the whole ranking. Queries without judged relevant documents are skipped
+and counted in `skipped`.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+import hashlib
+
+import numpy as np
+
+from ..core.pipebase import PipelineReport, State
+from ..core.registry import register_step
+from ..steps.validators import validate_io, validate_io_batch
+from .io_models import RetrievalEvalInput, RetrievalEvalOutput
+
+Variant = Dict[str, Any]
+Qrels = Mapping[Any, Union[Mapping[Any, float], Iterable[Any]]]
+
+
+def _as_grades(judged: Any) -> Dict[Any, float]:
+    if isinstance(judged, Mapping):
+        return {d: float(g) for d, g in judged.items()}
+    return {d: 1.0 for d in judged}
+
+
+def read_qrels(path: "Union[str, Path]") -> Dict[str, Dict[str, float]]:
+    """TREC qrels file: "query_id iteration doc_id grade" per line (ids kept as strings)."""
+    qrels: Dict[str, Dict[str, float]] = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) < 4:
+                continue
+            qid, _, doc, grade = parts[:4]
+            qrels.setdefault(qid, {})[doc] = float(grade)
+    return qrels
+
+
+def metric_names(ks: Sequence[int]) -> List[str]:
+    return [f"recall@{k}" for k in ks] + [f"ndcg@{k}" for k in ks] + ["mrr"]
+
+
+def ranked_ids(retrieved: Sequence[Any], id_key: str = "id") -> List[Any]:
+    """Doc ids of state.data['retrieved'] records (plain ids are passed through)."""
+    return [r[id_key] if isinstance(r, Mapping) else r for r in retrieved]
+
+
+def _qrels_digest(rows: Dict[Any, int], grades: List[Dict[Any, float]]) -> str:
+    """Content hash of the judgements: sorted (query, doc, grade) triples."""
+    triples = sorted((repr(q), repr(d), g) for q, r in rows.items() for d, g in grades[r].items())
+    h = hashlib.sha256()
+    for q, d, g in triples:
+        h.update(f"{q}\x00{d}\x00{g!r}\x01".encode("utf-8"))
+    return h.hexdigest()
+
+
+# --- vectorised core ---
+class JudgementTable:
+    """qrels indexed by row: grade dicts, relevant counts and ideal DCG@1..depth per query."""
+
+    def __init__(self, qrels: Qrels, depth: int):
+        self.depth = depth
+        self.row: Dict[Any, int] = {}
+        self.grades: List[Dict[Any, float]] = []
+        ideal = []
+        for qid, judged in qrels.items():
+            grades = _as_grades(judged)
+            self.row[qid] = len(self.grades)
+            self.grades.append(grades)
+            top = sorted((g for g in grades.values() if g > 0), reverse=True)[:depth]
+            ideal.append(top + [0.0] * (depth - len(top)))
+        self.n_rel = np.array([sum(1 for g in gr.values() if g > 0) for gr in self.grades], dtype=np.float64)
+        self.discount = 1.0 / np.log2(np.arange(2, depth + 2, dtype=np.float64))
+        ideal_arr = np.array(ideal, dtype=np.float64).reshape(len(ideal), depth)
+        self.idcg = np.cumsum(ideal_arr * self.discount, axis=1)  # (queries, depth)
+        self.digest = _qrels_digest(self.row, self.grades)
+
+    def gains(self, rows: Sequence[int], rankings: Sequence[Sequence[Any]]) -> "np.ndarray":
+        """(len(rows), depth) grades of the ranked docs; short lists are zero-padded."""
+        return self.judge(rows, rankings)[0]
+
+    def judge(self, rows: Sequence[int], rankings: Sequence[Sequence[Any]]) -> "Tuple[np.ndarray, np.ndarray]":
+        """
+        gains() plus the rank (1-based, 0 = none) of the first relevant doc in the
+        whole ranking, not just the top `depth`. Repeated doc ids count once, at
+        their first position.
+        """
+        depth, grades = self.depth, self.grades
+        out = np.zeros((len(rows), depth), dtype=np.float64)
+        first = np.zeros(len(rows), dtype=np.int64)
+        for i, (r, ranked) in enumerate(zip(rows, rankings)):
+            g = grades[r]
+            seen: set = set()
+            for d in ranked:
+                if d in seen:
+                    continue
+                seen.add(d)
+                rank, grade = len(seen), g.get(d, 0.0)
+                if rank <= depth:
+                    out[i, rank - 1] = grade
+                if grade > 0 and not first[i]:
+                    first[i] = rank
+                if first[i] and rank >= depth:
+                    break
+        return out, first
+
+
+def rank_metrics(gains: "np.ndarray", n_rel: "np.ndarray", idcg: "np.ndarray",
+                 discount: "np.ndarray", ks: Sequence[int],
+                 first_rel: "Optional[np.ndarray]" = None) -> "np.ndarray":
+    """
+    Metrics for a batch of rankings, columns in metric_names(ks) order.
+    gains: (n, depth) grades by rank; n_rel: (n,) relevant docs per query (> 0);
+    idcg: (n, depth) ideal DCG@1..depth; discount: (depth,) 1 / log2(rank + 2);
+    first_rel: (n,) rank of the first relevant doc over the full ranking (0 = none),
+    else MRR only sees the top `depth` of `gains`.
+    """
+    hits = np.cumsum(gains > 0, axis=1)             # relevant docs found by rank
+    dcg = np.cumsum(gains * discount, axis=1)
+    cols = np.asarray(ks) - 1
+    recall = hits[:, cols] / n_rel[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ndcg = np.where(idcg[:, cols] > 0, dcg[:, cols] / idcg[:, cols], 0.0)
+    if first_rel is None:
+        found = gains > 0
+        first_rel = np.where(found.any(axis=1), found.argmax(axis=1) + 1, 0)
+    with np.errstate(divide="ignore"):
+        mrr = np.where(first_rel > 0, 1.0 / first_rel, 0.0)
+    return np.column_stack([recall, ndcg, mrr])
+
+
+def evaluate_rankings(qrels: Qrels, query_ids: Sequence[Any], rankings: Sequence[Sequence[Any]],
+                      ks: Sequence[int] = (1, 5, 10)) -> Dict[str, "np.ndarray"]:
+    """Per-query metrics ({name: (n,) array}, NaN for unjudged queries) in one batched pass."""
+    table = JudgementTable(qrels, max(ks))
+    return dict(zip(metric_names(ks), _score(table, query_ids, rankings, ks).T))
+
+
+def _score(table: JudgementTable, query_ids: Sequence[Any], rankings: Sequence[Sequence[Any]],
+           ks: Sequence[int]) -> "np.ndarray":
+    out = np.full((len(query_ids), 2 * len(ks) + 1), np.nan)
+    rows = np.array([table.row.get(q, -1) for q in query_ids], dtype=np.int64)
+    ok = rows >= 0
+    ok[ok] = table.n_rel[rows[ok]] > 0
+    if ok.any():
+        sel = np.flatnonzero(ok)
+        r = rows[sel]
+        gains, first = table.judge(r.tolist(), [rankings[i] for i in sel])
+        out[sel] = rank_metrics(gains, table.n_rel[r], table.idcg[r], table.discount, ks, first)
+    return out
+
+
+# --- streaming aggregation ---
+class RetrievalEvaluator:
+    """
+    Running per-variant means of recall@k / nDCG@k / MRR.
+
+    add(variant_key, query_id, ranked) buffers one ranking; add_report(report) (also
+    the instance itself, so it can be passed as retain=) takes the variant from
+    report.info["index"], the query id from state.data[query_key] (or report.info["doc"])
+    and the ranking from state.data['retrieved']. Buffered rows are scored `batch`
+    at a time; memory is O(variants + batch), whatever the number of reports.
+    """
+
+    def __init__(self, qrels: Qrels, ks: Sequence[int] = (1, 5, 10),
+                 variants: Optional[Sequence[Variant]] = None, query_key: str = "query_id",
+                 id_key: str = "id", batch: int = 1024):
+        ks = tuple(sorted(set(int(k) for k in ks)))
+        if not ks or ks[0] < 1:
+            raise ValueError(f"ks must be positive ranks (got {ks})")
+        if batch < 1:
+            raise ValueError("batch must be >= 1")
+        self.ks = ks
+        self.metrics = metric_names(ks)
+        self.variants = variants
+        self.query_key = query_key
+        self.id_key = id_key
+        self.batch = batch
+        self.table = JudgementTable(qrels, ks[-1])
+        self._slot: Dict[Hashable, int] = {}   # variant key -> row of _sums
+        self._sums = np.zeros((0, len(self.metrics)), dtype=np.float64)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._pending: List[Tuple[int, Any, List[Any]]] = []
+        self.skipped = 0  # rankings of queries without relevant judgements
+
+    # --- input ---
+    def add(self, variant_key: Hashable, query_id: Any, ranked: Sequence[Any]) -> None:
+        slot = self._slot.get(variant_key)
+        if slot is None:
+            slot = self._slot[variant_key] = len(self._slot)
+        self._pending.append((slot, query_id, ranked_ids(ranked, self.id_key)))
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def add_report(self, report: PipelineReport) -> None:
+        st = report.final_state
+        if st is None:
+            raise ValueError("report has no final_state (dropped by retain=?); pass the evaluator as retain=")
+        qid = st.data.get(self.query_key, report.info.get("doc"))
+        self.add(report.info.get("index", 0), qid, st.data.get("retrieved") or [])
+
+    __call__ = add_report
+
+    def consume(self, reports: Iterable[PipelineReport]) -> "RetrievalEvaluator":
+        for rep in reports:
+            self.add_report(rep)
+        return self
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        slots = np.array([p[0] for p in pending], dtype=np.int64)
+        scores = _score(self.table, [p[1] for p in pending], [p[2] for p in pending], self.ks)
+        ok = ~np.isnan(scores[:, 0])
+        self.skipped += int((~ok).sum())
+        n = len(self._slot)
+        if n > len(self._counts):  # new variants seen in this batch
+            self._sums = np.vstack([self._sums, np.zeros((n - len(self._counts), self._sums.shape[1]))])
+            self._counts = np.concatenate([self._counts, np.zeros(n - len(self._counts), dtype=np.int64)])
+        np.add.at(self._sums, slots[ok], scores[ok])
+        self._counts += np.bincount(slots[ok], minlength=n)
+
+    # --- output ---
+    def results(self) -> Dict[Hashable, Dict[str, float]]:
+        """{variant key: {"queries": n, metric: mean, ...}} for every variant seen so far."""
+        self.flush()
+        out: Dict[Hashable, Dict[str, float]] = {}
+        for key, slot in self._slot.items():
+            n = int(self._counts[slot])
+            means = self._sums[slot] / n if n else np.full(len(self.metrics), np.nan)
+            out[key] = {"queries": n, **{m: float(v) for m, v in zip(self.metrics, means)}}
+        return out
+
+    def rows(self, sort_by: Optional[str] = None) -> List[Dict[str, Any]]:
+        """results() as a list of rows (with the variant dict when `variants` was given), best first by sort_by."""
+        rows = []
+        for key, res in self.results().items():
+            row: Dict[str, Any] = {"index": key}
+            if self.variants is not None and isinstance(key, int):
+                row["variant"] = self.variants[key]
+            rows.append({**row, **res})
+        if sort_by is not None:
+            rows.sort(key=lambda r: -np.nan_to_num(r[sort_by], nan=-np.inf))  # unscored variants last
+        return rows
+
+
+# --- step ---
+class RetrievalEval:
+    """
+    Scores state.data['retrieved'] against qrels for state.data[query_key].
+    Stores state.data['retrieval_metrics'] ({metric: value}; empty for unjudged queries).
+    run_batch scores all states of a batch in one vectorised pass.
+    """
+    reads_variant = ()  # the ranking already reflects the variant
+    cache_version = 2   # MRR over the full, de-duplicated ranking
+
+    def __init__(self, name: str = "RetrievalEval", qrels: Optional[Qrels] = None,
+                 qrels_file: Optional[str] = None, ks: Sequence[int] = (1, 5, 10),
+                 query_key: str = "query_id", id_key: str = "id"):
+        if qrels is None and qrels_file is None:
+            raise ValueError("RetrievalEval needs qrels or qrels_file")
+        self.name = name
+        self.qrels_file = qrels_file
+        self.ks = tuple(sorted(set(int(k) for k in ks)))
+        self.query_key = query_key
+        self.id_key = id_key
+        self.metrics = metric_names(self.ks)
+        self.table = JudgementTable(qrels if qrels is not None else read_qrels(qrels_file), self.ks[-1])
+
+    def cache_key(self) -> Any:
+        return (self.table.digest, self.ks, self.query_key, self.id_key)
+
+    def _score_states(self, states: List[State]) -> None:
+        qids = [s.data.get(self.query_key) for s in states]
+        rankings = [ranked_ids(s.data.get("retrieved") or [], self.id_key) for s in states]
+        for state, row in zip(states, _score(self.table, qids, rankings, self.ks)):
+            state.data["retrieval_metrics"] = (
+                {} if np.isnan(row[0]) else {m: float(v) for m, v in zip(self.metrics, row)})
+
+    @validate_io(input_model=RetrievalEvalInput, output_model=RetrievalEvalOutput)
+    def run(self, state: State, variant: Variant) -> State:
+        self._score_states([state])
+        return state
+
+    @validate_io_batch(input_model=RetrievalEvalInput, output_model=RetrievalEvalOutput)
+    def run_batch(self, states: List[State], variants: List[Variant]) -> List[State]:
+        self._score_states(states)
+        return states
+
+register_step("RetrievalEval", lambda **kw: RetrievalEval(**kw))
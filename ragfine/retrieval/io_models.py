@@ -0,0 +1,18 @@
+from __future__ import annotations
+from typing import Any, Dict, List
+from pydantic import BaseModel, Field
+
+# Retriever
+class RetrieverInput(BaseModel):
+    query: str = Field(..., min_length=1)
+
+class RetrieverOutput(BaseModel):
+    retrieved: List[Dict[str, Any]]
+
+# RetrievalEval
+class RetrievalEvalInput(BaseModel):
+    retrieved: List[Dict[str, Any]]
+    query_id: Any = None
+
+class RetrievalEvalOutput(BaseModel):
+    retrieval_metrics: Dict[str, float]
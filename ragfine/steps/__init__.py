@@ -11,6 +11,8 @@ Opt-in (NOT auto-loaded here):
 - ragfine.insightgen  → domain steps (Entifier, Questor, Solver, Integrator, Refiner, Rebaser)
   Load explicitly with: `from ragfine.steps import load_insightgen; load_insightgen()`
   or: `import ragfine.insightgen`
+- ragfine.retrieval   → retrieval steps (Retriever / BM25, DenseRetriever); needs numpy
+  Load explicitly with: `from ragfine.steps import load_retrieval; load_retrieval()`
 """
 
 # --- Always load built-in flow steps (side-effect: registration) ---
@@ -22,7 +24,7 @@ from .sync_flow import BranchStep, SplitMerge, branch, split_merge
 from .async_flow import AsyncBranchStep, AsyncSplitMerge as AsyncSplitMerge
 
 # --- Validation utilities are lightweight; export them directly ---
-from .validators import validate_io
+from .validators import validate_io, validate_io_batch, set_validation_mode, validation_mode
 
 # --- Opt-in loader for domain (insight generation) steps ---
 def load_insightgen() -> None:
@@ -33,6 +35,13 @@ def load_insightgen() -> None:
     import ragfine.insightgen  # noqa: F401
 
 
+def load_retrieval() -> None:
+    """
+    Import 'ragfine.retrieval' to register its steps (kept opt-in: it needs numpy).
+    """
+    import ragfine.retrieval  # noqa: F401
+
+
 __all__ = [
     # submodules (flow)
     "insightgen",
@@ -51,9 +60,13 @@ __all__ = [
 
     # validation tools
     "validate_io",
+    "validate_io_batch",
+    "set_validation_mode",
+    "validation_mode",
 
     # opt-in loader for domain steps
     "load_insightgen",
+    "load_retrieval",
 ]
 
 # USAGE:
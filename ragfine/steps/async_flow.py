@@ -1,5 +1,7 @@
 from ..core.registry import register_step
 from ..core.pipebase import _normalize_step, _run_steps_inline, _run_step_async
+from ..core.tracing import span
+from ..core.cow import CowState
 from typing import Any, Dict, List, Callable, Protocol, Iterable, Optional, Union
 import copy
 # --- Async helpers and imports ---
@@ -17,8 +19,8 @@ class AsyncBranchStep:
     ):
         self.name = name
         self._pred = predicate
-        self._then = then_steps
-        self._else = else_steps or []
+        self._then = [_normalize_step(s) for s in (then_steps or [])]
+        self._else = [_normalize_step(s) for s in (else_steps or [])]
         self._nested_step_timeout = nested_step_timeout
 
     async def run(self, state: "State", variant: "Variant") -> "State":
@@ -34,7 +36,47 @@ class AsyncBranchStep:
         return s
 
 # --- Async Fan-Out/Fan-In with optional concurrency -----------------------
+_DEFAULT_WINDOW = 64
+
+
+async def _aenumerate(items: Any):
+    """enumerate() over a sync or async iterable, pulled lazily; closing it closes the underlying iterator."""
+    i = 0
+    if hasattr(items, "__aiter__"):
+        it = items.__aiter__()
+        try:
+            while True:
+                try:
+                    item = await it.__anext__()
+                except StopAsyncIteration:
+                    return
+                yield i, item
+                i += 1
+        finally:
+            if hasattr(it, "aclose"):  # e.g. the caller's async generator, stopped early on error
+                await it.aclose()
+    else:
+        for item in items:
+            yield i, item
+            i += 1
+
+
 class AsyncSplitMerge:
+    """
+    Async fan-out/fan-in. items_fn may return (or await to) a sync or async iterable;
+    items are pulled lazily and at most `window` of them are in flight (default:
+    item_concurrency, else 64), so the item stream is never listed.
+
+    ordered:   merge sub-states in item order (default) or, with False, in completion order.
+               Items finishing ahead of a slower earlier one keep their slot free: their
+               sub-states wait in a reorder buffer of up to `window` more.
+    aggregate: incremental reducer (acc, sub_state, variant) -> acc, sync or async,
+               called as each sub-state is ready; sub-states are not kept. `acc` starts
+               as a copy-on-write fork of the parent (CowState) and is returned as the
+               step's result; items are always mapped from the unmodified parent, so they
+               never see folded data. Replaces aggregate_fn (parent, [sub_states], variant),
+               which sees the whole list.
+    """
     def __init__(
         self,
         name: str,
@@ -47,17 +89,28 @@ class AsyncSplitMerge:
         item_concurrency: "Optional[int]" = None,
         per_substep_timeout: "Optional[float]" = None,
         per_item_timeout: "Optional[float]" = None,
+        window: "Optional[int]" = None,
+        ordered: bool = True,
+        aggregate: "Callable[[State, State, Variant], Any] | None" = None,
     ):
+        if aggregate is not None and aggregate_fn is not None:
+            raise ValueError("AsyncSplitMerge takes aggregate (incremental) or aggregate_fn (whole list), not both")
+        window = window or item_concurrency or _DEFAULT_WINDOW
+        if window < 1:
+            raise ValueError("window must be >= 1")
         self.name = name
         self._items_fn = items_fn
-        self._sub_steps = sub_steps
+        self._sub_steps = [_normalize_step(s) for s in sub_steps]
         self._map_item_to_state = map_item_to_state or self._default_map_item_to_state
         self._variant_per_item_fn = variant_per_item_fn or (lambda item, v: v)
         self._aggregate_fn = aggregate_fn or self._default_aggregate
+        self._aggregate = aggregate
         self._isolate_parent = isolate_parent
         self._item_concurrency = item_concurrency
         self._per_substep_timeout = per_substep_timeout
         self._per_item_timeout = per_item_timeout
+        self._window = window
+        self._ordered = ordered
 
     @staticmethod
     def _default_map_item_to_state(item: Any, parent_state: "State") -> "State":
@@ -72,43 +125,84 @@ class AsyncSplitMerge:
         parent_state.data["fan_results"] = [ss.data for ss in sub_states]
         return parent_state
 
+    async def _process_item(self, item: Any, parent: "State", variant: "Variant") -> "State":
+        sub_state = self._map_item_to_state(item, parent)
+        v_val = self._variant_per_item_fn(item, variant)
+        sub_variant = await v_val if inspect.isawaitable(v_val) else v_val
+
+        async def run_substeps():
+            s = sub_state
+            for st in self._sub_steps:
+                s = await _run_step_async(st, s, sub_variant, self._per_substep_timeout)
+            return s
+
+        with span("item", "item", step=self.name):
+            return await asyncio.wait_for(run_substeps(), timeout=self._per_item_timeout) \
+                   if self._per_item_timeout else await run_substeps()
+
     async def run(self, state: "State", variant: "Variant") -> "State":
         parent = copy.deepcopy(state) if self._isolate_parent else state
 
-        # items_fn may be sync or async
+        # items_fn may be sync or async, and return a sync or async iterable
         items_val = self._items_fn(parent, variant)
-        items = list(await items_val) if inspect.isawaitable(items_val) else list(items_val)
+        items = await items_val if inspect.isawaitable(items_val) else items_val
 
+        # the window bounds tasks in flight; (ordered) up to `window` finished ones wait for their turn
+        window, ordered = self._window, self._ordered
+        sem = asyncio.Semaphore(self._item_concurrency) \
+            if self._item_concurrency and self._item_concurrency < window else None
         results: "List[State]" = []
-        lock = asyncio.Lock()
-        sem = asyncio.Semaphore(self._item_concurrency) if self._item_concurrency else None
-
-        async def process_item(item: Any):
-            sub_state = self._map_item_to_state(item, parent)
-            v_val = self._variant_per_item_fn(item, variant)
-            sub_variant = await v_val if inspect.isawaitable(v_val) else v_val
-
-            async def run_substeps():
-                s = sub_state
-                for st in self._sub_steps:
-                    s = await _run_step_async(st, s, sub_variant, self._per_substep_timeout)
-                return s
+        # fold into a separate accumulator: the parent stays the fixed snapshot items are mapped from
+        acc = CowState.fork(parent) if self._aggregate is not None else parent
 
-            s_final = await asyncio.wait_for(run_substeps(), timeout=self._per_item_timeout) \
-                      if self._per_item_timeout else await run_substeps()
-
-            async with lock:
-                results.append(s_final)
-
-        async def guard(item: Any):
+        async def guard(item: Any) -> "State":
             if sem:
                 async with sem:
-                    await process_item(item)
-            else:
-                await process_item(item)
+                    return await self._process_item(item, parent, variant)
+            return await self._process_item(item, parent, variant)
+
+        async def merge(sub_state: "State") -> None:
+            nonlocal acc
+            if self._aggregate is None:
+                results.append(sub_state)
+                return
+            res = self._aggregate(acc, sub_state, variant)
+            acc = await res if inspect.isawaitable(res) else res
 
-        await asyncio.gather(*(asyncio.create_task(guard(it)) for it in items))
+        source = _aenumerate(items)
+        pending: "Dict[asyncio.Future, int]" = {}
+        ready: "Dict[int, State]" = {}
+        next_out, exhausted = 0, False
+        try:
+            while True:
+                while not exhausted and len(pending) < window and len(ready) < window:
+                    try:
+                        i, item = await source.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending[asyncio.ensure_future(guard(item))] = i
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in sorted(done, key=pending.__getitem__):
+                    i = pending.pop(fut)
+                    if ordered:
+                        ready[i] = fut.result()
+                    else:
+                        await merge(fut.result())
+                while next_out in ready:
+                    await merge(ready.pop(next_out))
+                    next_out += 1
+        finally:
+            for fut in pending:
+                fut.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            await source.aclose()
 
+        if self._aggregate is not None:
+            return acc
         agg = self._aggregate_fn(parent, results, variant)
         return await agg if inspect.isawaitable(agg) else agg
 
@@ -141,7 +235,10 @@ register_step(
         isolate_parent=True,
         item_concurrency=None,
         per_substep_timeout=None,
-        per_item_timeout=None: AsyncSplitMerge(
+        per_item_timeout=None,
+        window=None,
+        ordered=True,
+        aggregate=None: AsyncSplitMerge(
             name,
             items_fn,
             sub_steps,
@@ -151,6 +248,9 @@ register_step(
             isolate_parent,
             item_concurrency,
             per_substep_timeout,
-            per_item_timeout
+            per_item_timeout,
+            window,
+            ordered,
+            aggregate
         )
 )
\ No newline at end of file
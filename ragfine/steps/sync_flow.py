@@ -1,8 +1,10 @@
 # TODOfrom ..registry.registry import register_step
-from typing import Any, Dict, List, Callable, Protocol, Iterable, Optional, Union
-from ..core.registry import register_step
-from ..core.pipebase import _normalize_step, _run_steps_inline
-import copy
+from typing import Any, Dict, List, Callable, Protocol, Iterable, Optional, Tuple, Union
+from ..core.registry import register_step, CALLABLE_REGISTRY, STEP_REGISTRY
+from ..core.pipebase import _normalize_step, _run_steps_inline, _run_step_batch
+from ..core.tracing import bind_context, current_tracer, trace
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+import copy, importlib, multiprocessing, threading, uuid, weakref
 
 # -------- 1) BRANCHING: krok rozgałęzienia warunkowego --------
 class BranchStep:
@@ -29,6 +31,84 @@ def branch(
     return BranchStep(name, predicate, then_steps, else_steps)
 
 # -------- 2) FAN-OUT/FAN-IN: krok, który rozdziela i scala --------
+# worker process: sub-steps rebuilt once per SplitMerge (by token), reused by later chunks
+_WORKER_SUB_STEPS: Dict[str, List[Any]] = {}
+
+
+def _is_step_spec(s: Any) -> bool:
+    """Registry spec: "StepName" or {"use": "StepName", ...params}."""
+    return isinstance(s, (str, dict))
+
+
+def _build_sub_step(s: Any) -> Any:
+    if _is_step_spec(s):
+        from ..core.builder import build_step_from_spec  # lazy: builder imports the pipeline
+        return build_step_from_spec(s)
+    return _normalize_step(s)
+
+
+def _resolve_fn(fn: Any) -> Any:
+    """A callable, or the name of one in CALLABLE_REGISTRY (specs / YAML)."""
+    if fn is None or callable(fn):
+        return fn
+    if fn not in CALLABLE_REGISTRY:
+        raise KeyError(f"Callable '{fn}' not found in CALLABLE_REGISTRY")
+    return CALLABLE_REGISTRY[fn]
+
+
+def _run_sub_steps(steps: List[Any], states: List["State"], variants: List["Variant"]) -> List["State"]:
+    # step-major: sub-steps with run_batch(states, variants) see the whole chunk at once
+    for st in steps:
+        states = _run_step_batch(st, states, variants)
+    return states
+
+
+def _spec_modules(payload: List[Any]) -> List[str]:
+    """Modules that registered the payload's step specs: imported in workers, so steps
+    registered at runtime exist there under spawn / forkserver too (not only fork)."""
+    modules = set()
+    for s in payload:
+        if _is_step_spec(s):
+            name = s if isinstance(s, str) else (s.get("use") or s.get("type"))
+            module = getattr(STEP_REGISTRY.get(name), "__module__", None)
+            if module not in (None, "__main__"):
+                modules.add(module)
+    return sorted(modules)
+
+
+def _init_sub_steps(token: str, payload: List[Any], modules: List[str]) -> List[Any]:
+    """Worker side: build (once) the sub-steps of SplitMerge `token`; also the pool initializer."""
+    steps = _WORKER_SUB_STEPS.get(token)
+    if steps is None:
+        import ragfine.steps  # noqa: F401  (registers built-in steps in fresh interpreters)
+        for mod in modules:
+            importlib.import_module(mod)
+        steps = _WORKER_SUB_STEPS[token] = [_build_sub_step(s) for s in payload]
+    return steps
+
+
+def _run_sub_chunk(token: str, payload: "Optional[Tuple[List[Any], List[str]]]", states: List["State"],
+                   variants: List["Variant"], tracing: bool = False) -> Tuple[List["State"], Any]:
+    """
+    Worker side of SplitMerge(executor="process"): (sub-states, trace events or None).
+    `payload` is None for the SplitMerge's own pool (its initializer built the steps).
+    """
+    steps = _WORKER_SUB_STEPS.get(token)
+    if steps is None:
+        if payload is None:
+            raise RuntimeError(f"SplitMerge sub-steps {token} were not built in this worker")
+        steps = _init_sub_steps(token, *payload)
+    if not tracing:
+        return _run_sub_steps(steps, states, variants), None
+    with trace() as tracer:
+        out = _run_sub_steps(steps, states, variants)
+    return out, tracer.events
+
+
+def _shutdown_pool(pool: Executor) -> None:
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
 class SplitMerge:
     def __init__(
         self,
@@ -39,10 +119,15 @@ class SplitMerge:
         variant_per_item_fn: Callable[[Any, "Variant"], "Variant"] | None = None,
         aggregate_fn: Callable[["State", List["State"], "Variant"], "State"] | None = None,
         isolate_parent: bool = True,
+        executor: "Union[str, Executor, None]" = None,
+        max_workers: "Optional[int]" = None,
+        chunksize: int = 1,
+        mp_context: "Union[str, Any, None]" = None,
     ):
         """
         items_fn:        z parent-state tworzy listę elementów do fan-out'u
-        sub_steps:       kroki pod-pipeline'u dla każdego elementu
+        sub_steps:       kroki pod-pipeline'u dla każdego elementu; także specyfikacje z rejestru
+                         ("Name" lub {"use": "Name", ...}), budowane na nowo w procesach roboczych
         map_item_to_state:
             jak przygotować sub-state dla pojedynczego elementu (domyślnie: kopia parenta + data['item']=item)
         variant_per_item_fn:
@@ -51,14 +136,75 @@ class SplitMerge:
             jak scalić listę sub-state'ów do parent-state (domyślnie: zapisze listę pod data['fan_results'])
         isolate_parent:
             czy fan-out pracuje na kopii state (zwykle True)
+        executor, max_workers, chunksize:
+            None (domyślnie): elementy przetwarzane w bieżącym wątku.
+            "thread" / "process" / instancja Executor: elementy idą do puli w porcjach po
+            `chunksize` (każda porcja jednym run_batch), wyniki w kolejności elementów.
+            W procesach roboczych kroki ze specyfikacji są budowane z rejestru (raz na proces,
+            w initializerze puli; moduły, które je zarejestrowały, są importowane, więc działa
+            to także przy spawn / forkserver), pozostałe są picklowane. Pula tworzona tu
+            powstaje leniwie przy pierwszym run() i służy kolejnym wywołaniom (zamyka ją
+            close() albo garbage collector); przekazany Executor nie jest zamykany.
+        mp_context:
+            kontekst multiprocessing dla executor="process" ("spawn", "fork", "forkserver"
+            lub obiekt kontekstu; domyślnie kontekst domyślny platformy).
+        Funkcje (items_fn, map_item_to_state, ...) mogą być nazwami z CALLABLE_REGISTRY.
         """
+        if executor is not None and not isinstance(executor, Executor) and executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor {executor!r}; expected 'thread', 'process', an Executor or None")
+        if chunksize < 1:
+            raise ValueError("chunksize must be >= 1")
         self.name = name
-        self._items_fn = items_fn
+        self._items_fn = _resolve_fn(items_fn)
         self._sub_steps = sub_steps
-        self._map_item_to_state = map_item_to_state or self._default_map_item_to_state
-        self._variant_per_item_fn = variant_per_item_fn or (lambda item, e: e)
-        self._aggregate_fn = aggregate_fn or self._default_aggregate
+        self._steps = [_build_sub_step(s) for s in sub_steps]
+        self._map_item_to_state = _resolve_fn(map_item_to_state) or self._default_map_item_to_state
+        self._variant_per_item_fn = _resolve_fn(variant_per_item_fn) or (lambda item, e: e)
+        self._aggregate_fn = _resolve_fn(aggregate_fn) or self._default_aggregate
         self._isolate_parent = isolate_parent
+        self._executor = executor
+        self._max_workers = max_workers
+        self._chunksize = chunksize
+        self._mp_context = mp_context
+        self._token = uuid.uuid4().hex  # identifies these sub-steps in worker processes
+        self._pool: "Optional[Executor]" = None
+        self._pool_lock = threading.Lock()
+
+    # the pool stays with this instance; copies / pickles start without one
+    def __getstate__(self) -> Dict[str, Any]:
+        st = dict(self.__dict__)
+        st["_pool"], st["_pool_lock"] = None, None
+        return st
+
+    def __setstate__(self, st: Dict[str, Any]) -> None:
+        self.__dict__.update(st)
+        self._pool_lock = threading.Lock()
+
+    def close(self) -> None:
+        """Shut down the pool created by this SplitMerge (a passed-in Executor is left alone)."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _get_pool(self) -> Executor:
+        if isinstance(self._executor, Executor):
+            return self._executor
+        with self._pool_lock:
+            if self._pool is None:
+                if self._executor == "thread":
+                    pool: Executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="ragfine-item")
+                else:
+                    ctx = self._mp_context
+                    if isinstance(ctx, str):
+                        ctx = multiprocessing.get_context(ctx)
+                    payload = self._worker_payload()
+                    pool = ProcessPoolExecutor(max_workers=self._max_workers, mp_context=ctx,
+                                               initializer=_init_sub_steps,
+                                               initargs=(self._token, payload, _spec_modules(payload)))
+                weakref.finalize(self, _shutdown_pool, pool)
+                self._pool = pool
+            return self._pool
 
     @staticmethod
     def _default_map_item_to_state(item: Any, parent_state: "State") -> "State":
@@ -74,16 +220,45 @@ class SplitMerge:
         parent_state.data["fan_results"] = [ss.data for ss in sub_states]
         return parent_state
 
+    def _worker_payload(self) -> List[Any]:
+        """Sub-steps as shipped to worker processes: registry specs as specs, the rest as objects."""
+        return [raw if _is_step_spec(raw) else built for raw, built in zip(self._sub_steps, self._steps)]
+
+    def _run_pooled(self, sub_states: List["State"], sub_variants: List["Variant"]) -> List["State"]:
+        pool = self._get_pool()
+        tracer = current_tracer()
+        n = self._chunksize
+        bounds = range(0, len(sub_states), n)
+        if isinstance(pool, ThreadPoolExecutor):  # threads share the sub-step objects
+            run = bind_context(_run_sub_steps)
+            futures = [pool.submit(run, self._steps, sub_states[i:i + n], sub_variants[i:i + n])
+                       for i in bounds]
+            return [s for fut in futures for s in fut.result()]
+        # our own pool built the sub-steps in its initializer; a passed-in one gets them per chunk
+        payload = None
+        if pool is not self._pool:
+            specs = self._worker_payload()
+            payload = (specs, _spec_modules(specs))
+        futures = [pool.submit(_run_sub_chunk, self._token, payload, sub_states[i:i + n],
+                               sub_variants[i:i + n], tracer is not None) for i in bounds]
+        out: List["State"] = []
+        for fut in futures:
+            states, events = fut.result()
+            if events and tracer is not None:
+                tracer.merge(events)
+            out.extend(states)
+        return out
+
     def run(self, state: "State", variant: "Variant") -> "State":
         parent = copy.deepcopy(state) if self._isolate_parent else state
         items = list(self._items_fn(parent, variant))
-        sub_states: List["State"] = []
+        sub_states: List["State"] = [self._map_item_to_state(item, parent) for item in items]
+        sub_variants: List["Variant"] = [self._variant_per_item_fn(item, variant) for item in items]
 
-        for item in items:
-            sub_state = self._map_item_to_state(item, parent)
-            sub_variant = self._variant_per_item_fn(item, variant)
-            sub_state = _run_steps_inline(sub_state, sub_variant, self._sub_steps)
-            sub_states.append(sub_state)
+        if self._executor is None or not sub_states:
+            sub_states = _run_sub_steps(self._steps, sub_states, sub_variants)
+        else:
+            sub_states = self._run_pooled(sub_states, sub_variants)
 
         # fan-in (agregacja do parenta)
         return self._aggregate_fn(parent, sub_states, variant)
@@ -96,6 +271,10 @@ def split_merge(
     variant_per_item_fn: Callable[[Any, "Variant"], "Variant"] | None = None,
     aggregate_fn: Callable[["State", List["State"], "Variant"], "State"] | None = None,
     isolate_parent: bool = True,
+    executor: "Union[str, Executor, None]" = None,
+    max_workers: "Optional[int]" = None,
+    chunksize: int = 1,
+    mp_context: "Union[str, Any, None]" = None,
 ) -> "Step":
     """Fabryka kroku FanOutFanInStep."""
     return SplitMerge(
@@ -106,6 +285,10 @@ def split_merge(
         variant_per_item_fn,
         aggregate_fn,
         isolate_parent,
+        executor,
+        max_workers,
+        chunksize,
+        mp_context,
     )
 
 # --- BranchStep -------------------------------------------------------------
@@ -128,13 +311,21 @@ register_step(
         map_item_to_state=None,
         variant_per_item_fn=None,
         aggregate_fn=None,
-        isolate_parent=True: SplitMerge(
+        isolate_parent=True,
+        executor=None,
+        max_workers=None,
+        chunksize=1,
+        mp_context=None: SplitMerge(
             name,
             items_fn,
             sub_steps,
             map_item_to_state,
             variant_per_item_fn,
             aggregate_fn,
-            isolate_parent
+            isolate_parent,
+            executor,
+            max_workers,
+            chunksize,
+            mp_context
         )
 )
\ No newline at end of file
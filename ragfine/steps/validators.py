@@ -1,8 +1,109 @@
 # validators.py
-from functools import wraps
-from typing import Type, Callable, Any, Dict
+from contextlib import contextmanager
+from functools import wraps, lru_cache
+from typing import Type, Callable, Any, Dict, Iterator, Tuple
 from pydantic import BaseModel, ValidationError
-import inspect
+import inspect, itertools, os
+
+from ..core.cow import peek
+from ..core.dataflow import is_trusted
+
+# --- Validation mode (global) ---
+#   "strict": validate every call (default)
+#   "sample": validate 1 call in `every` per decorated step (coercion write-back only on those calls)
+#   "off":    skip validation entirely; the step runs undecorated
+VALIDATION_MODES = ("strict", "sample", "off")
+_MODE: Dict[str, Any] = {"mode": "strict", "every": 1}
+
+def set_validation_mode(mode: str, every: int = 100) -> None:
+    """Set the global validation mode; `every` is the sampling period for mode="sample"."""
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode {mode!r}; expected one of {VALIDATION_MODES}")
+    if every < 1:
+        raise ValueError("every must be >= 1")
+    _MODE.update(mode=mode, every=every if mode == "sample" else 1)
+
+def get_validation_mode() -> Tuple[str, int]:
+    return _MODE["mode"], _MODE["every"]
+
+@contextmanager
+def validation_mode(mode: str, every: int = 100) -> Iterator[None]:
+    """Temporarily switch the validation mode (e.g. `with validation_mode("off"): pipe.run(...)`)."""
+    prev = dict(_MODE)
+    set_validation_mode(mode, every)
+    try:
+        yield
+    finally:
+        _MODE.update(prev)
+
+def _mode_from_env() -> None:
+    # RAGFINE_VALIDATION=strict | off | sample:<N>
+    raw = os.environ.get("RAGFINE_VALIDATION", "").strip().lower()
+    if raw:
+        mode, _, every = raw.partition(":")
+        set_validation_mode(mode, int(every) if every else 100)
+
+_mode_from_env()
+
+def _should_validate(calls: "itertools.count") -> bool:
+    mode = _MODE["mode"]
+    if mode == "strict":
+        return True
+    if mode == "off":
+        return False
+    return next(calls) % _MODE["every"] == 0
+
+def _io_decl(input_model, output_model, input_from, output_to, merge_output) -> Dict[str, Any]:
+    """Declaration read by core.dataflow.check_dataflow (build-time pipeline checking)."""
+    return {
+        "input_model": input_model, "output_model": output_model,
+        "input_from": input_from, "output_to": output_to, "merge_output": merge_output,
+    }
+
+# --- Fast path: validate only declared fields with the cached core validator ---
+@lru_cache(maxsize=None)
+def _model_fields(model: Type[BaseModel]) -> "Tuple[Tuple[str, str], ...] | None":
+    """(field name, input key) pairs; None if the model needs the whole dict (extra="allow")."""
+    if model.model_config.get("extra") == "allow":
+        return None
+    return tuple((name, f.alias or name) for name, f in model.model_fields.items())
+
+def _validate(model: Type[BaseModel], source: Dict[str, Any]) -> BaseModel:
+    fields = _model_fields(model)
+    # read through peek(): validation only reads, so a CowDict must not copy what it hands out
+    if fields is None:
+        return model.__pydantic_validator__.validate_python({key: peek(source, key) for key in source})
+    return model.__pydantic_validator__.validate_python({key: peek(source, key) for _, key in fields if key in source})
+
+def _unchanged(old: Any, new: Any) -> bool:
+    """Same value with the same types all the way down ([1] vs [1.0] counts as coerced)."""
+    if old is new:
+        return True
+    if type(old) is not type(new):
+        return False
+    try:
+        if isinstance(old, dict):
+            return len(old) == len(new) and all(
+                _unchanged(ko, kn) and _unchanged(vo, vn) for (ko, vo), (kn, vn) in zip(old.items(), new.items()))
+        if isinstance(old, (list, tuple)):
+            return len(old) == len(new) and all(_unchanged(o, n) for o, n in zip(old, new))
+        if isinstance(old, (set, frozenset)):
+            return old == new and {type(x) for x in old} == {type(x) for x in new}
+        return bool(old == new)
+    except Exception:  # e.g. arrays with ambiguous truth value
+        return False
+
+def _write_back(out: BaseModel, target: Dict[str, Any]) -> None:
+    """
+    Merge the validated output into `target`, touching only fields that are missing or were
+    coerced; each field is compared and written under the key it is read from (alias or name).
+    """
+    fields = _model_fields(type(out)) or tuple((name, f.alias or name) for name, f in type(out).model_fields.items())
+    changed = {name: key for name, key in fields
+               if key not in target or not _unchanged(peek(target, key), getattr(out, name))}
+    if changed:
+        dumped = out.model_dump(include=set(changed))
+        target.update({key: dumped[name] for name, key in changed.items()})
 
 def validate_io(
     *,
@@ -30,19 +131,23 @@ def validate_io(
             text = (state.data.get("text") or "").strip()
             state.data["entities"] = [w for w in text.split() if w.istitle()]
             return state
+
+      Only the fields each model declares are read, through the model's cached core
+      validator, and output is merged back only for fields that were missing or
+      coerced. The global mode (set_validation_mode / validation_mode /
+      RAGFINE_VALIDATION) can sample or switch off validation.
     """
     def decorator(fn):
         sig = inspect.signature(fn)
+        # Heuristic: method has at least (self, state) — resolved once, not per call
+        params = list(sig.parameters)
+        is_method = bool(params) and params[0] == "self"
+        calls = itertools.count()
 
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            # Determine if called as bound method (first arg is 'self')
-            is_method = False
-            if args and hasattr(args[0], "__class__"):
-                # Heuristic: method has at least (self, state)
-                params = list(sig.parameters)
-                if params and params[0] in ("self",):
-                    is_method = True
+            if not _should_validate(calls):
+                return fn(*args, **kwargs)
 
             # Extract state & variant positions
             if is_method:
@@ -60,11 +165,12 @@ def validate_io(
                 state = args[0]
                 variant = args[1] if len(args) > 1 else kwargs.get("variant", {})
 
-            # 1) validate input
-            try:
-                _ = input_model(**getattr(state, input_from))
-            except ValidationError as e:
-                raise ValueError(f"[{fn.__name__}] input validation failed: {e}") from e
+            # 1) validate input (skipped when the running pipeline's dataflow check proved it)
+            if not is_trusted(self_obj if is_method else wrapper):
+                try:
+                    _validate(input_model, getattr(state, input_from))
+                except ValidationError as e:
+                    raise ValueError(f"[{fn.__name__}] input validation failed: {e}") from e
 
             # 2) call original
             result = fn(*args, **kwargs)
@@ -78,16 +184,72 @@ def validate_io(
                 raise TypeError(f"[{fn.__name__}] expected dict-like state.{output_to}, got {type(out_source)}")
 
             try:
-                out = output_model(**out_source)
+                out = _validate(output_model, out_source)
             except ValidationError as e:
                 raise ValueError(f"[{fn.__name__}] output validation failed: {e}") from e
 
             if merge_output:
-                out_source.update(out.model_dump())
+                _write_back(out, out_source)
             else:
                 setattr(result_state, output_to, out.model_dump())
 
             return result_state
 
+        wrapper.__ragfine_io__ = _io_decl(input_model, output_model, input_from, output_to, merge_output)
+        return wrapper
+    return decorator
+
+def validate_io_batch(
+    *,
+    input_model: Type[BaseModel],
+    output_model: Type[BaseModel],
+    input_from: str = "data",
+    output_to: str = "data",
+    merge_output: bool = True,
+):
+    """
+    Batch counterpart of @validate_io for `run_batch(self, states, variants)`:
+    validates every input state, calls the method once for the whole batch, then
+    validates (and writes back) every returned state. Same options as validate_io;
+    in "sample" mode one state in `every` is validated.
+    """
+    def decorator(fn):
+        calls = itertools.count()
+
+        @wraps(fn)
+        def wrapper(self_obj, states, variants, *args, **kwargs):
+            if _MODE["mode"] == "off":
+                return fn(self_obj, states, variants, *args, **kwargs)
+            checked = [_should_validate(calls) for _ in states]
+            trusted = is_trusted(self_obj)
+            for state, check in zip(states, checked):
+                if not check or trusted:
+                    continue
+                try:
+                    _validate(input_model, getattr(state, input_from))
+                except ValidationError as e:
+                    raise ValueError(f"[{fn.__name__}] input validation failed: {e}") from e
+
+            result = fn(self_obj, states, variants, *args, **kwargs)
+            result_states = list(result) if result is not None else list(states)
+
+            for result_state, check in zip(result_states, checked):
+                if not check:
+                    continue
+                out_source = getattr(result_state, output_to)
+                if not isinstance(out_source, dict):
+                    raise TypeError(f"[{fn.__name__}] expected dict-like state.{output_to}, got {type(out_source)}")
+                try:
+                    out = _validate(output_model, out_source)
+                except ValidationError as e:
+                    raise ValueError(f"[{fn.__name__}] output validation failed: {e}") from e
+                if merge_output:
+                    _write_back(out, out_source)
+                else:
+                    setattr(result_state, output_to, out.model_dump())
+
+            return result_states
+
+        wrapper.__ragfine_io__ = _io_decl(input_model, output_model, input_from, output_to, merge_output)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+from ragfine.core.pipebase import State
+from ragfine.steps import AsyncSplitMerge
+
+
+class Delay:
+    """Sub-step: later items finish first; records the peak number of items in flight."""
+    name = "delay"
+
+    def __init__(self, unit: float = 0.001):
+        self.unit = unit
+        self.active = 0
+        self.peak = 0
+
+    async def run(self, state, variant):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.unit * (5 - state.data["item"] % 5))
+        self.active -= 1
+        state.data["out"] = state.data["item"] * 10
+        return state
+
+
+def _map(item, parent):
+    return State(data={"item": item})
+
+
+def test_results_in_item_order_by_default_and_completion_order_on_request():
+    fan = AsyncSplitMerge("fan", lambda s, v: range(10), [Delay()], map_item_to_state=_map)
+    out = asyncio.run(fan.run(State(), {}))
+    assert [r["out"] for r in out.data["fan_results"]] == [i * 10 for i in range(10)]
+
+    fan = AsyncSplitMerge("fan", lambda s, v: range(5), [Delay(0.02)], map_item_to_state=_map, ordered=False)
+    out = asyncio.run(fan.run(State(), {}))
+    assert [r["item"] for r in out.data["fan_results"]] == [4, 3, 2, 1, 0]
+
+
+def test_lazy_async_items_with_bounded_window_and_incremental_reducer():
+    pulled = []
+
+    async def items(state, variant):
+        async def gen():
+            for i in range(200):
+                pulled.append(i)
+                yield i
+        return gen()
+
+    def fold(parent, sub, variant):
+        parent.data["total"] = parent.data.get("total", 0) + sub.data["out"]
+        parent.data.setdefault("order", []).append(sub.data["item"])
+        parent.data["ahead"] = max(parent.data.get("ahead", 0), len(pulled) - sub.data["item"])
+        return parent
+
+    step = Delay()
+    fan = AsyncSplitMerge("fan", items, [step], map_item_to_state=_map, window=8, aggregate=fold)
+    out = asyncio.run(fan.run(State(), {}))
+    assert out.data["total"] == sum(range(200)) * 10 and "fan_results" not in out.data
+    assert out.data["order"] == list(range(200))  # folded in item order
+    assert step.peak <= 8 and len(pulled) == 200
+    assert out.data["ahead"] <= 16  # pulled only as the window (8 in flight + 8 buffered) frees up
+
+
+def test_item_concurrency_below_window_and_errors_cancel_the_rest():
+    step = Delay()
+    fan = AsyncSplitMerge("fan", lambda s, v: iter(range(30)), [step], map_item_to_state=_map,
+                          item_concurrency=2, window=10)
+    asyncio.run(fan.run(State(), {}))
+    assert step.peak == 2
+
+    async def boom(state, variant):
+        if state.data["item"] == 3:
+            raise RuntimeError("bad item")
+        await asyncio.sleep(0.01)
+        return state
+
+    fan = AsyncSplitMerge("fan", lambda s, v: range(100), [boom], map_item_to_state=_map, window=4)
+    with pytest.raises(RuntimeError, match="bad item"):
+        asyncio.run(fan.run(State(), {}))
+
+    with pytest.raises(ValueError):
+        AsyncSplitMerge("fan", lambda s, v: [], [], aggregate=lambda p, s, v: p, aggregate_fn=lambda p, ss, v: p)
+
+
+def test_sub_states_never_see_aggregated_data():
+    seen = []
+
+    def mapper(item, parent):
+        seen.append(len(parent.data.get("acc", [])))
+        return State(data={"item": item})
+
+    def fold(acc, sub, variant):
+        acc.data.setdefault("acc", []).append(sub.data["item"])
+        return acc
+
+    parent = State(data={"doc": "x"})
+    fan = AsyncSplitMerge("fan", lambda s, v: range(10), [Delay()], map_item_to_state=mapper,
+                          window=2, aggregate=fold, isolate_parent=False)
+    out = asyncio.run(fan.run(parent, {}))
+    assert seen == [0] * 10
+    assert out.data["acc"] == list(range(10)) and "acc" not in parent.data
+
+
+def test_slow_head_item_does_not_hold_back_the_window():
+    finished = []
+
+    async def sub(state, variant):
+        if state.data["item"] == 0:  # the head waits for more later items than the window holds
+            for _ in range(200):
+                if len(finished) >= 4:
+                    break
+                await asyncio.sleep(0.005)
+        await asyncio.sleep(0)
+        finished.append(state.data["item"])
+        return state
+
+    fan = AsyncSplitMerge("fan", lambda s, v: range(10), [sub], map_item_to_state=_map, window=4)
+    out = asyncio.run(fan.run(State(), {}))
+    assert finished.index(0) >= 4
+    assert [r["item"] for r in out.data["fan_results"]] == list(range(10))
+
+
+class NoCopy:
+    copies = 0
+
+    def __deepcopy__(self, memo):
+        NoCopy.copies += 1
+        return NoCopy()
+
+
+def test_accumulator_is_not_a_deep_copy_and_user_generators_are_closed():
+    def fold(acc, sub, variant):
+        acc.data["n"] = acc.data.get("n", 0) + 1
+        return acc
+
+    parent = State(data={"big": NoCopy()})
+    fan = AsyncSplitMerge("fan", lambda s, v: range(5), [Delay()], map_item_to_state=_map,
+                          aggregate=fold, isolate_parent=False)
+    out = asyncio.run(fan.run(parent, {}))
+    assert out.data["n"] == 5 and "n" not in parent.data and NoCopy.copies == 0
+
+    closed = []
+
+    async def items(state, variant):
+        async def gen():
+            try:
+                for i in range(100):
+                    yield i
+            finally:
+                closed.append(True)
+        return gen()
+
+    async def boom(state, variant):
+        if state.data["item"] == 2:
+            raise RuntimeError("bad item")
+        return state
+
+    async def main():
+        fan = AsyncSplitMerge("fan", items, [boom], map_item_to_state=_map, window=4)
+        with pytest.raises(RuntimeError, match="bad item"):
+            await fan.run(State(), {})
+        return list(closed)  # before the loop's own shutdown would finalize the generator
+
+    assert asyncio.run(main()) == [True]
@@ -0,0 +1,91 @@
+import copy
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ragfine.core.pipebase import State
+from ragfine.insightgen import Chunker, Entifier, MappedDocument, chunk_items, chunk_to_state, iter_chunks
+from ragfine.insightgen.utils import split_sentences
+from ragfine.steps import SplitMerge
+
+TEXT = "Ala ma kota. Zoë lubi psy!  Bob mailed bob@x.io? Yes. Ćma leci.\n"
+
+
+@pytest.fixture
+def doc_path(tmp_path):
+    p = tmp_path / "doc.txt"
+    p.write_text(TEXT, encoding="utf-8")
+    return str(p)
+
+
+def test_sentence_chunks_match_split_sentences_with_exact_offsets(doc_path):
+    raw = TEXT.encode("utf-8")
+    with MappedDocument(doc_path) as doc:
+        chunks = list(iter_chunks(doc, "sentence", size=1))
+        assert [c.text for c in chunks] == split_sentences(TEXT)
+        assert all(raw[c.start:c.end].decode() == c.text for c in chunks)
+    assert [c.text for c in iter_chunks(TEXT, "sentence", size=1)] == split_sentences(TEXT)
+    pairs = [c.text for c in iter_chunks(TEXT, "sentence", size=2, overlap=1)]
+    assert pairs[0] == "Ala ma kota. Zoë lubi psy!" and pairs[1].startswith("Zoë") and len(pairs) == 3
+
+
+def test_size_and_window_chunks_overlap_and_keep_utf8_whole(doc_path):
+    with MappedDocument(doc_path) as doc:
+        chunks = list(iter_chunks(doc, "size", size=10, overlap=3))
+        raw = TEXT.encode("utf-8")
+        assert chunks[0].start == 0 and chunks[-1].end == len(raw)
+        assert all(b.start < a.end for a, b in zip(chunks, chunks[1:]))  # overlapping
+        assert all(raw[c.start:c.end].decode() == c.text for c in chunks)  # never splits "ë" / "Ć"
+    words = [c.text for c in iter_chunks(TEXT, "window", size=3, overlap=1)]
+    assert words[:2] == ["Ala ma kota.", "kota. Zoë lubi"] and words[-1].endswith("leci.")
+
+
+def test_chunks_share_the_mapped_document_and_fan_out_without_copies(doc_path):
+    st = Chunker(mode="sentence", size=1).run(State(data={"path": doc_path}), {})
+    chunks = st.data["chunks"]
+    assert copy.deepcopy(chunks)[0].doc is chunks[0].doc
+    restored = pickle.loads(pickle.dumps(chunks))
+    assert restored == chunks and restored[2].text == "Bob mailed bob@x.io?"
+
+    step = SplitMerge("per_chunk", chunk_items, [Entifier()], map_item_to_state=chunk_to_state)
+    out = step.run(st, {})
+    assert [r["entities"] for r in out.data["fan_results"]][:3] == [["Ala"], ["Zoë"], ["Bob", "bob@x.io"]]
+    assert out.data["fan_results"][1]["chunk_span"] == chunks[1].span
+
+
+def test_chunker_rejects_bad_parameters():
+    with pytest.raises(ValueError):
+        Chunker(size=4, overlap=4)
+    with pytest.raises(ValueError):
+        Chunker(mode="pages")
+
+
+def test_mapped_splits_follow_unicode_whitespace(tmp_path):
+    text = "Ala ma kota. Zoë　lubi psy! Bob ma rybki. 　"
+    p = tmp_path / "ws.txt"
+    p.write_text(text, encoding="utf-8")
+    with MappedDocument(str(p)) as doc:
+        assert [c.text for c in iter_chunks(doc, "sentence", size=1)] == split_sentences(text)
+        mapped = [c.text for c in iter_chunks(doc, "window", size=2, overlap=1)]
+    assert mapped == [c.text for c in iter_chunks(text, "window", size=2, overlap=1)]
+
+
+def test_chunks_own_the_open_map_and_reopen_once_after_close(doc_path):
+    st = Chunker(mode="sentence", size=1).run(State(data={"path": doc_path}), {})
+    chunks = st.data["chunks"]
+    with chunks[0].doc as doc:
+        buf = doc.buffer
+        assert not doc.closed and chunks[1].text == "Zoë lubi psy!" and doc.buffer is buf
+    assert doc.closed
+
+    with ThreadPoolExecutor(8) as ex:  # concurrent reads of a closed document map it once
+        bufs = list(ex.map(lambda c: (c.text, c.doc.buffer)[1], chunks * 20))
+    assert all(b is bufs[0] for b in bufs) and not doc.closed
+    doc.close()
+
+
+def test_chunker_rejects_other_encodings():
+    with pytest.raises(ValueError):
+        Chunker(encoding="latin-1")
+    assert Chunker(encoding="UTF8").encoding == "UTF8"
@@ -0,0 +1,22 @@
+import json
+from ragfine.cli.bench import main, synth_corpus, compare
+
+
+def test_synth_corpus_is_deterministic_and_has_entities():
+    docs = synth_corpus(3, doc_words=80, entity_density=0.2, email_rate=0.05, url_rate=0.05, seed=1)
+    assert docs == synth_corpus(3, doc_words=80, entity_density=0.2, email_rate=0.05, url_rate=0.05, seed=1)
+    text = " ".join(docs)
+    assert "@" in text and "https://" in text and len(docs[0].split()) == 80
+
+
+def test_bench_writes_json_and_flags_regressions(tmp_path):
+    out = tmp_path / "bench.json"
+    assert main(["--docs", "3", "--doc-words", "30", "--repeat", "1", "--variants", "1,2",
+                 "--concurrency", "2", "-o", str(out)]) == 0
+    report = json.loads(out.read_text())
+    names = [r["name"] for r in report["results"]]
+    assert "step/Entifier" in names and "pipeline/sync/v2" in names and "pipeline/async/v2/c2" in names
+
+    baseline = {"results": [{"name": "step/Entifier", "seconds": 1e-9}]}
+    regressions = compare(report, baseline, threshold=0.2)
+    assert [r["name"] for r in regressions] == ["step/Entifier"]
@@ -0,0 +1,61 @@
+import pytest
+from itertools import product
+from ragfine.core.pipeline import Pipeline, combine
+from ragfine.core.pipebase import State
+from ragfine.core.variant_space import VariantSpace
+
+PARAMS = {"style": ["A", "B", "C"], "answer": ["Yes", "No"], "k": range(4), "meta": True}
+
+def test_combine_is_lazy_and_matches_product():
+    space = combine(PARAMS, {"lang": "en"})
+    assert isinstance(space, VariantSpace) and len(space) == 24
+    expected = [
+        {"lang": "en", "meta": True, "style": s, "answer": a, "k": k}
+        for s, a, k in product(PARAMS["style"], PARAMS["answer"], PARAMS["k"])
+    ]
+    assert list(space) == expected
+    assert [space[i] for i in range(24)] == expected and space[-1] == expected[-1]
+    assert list(space[5:17:3]) == expected[5:17:3]
+    assert list(space[5:17][1::2]) == expected[5:17][1::2]
+    assert combine({"meta": True}, {"lang": "en"}) == [{"lang": "en", "meta": True}]
+
+def test_shards_are_disjoint_and_cover_the_space():
+    space = combine(PARAMS)
+    shards = [list(space.shard(i, 5)) for i in range(5)]
+    merged = [v for s in shards for v in s]
+    assert len(merged) == len(space)
+    assert sorted(map(repr, merged)) == sorted(map(repr, space))
+
+def test_zip_mode():
+    space = combine({"a": [1, 2, 3], "b": ["x", "y"], "c": 0}, mode="zip")
+    assert list(space) == [{"c": 0, "a": 1, "b": "x"}, {"c": 0, "a": 2, "b": "y"}]
+    with pytest.raises(ValueError):
+        combine({"a": [1]}, mode="diagonal")
+
+def test_huge_grid_indexing_without_materialisation():
+    space = combine({f"p{i}": range(10) for i in range(12)})  # 10**12 variants
+    assert len(space) == 10 ** 12
+    assert space[123456789012] == {f"p{i}": int(d) for i, d in enumerate("123456789012")}
+
+@pytest.mark.parametrize("method", ["random", "lhs", "sobol"])
+def test_sampling_methods(method):
+    space = combine({"a": range(8), "b": range(8), "c": ["x", "y"]})
+    sample = space.sample(16, method, seed=7)
+    picked = list(sample)
+    assert 0 < len(picked) <= 16
+    assert len({repr(v) for v in picked}) == len(picked)
+    assert all(v in list(space) for v in picked)
+    assert list(space.sample(16, method, seed=7)) == picked  # reproducible
+    if method != "random":
+        # stratified methods cover every value of a small axis
+        assert {v["c"] for v in picked} == {"x", "y"}
+        assert len({v["a"] for v in picked}) == 8
+
+def test_pipeline_accepts_variant_space():
+    class Echo:
+        name = "Echo"
+        def run(self, state, variant):
+            state.data["v"] = variant["k"]
+            return state
+    reports = Pipeline([Echo()]).run(State(), variants=combine({"k": range(3)}))
+    assert [r.final_state.data["v"] for r in reports] == [0, 1, 2]
@@ -0,0 +1,118 @@
+import pytest
+from pydantic import BaseModel
+from ragfine.core.pipeline import Pipeline
+from ragfine.core.pipebase import FnStep, State
+from ragfine.core.builder import pipeline_from_spec
+from ragfine.core.dataflow import DataflowError, compatible
+from ragfine.steps import validators
+from ragfine.steps.validators import validate_io
+from ragfine.core.registry import register_step
+from typing import List, Optional
+import ragfine.steps
+
+
+class Empty(BaseModel):
+    pass
+
+class NumOut(BaseModel):
+    n: str
+
+class NumIn(BaseModel):
+    n: int
+
+class Produce:
+    name = "Produce"
+    @validate_io(input_model=Empty, output_model=NumOut)
+    def run(self, state, variant):
+        state.data["n"] = "1"
+        return state
+
+class Consume:
+    name = "Consume"
+    @validate_io(input_model=NumIn, output_model=Empty)
+    def run(self, state, variant):
+        return state
+
+class NumText(BaseModel):
+    n: str
+
+@validate_io(input_model=NumText, output_model=Empty)
+def read_n(state, variant):
+    return state
+
+register_step("test_produce", lambda **kw: Produce())
+register_step("test_consume", lambda **kw: Consume())
+
+
+def test_insightgen_spec_is_proven_and_trusted():
+    ragfine.steps.load_insightgen()
+    steps = ["Entifier", "Questor", "Solver", "Integrator", "Refiner", "Rebaser"]
+    plain, _ = pipeline_from_spec({"steps": steps})  # opt-in: no check, nothing trusted
+    assert getattr(plain, "dataflow", None) is None and not plain._trusted
+    pipe, _ = pipeline_from_spec({"steps": steps, "check_dataflow": "raise", "trust_dataflow": True})
+    report = pipe.dataflow
+    assert report.proven and report.external == {"text": str}
+    assert report.trusted == ["Questor", "Solver", "Integrator", "Refiner", "Rebaser"]
+    assert report.trusted_at == [1, 2, 3, 4, 5]
+    rep = pipe.run(State(data={"text": "Alice emailed Bob"}))[0]
+    assert rep.final_state.data["entities"] == ["Alice", "Bob"]
+
+
+def test_type_mismatch_missing_inputs_and_opaque_steps():
+    with pytest.raises(DataflowError, match="Consume reads data\\['n'\\] as int, but Produce provides str"):
+        Pipeline([Produce(), Consume()]).check_dataflow(raise_on_error=True)
+
+    missing = Pipeline([Consume()]).check_dataflow({"text": "str"})
+    assert missing.errors == ["Consume requires data['n'], which no upstream step produces"]
+    assert Pipeline([Consume()]).check_dataflow({"n": "int"}).ok
+
+    spec_steps = [{"use": "test_produce"}, {"use": "test_consume"}]
+    with pytest.warns(UserWarning, match="Consume reads"):
+        pipe, _ = pipeline_from_spec({"steps": spec_steps, "check_dataflow": "warn"})
+    assert not pipe._trusted  # trust not asked for
+
+    opaque = Pipeline([lambda s, v: s, Consume()]).check_dataflow()
+    assert opaque.ok and not opaque.proven and opaque.opaque == ["<lambda>"]
+
+
+def test_type_compatibility_rules():
+    assert compatible(List[str], Optional[List[str]])
+    assert not compatible(Optional[List[str]], List[str])
+    assert compatible(int, float) and not compatible(str, int)
+    assert not compatible(List[int], List[str])
+
+
+def test_trust_belongs_to_the_checked_pipeline_and_covers_function_steps(monkeypatch):
+    seen = []
+    validate = validators._validate
+    monkeypatch.setattr(validators, "_validate", lambda model, src: (seen.append(model), validate(model, src))[1])
+    produce = Produce()
+    trusted = Pipeline([produce, FnStep(read_n, "read_n")])
+    assert trusted.check_dataflow(trust=True).trusted == ["Produce", "read_n"]
+    trusted.run(State())
+    trusted.compile().run(State())
+    assert NumText not in seen
+
+    Pipeline([produce, read_n]).run(State())  # same step objects, pipeline never checked
+    assert seen.count(NumText) == 1
+    shared = Pipeline([produce, read_n, lambda s, v: s, read_n])  # one occurrence unproven
+    shared.check_dataflow(trust=True)
+    shared.run(State())
+    assert seen.count(NumText) == 3
+
+
+def test_process_workers_do_not_repeat_the_spec_check(tmp_path, monkeypatch):
+    spec = {"steps": [{"use": "test_produce"}, {"use": "test_consume"}], "check_dataflow": "warn"}
+    with pytest.warns(UserWarning, match="Consume reads"):
+        pipe, _ = pipeline_from_spec(spec)
+    marker = tmp_path / "checked"
+    check = Pipeline.check_dataflow
+
+    def spy(self, *args, **kwargs):  # inherited by the forked workers
+        marker.touch()
+        return check(self, *args, **kwargs)
+
+    monkeypatch.setattr(Pipeline, "check_dataflow", spy)
+    reps = pipe.run(State(), variants=[{"i": i} for i in range(4)], executor="process", max_workers=2)
+    assert all(r.final_state.data["n"] == "1" for r in reps)
+    assert not marker.exists()
@@ -0,0 +1,23 @@
+from ragfine.core.pipebase import State
+from ragfine.insightgen import Entifier
+from ragfine.insightgen.utils import scan_entities
+
+
+def test_scan_entities_single_pass_kinds_offsets_and_dedup():
+    text = "Alice mailed Bob.Smith@Example.com and Alice again; see https://Docs.example.org/Guide (eBay, non-Élise)."
+    entities, spans = scan_entities(text, spans=True)
+    assert entities == ["Alice", "Bob.Smith@Example.com", "https://Docs.example.org/Guide"]
+    assert [(e, k) for e, k, _, _ in spans] == [
+        ("Alice", "name"), ("Bob.Smith@Example.com", "email"), ("Alice", "name"),
+        ("https://Docs.example.org/Guide", "url"),
+    ]
+    assert all(text[s:e] == ent for ent, _, s, e in spans)
+    assert scan_entities(text)[1] == []
+
+
+def test_entifier_spans_option_and_batch_path():
+    st = Entifier(spans=True).run(State(data={"text": "Ala met Zoë at https://x.pl"}), {})
+    assert st.data["entities"] == ["Ala", "Zoë", "https://x.pl"]
+    assert st.data["entity_spans"][1] == ("Zoë", "name", 8, 11)
+    out = Entifier().run_batch([State(data={"text": "Bob"}), State(data={"text": "Bob"})], [{}, {}])
+    assert [s.data["entities"] for s in out] == [["Bob"], ["Bob"]] and "entity_spans" not in out[0].data
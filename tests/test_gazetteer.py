@@ -0,0 +1,64 @@
+import os
+import pickle
+import random
+
+from ragfine.core.pipebase import State
+from ragfine.core.registry import register_fn
+from ragfine.insightgen import AhoCorasick, Gazetteer, compile_gazetteer
+
+
+def test_automaton_finds_overlapping_and_leftmost_longest_matches():
+    ac = AhoCorasick([("he", None), ("she", None), ("his", None), ("hers", None)], whole_words=False)
+    assert [(t, s, e) for t, _, s, e in ac.find("ushers", overlapping=True)] == [
+        ("she", 1, 4), ("hers", 2, 6), ("he", 2, 4),
+    ]
+    assert [t for t, _, _, _ in ac.find("ushers")] == ["she"]
+
+
+def test_leftmost_longest_without_sorting_matches_the_sorted_reference():
+    rng = random.Random(3)
+    words = ["".join(rng.choice("ab") for _ in range(rng.randint(1, 6))) for _ in range(40)]
+    ac = pickle.loads(pickle.dumps(AhoCorasick([(w, None) for w in words], whole_words=False)))
+    assert ac.lengths == [len(t) for t, _ in ac.terms] and ac.max_len == max(ac.lengths)
+    for _ in range(50):
+        text = "".join(rng.choice("ab ") for _ in range(60))
+        reference, pos = [], 0
+        for t, _, s, e in ac.find(text, overlapping=True):  # start, longest first
+            if s >= pos:
+                reference.append((t, s, e))
+                pos = e
+        assert [(t, s, e) for t, _, s, e in ac.find(text)] == reference
+
+
+def test_automaton_case_folding_and_word_boundaries():
+    ac = AhoCorasick([("Acme Corp", "org"), ("acme", "org2"), ("Corp", None)])
+    text = "ACME CORP bought Acmeware from acme."
+    assert ac.find(text) == [("Acme Corp", "org", 0, 9), ("acme", "org2", 31, 35)]
+    assert ac.find("İstanbul Acme") == [("acme", "org2", 9, 13)]  # offsets survive length-changing lowercase
+
+
+def test_gazetteer_step_sources_spans_and_entity_merge(tmp_path):
+    terms_file = tmp_path / "orgs.tsv"
+    terms_file.write_text("# organisations\nGlobex\torg\nInitech\n\n", encoding="utf-8")
+    register_fn("test_products", lambda: ["Widget Pro", ("Gizmo", "product")])
+    step = Gazetteer(terms=["Hooli"], terms_file=str(terms_file), terms_fn="test_products",
+                     label="misc", spans=True, merge_entities=True)
+    st = State(data={"text": "Globex sells widget pro and Gizmo to Hooli, not Initechs.", "entities": ["Globex"]})
+    st = step.run(st, {})
+    assert st.data["gazetteer"] == ["Globex", "Widget Pro", "Gizmo", "Hooli"]
+    assert st.data["gazetteer_spans"][2] == ("Gizmo", "product", 28, 33)
+    assert st.data["gazetteer_spans"][0][1] == "org" and st.data["gazetteer_spans"][1][1] == "misc"
+    assert st.data["entities"] == ["Globex", "Widget Pro", "Gizmo", "Hooli"]
+    out = step.run_batch([State(data={"text": "Hooli"}), State(data={"text": "Hooli"})], [{}, {}])
+    assert [s.data["gazetteer"] for s in out] == [["Hooli"], ["Hooli"]]
+
+
+def test_compiled_automaton_is_cached_and_rebuilt_when_terms_change(tmp_path):
+    path = tmp_path / "gaz" / "terms.pkl"
+    first = compile_gazetteer([("Alpha", None), ("Beta", None)], cache_path=path)
+    mtime = os.path.getmtime(path)
+    again = compile_gazetteer([("Alpha", None), ("Beta", None)], cache_path=path)
+    assert again.digest == first.digest and os.path.getmtime(path) == mtime
+    assert [t for t, _, _, _ in again.find("beta alpha")] == ["Beta", "Alpha"]
+    changed = compile_gazetteer([("Gamma", None)], cache_path=path)
+    assert changed.digest != first.digest and len(changed) == 1
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+import pytest
+from ragfine.core.pipeline import Pipeline
+from ragfine.core.pipebase import State
+
+class SleepyStep:
+    """Blocking sync step (e.g. a model call without an async client)."""
+    def __init__(self, name="SleepyStep", seconds=0.2):
+        self.name = name
+        self.seconds = seconds
+    def run(self, state: State, variant: dict) -> State:
+        time.sleep(self.seconds)
+        state.data["thread"] = threading.current_thread().name
+        return state
+
+class AsyncMark:
+    def __init__(self, name="AsyncMark"):
+        self.name = name
+    async def run(self, state: State, variant: dict) -> State:
+        await asyncio.sleep(0)
+        state.data["marked"] = variant["i"]
+        return state
+
+def test_sync_steps_run_off_the_loop_concurrently():
+    pipe = Pipeline([SleepyStep(), AsyncMark()])
+    t0 = time.perf_counter()
+    reports = pipe.run(State(), variants=[{"i": i} for i in range(4)],
+                       async_mode=True, variant_concurrency=4, step_executor="thread")
+    elapsed = time.perf_counter() - t0
+
+    assert elapsed < 0.6  # serial would take >= 0.8s
+    assert [r.final_state.data["marked"] for r in reports] == [0, 1, 2, 3]
+    assert all(r.final_state.data["thread"].startswith("ragfine-step") for r in reports)
+
+def test_step_timeout_abandons_slow_sync_step():
+    pipe = Pipeline([SleepyStep(seconds=1.0)])
+    t0 = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        pipe.run(State(), async_mode=True, step_timeout=0.1, step_executor="thread")
+    assert time.perf_counter() - t0 < 0.9
+
+def test_step_timeout_interrupts_blocking_sync_step_by_default():
+    t0 = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        Pipeline([SleepyStep(seconds=1.0)]).run(State(), async_mode=True, step_timeout=0.1)
+    assert time.perf_counter() - t0 < 0.9
+
+class LoopBound(SleepyStep):
+    offload = False
+
+def test_steps_opt_out_of_offloading():
+    reports = Pipeline([SleepyStep(seconds=0), LoopBound(seconds=0)]).run(State(), async_mode=True)
+    assert reports[0].final_state.data["thread"] == threading.main_thread().name
+    reports = Pipeline([SleepyStep(seconds=0)]).run(State(), async_mode=True)
+    assert reports[0].final_state.data["thread"].startswith("ragfine-step")
+    reports = Pipeline([SleepyStep(seconds=0)]).run(State(), async_mode=True, step_executor=None)
+    assert reports[0].final_state.data["thread"] == threading.main_thread().name
@@ -0,0 +1,76 @@
+import pytest
+from ragfine.core.pipeline import Pipeline
+from ragfine.core.pipebase import State
+from ragfine.steps import SplitMerge
+import ragfine.steps
+
+class BatchUpper:
+    def __init__(self, name="BatchUpper"):
+        self.name = name
+        self.batches = []
+    def run(self, state: State, variant: dict) -> State:
+        raise AssertionError("run_batch should be preferred")
+    def run_batch(self, states, variants):
+        self.batches.append(len(states))
+        for st in states:
+            st.data["text"] = st.data.get("text", "").upper()
+        return states
+
+class Tag:
+    def __init__(self, name="Tag"):
+        self.name = name
+    def run(self, state: State, variant: dict) -> State:
+        state.data["text"] = f"{state.data.get('text', '')}-{variant.get('i', state.data.get('item'))}"
+        return state
+
+def test_pipeline_calls_run_batch_once_per_batch():
+    upper = BatchUpper()
+    pipe = Pipeline([upper, Tag()])
+    reports = pipe.run(State(data={"text": "a"}), variants=[{"i": i} for i in range(5)], batch_size=2)
+    assert [r.final_state.data["text"] for r in reports] == [f"A-{i}" for i in range(5)]
+    assert upper.batches == [2, 2, 1]
+    assert reports[0].steps[0]["batch"] == 2 and "batch" not in reports[0].steps[1]
+
+def test_split_merge_batches_items():
+    upper = BatchUpper()
+    fan = SplitMerge("fan", lambda s, v: s.data["text"].split(), [upper, Tag()])
+    final = Pipeline([fan]).run(State(data={"text": "x y z"}))[0].final_state.data
+    assert [r["text"] for r in final["fan_results"]] == ["X Y Z-x", "X Y Z-y", "X Y Z-z"]
+    assert upper.batches == [3]
+
+def test_insightgen_batch_matches_per_item():
+    ragfine.steps.load_insightgen()
+    from ragfine.insightgen import Entifier, Questor, Solver, Integrator, Refiner, Rebaser
+
+    pipe = Pipeline([Entifier(), Questor(), Solver(), Integrator(), Refiner(), Rebaser()])
+    assert pipe.batched
+    variants = [{"style_suffix": f"\n—{i}"} for i in range(4)]
+    initial = State(data={"text": "Alice emailed Bob via https://example.com"})
+    batched = pipe.run(initial, variants=variants, batch_size=3)
+    single = [pipe._run_variant(initial, v) for v in variants]
+    assert [r.final_state.data for r in batched] == [r.final_state.data for r in single]
+
+    with pytest.raises(ValueError):
+        Entifier().run_batch([State(data={"text": ""})], [{}])  # validation still applies
+
+class FailingBatch(BatchUpper):
+    def run_batch(self, states, variants):
+        raise RuntimeError("batch down")
+
+def test_failing_steps_are_recorded_before_the_error_propagates():
+    pipe = Pipeline([BatchUpper(), FailingBatch("Failing")])
+    records = [[], []]
+    with pytest.raises(RuntimeError, match="batch down"):
+        pipe._run_steps_batched([State(), State()], [{}, {}], records)
+    assert [[r["ok"] for r in rec] for rec in records] == [[True, False], [True, False]]
+    assert records[0][1]["error"] == "RuntimeError('batch down')" and records[0][1]["batch"] == 2
+
+    def boom(state, variant):
+        if variant["i"] == 1:
+            raise ValueError("bad item")
+        return state
+
+    records = [[], []]
+    with pytest.raises(ValueError):
+        Pipeline([BatchUpper(), boom])._run_steps_batched([State(), State()], [{"i": 0}, {"i": 1}], records)
+    assert [r["ok"] for r in records[1]] == [True, False] and records[1][1]["error"] == "ValueError('bad item')"
@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from ragfine.core.pipeline import Pipeline
+from ragfine.core.pipebase import State
+from ragfine.core.cow import copy_state
+from ragfine.core.plan import _timed
+
+
+def add(k):
+    def _add(state, variant):
+        state.data["n"] = state.data.get("n", 0) + k * variant.get("mul", 1)
+        return state
+    _add.__name__ = f"add{k}"
+    return _add
+
+async def async_double(state, variant):
+    await asyncio.sleep(0)
+    state.data["n"] *= 2
+    return state
+
+
+def test_compiled_plan_matches_run_and_groups_sync_steps():
+    pipe = Pipeline([add(1), add(2), async_double, add(3)])
+    plan = pipe.compile()
+    assert [len(seg.runs) for seg in plan.segments] == [2, 1, 1]
+    assert plan.names == ("add1", "add2", "async_double", "add3") and plan.is_async
+
+    expected = pipe.run(State(), variants={"mul": 10}, async_mode=True)[0]
+    rep = plan.run(State(), {"mul": 10})
+    assert rep.final_state.data == expected.final_state.data == {"n": 90}
+    assert [r["name"] for r in rep.steps] == [r["name"] for r in expected.steps]
+
+    seg = pipe.compile("segments").run(State(), {"mul": 10})
+    assert [(r["name"], r["steps"]) for r in seg.steps] == [("add1+add2", 2), ("async_double", 1), ("add3", 1)]
+
+
+def test_compiled_plan_off_and_no_copy():
+    plan = Pipeline([add(1), add(2)]).compile("off")
+    base = State(data={"n": 1})
+    rep = plan.run(copy_state(base), {})
+    assert rep.steps == [] and rep.final_state.data["n"] == 4 and base.data["n"] == 1
+    with pytest.raises(ValueError):
+        Pipeline([add(1)]).compile("verbose")
+
+
+@pytest.mark.filterwarnings("ignore:coroutine .* was never awaited")
+def test_compiled_plan_guards_awaitables_and_records_failures():
+    def lazy(state, variant):  # sync run handing back a coroutine
+        return async_double(state, variant)
+
+    def boom(state, variant):
+        raise ValueError("bad")
+
+    for instrument in ("steps", "segments", "off"):
+        with pytest.raises(RuntimeError, match="returned awaitable in sync mode"):
+            Pipeline([add(1), lazy]).compile(instrument).run(State(), {})
+
+    records = []
+    with pytest.raises(ValueError):
+        _timed(records, "boom", boom, State(), {})
+    assert records[0]["name"] == "boom" and records[0]["ok"] is False and records[0]["error"] == "ValueError('bad')"
@@ -0,0 +1,49 @@
+import os
+import pytest
+from ragfine.core.pipeline import Pipeline
+from ragfine.core.pipebase import State
+from ragfine.core.builder import pipeline_from_yaml
+import ragfine.steps
+
+YAML_SPEC = """
+steps:
+  - use: Entifier
+  - use: Questor
+  - use: Solver
+  - use: Integrator
+  - use: Refiner
+  - use: Rebaser
+"""
+
+class TagStep:
+    def __init__(self, name="TagStep"):
+        self.name = name
+    def run(self, state: State, variant: dict) -> State:
+        state.data["text"] = f"{state.data.get('text', '')}#{variant['i']}"
+        return state
+
+def test_process_executor_from_yaml_spec_keeps_input_order():
+    ragfine.steps.load_insightgen()
+    pipe, defaults = pipeline_from_yaml(YAML_SPEC)
+    assert pipe.spec is not None
+    variants = [{"style_suffix": f"\n—{i}"} for i in range(7)]
+    initial = State(data={"text": "Alice emailed Bob via https://example.com"})
+
+    serial = pipe.run(initial, variants=variants, defaults=defaults)
+    pooled = pipe.run(initial, variants=variants, defaults=defaults,
+                      executor="process", max_workers=2, chunksize=3)
+
+    assert [r.final_state.data for r in pooled] == [r.final_state.data for r in serial]
+    assert all(r.info["worker_pid"] != os.getpid() for r in pooled)
+    assert all("wall_s" in r.info and "chunk_s" in r.info for r in pooled)
+
+@pytest.mark.parametrize("executor", ["process", "thread"])
+def test_pooled_executor_with_inline_steps(executor):
+    pipe = Pipeline([TagStep()])
+    reports = pipe.run(State(data={"text": "x"}), variants=[{"i": i} for i in range(5)],
+                       executor=executor, max_workers=2)
+    assert [r.final_state.data["text"] for r in reports] == [f"x#{i}" for i in range(5)]
+
+def test_executor_rejected_in_async_mode():
+    with pytest.raises(ValueError):
+        Pipeline([TagStep()]).run(State(), variants={"i": 0}, async_mode=True, executor="process")
@@ -0,0 +1,41 @@
+import sys
+import pytest
+from ragfine.core.pipeline import Pipeline, combine
+from ragfine.core.pipebase import State
+from ragfine.core.retention import StepRecord, SpillStore, load_spilled
+
+
+def fill(state, variant):
+    state.data["big"] = "x" * 1000
+    state.data["score"] = variant["k"] * 2
+    return state
+
+
+def test_retain_keys_summary_and_compact_records():
+    pipe = Pipeline([fill])
+    variants = combine({"k": [1, 2, 3]})
+    kept = pipe.run(State(), variants=variants, retain=["score"])
+    assert [r.final_state.data for r in kept] == [{"score": 2}, {"score": 4}, {"score": 6}]
+    rec = kept[0].steps[0]
+    assert isinstance(rec, StepRecord) and rec["name"] == "fill" and rec.get("cache") is None
+    assert dict(rec) == {"name": "fill", "ok": True, "error": None, "duration_s": rec.duration_s}
+    assert sys.getsizeof(rec) < sys.getsizeof(dict(rec))
+
+    summary = list(pipe.run_iter(State(), variants=variants, retain="summary", executor="process", max_workers=2))
+    assert all(r.final_state is None and r.steps[0]["ok"] for r in summary)
+    with pytest.raises(ValueError):
+        pipe.run(State(), retain="none")
+
+
+def test_retain_spill_and_callback(tmp_path):
+    pipe = Pipeline([fill])
+    store = SpillStore(tmp_path / "states.pkl")
+    reports = pipe.run(State(), variants=combine({"k": [1, 2]}), retain=store)
+    assert all(r.final_state is None for r in reports)
+    assert [load_spilled(r).data["score"] for r in reports] == [2, 4]
+    assert [s.data["score"] for s in store] == [2, 4]
+
+    seen = []
+    pipe.run(State(), variants=combine({"k": [5]}), retain=lambda r: seen.append(r.final_state.data["score"]),
+             share_prefixes=True)
+    assert seen == [10]
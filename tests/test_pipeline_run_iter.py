@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from ragfine.core.pipeline import Pipeline
+from ragfine.core.pipebase import State
+
+class DelayStep:
+    """Async step whose duration depends on the variant."""
+    def __init__(self, name="DelayStep"):
+        self.name = name
+    async def run(self, state: State, variant: dict) -> State:
+        await asyncio.sleep(variant["delay"])
+        state.data["i"] = variant["i"]
+        return state
+
+class Echo:
+    def __init__(self, name="Echo"):
+        self.name = name
+    def run(self, state: State, variant: dict) -> State:
+        state.data["i"] = variant["i"]
+        return state
+
+def _variants(n, pulled):
+    for i in range(n):
+        pulled.append(i)
+        yield {"i": i, "delay": 0.05 if i == 0 else 0.0}
+
+def test_run_iter_sync_is_lazy():
+    pulled = []
+    it = Pipeline([Echo()]).run_iter(State(), variants=_variants(1000, pulled))
+    first = next(it)
+    assert first.final_state.data["i"] == 0 and first.info["index"] == 0
+    assert len(pulled) == 1
+    it.close()
+
+def test_run_iter_async_completion_order_and_window():
+    pulled = []
+    it = Pipeline([DelayStep()]).run_iter(
+        State(), variants=_variants(6, pulled), async_mode=True, window=3, ordered=False
+    )
+    reports = list(it)
+    order = [r.info["index"] for r in reports]
+    assert sorted(order) == list(range(6))
+    assert order[0] != 0  # the slow first variant does not hold back the rest
+
+def test_run_iter_async_ordered_matches_run():
+    pipe = Pipeline([DelayStep()])
+    variants = [{"i": i, "delay": 0.01 * (3 - i)} for i in range(4)]
+    streamed = [r.final_state.data["i"] for r in pipe.run_iter(State(), variants=variants, async_mode=True, window=2)]
+    assert streamed == [r.final_state.data["i"] for r in pipe.run(State(), variants=variants, async_mode=True)]
+
+def test_arun_iter_inside_running_loop():
+    async def main():
+        got = []
+        async for rep in Pipeline([DelayStep()]).arun_iter(
+            State(), variants=[{"i": i, "delay": 0} for i in range(3)], ordered=False
+        ):
+            got.append(rep.final_state.data["i"])
+        return got
+    assert sorted(asyncio.run(main())) == [0, 1, 2]
+
+def test_arun_iter_rejects_empty_window():
+    async def main(window):
+        return [rep async for rep in Pipeline([Echo()]).arun_iter(State(), variants=[{"i": 0}], window=window)]
+    for window in (0, -1):
+        with pytest.raises(ValueError, match="window must be >= 1"):
+            asyncio.run(main(window))
+
+def test_run_iter_process_executor_ordered():
+    reports = list(Pipeline([Echo()]).run_iter(
+        State(), variants=({"i": i} for i in range(9)), executor="process",
+        max_workers=2, chunksize=2, window=2,
+    ))
+    assert [r.final_state.data["i"] for r in reports] == list(range(9))
+    assert [r.info["index"] for r in reports] == list(range(9))
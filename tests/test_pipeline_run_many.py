@@ -0,0 +1,40 @@
+from ragfine.core.pipeline import Pipeline, combine
+from ragfine.core.pipebase import State
+
+
+class AppendSuffix:
+    name = "AppendSuffix"
+    def run(self, state: State, variant: dict) -> State:
+        state.data.setdefault("log", []).append(variant.get("suffix", ""))
+        state.data["text"] = state.data["text"] + variant.get("suffix", "")
+        return state
+
+
+def _docs(n):
+    return (State(data={"text": f"doc{i}"}) for i in range(n))
+
+
+def test_run_many_single_variant_processes_states_in_place():
+    docs = list(_docs(3))
+    reports = list(Pipeline([AppendSuffix()]).run_many(iter(docs)))
+    assert [r.final_state.data["text"] for r in reports] == ["doc0", "doc1", "doc2"]
+    assert all(r.final_state is d for r, d in zip(reports, docs))
+    assert [(r.info["doc"], r.info["index"]) for r in reports] == [(0, 0), (1, 0), (2, 0)]
+
+
+def test_run_many_variants_are_isolated_per_document():
+    variants = combine({"suffix": ["!", "?"]})
+    for kwargs in ({}, {"copy_strategy": "cow"}, {"batch_size": 3}, {"async_mode": True},
+                   {"executor": "thread", "max_workers": 2, "ordered": True}):
+        reports = list(Pipeline([AppendSuffix()]).run_many(_docs(3), variants=variants, **kwargs))
+        assert [r.final_state.data["text"] for r in reports] == [
+            "doc0!", "doc0?", "doc1!", "doc1?", "doc2!", "doc2?"], kwargs
+        assert all(len(r.final_state.data["log"]) == 1 for r in reports)
+        assert [r.info["doc"] for r in reports] == [0, 0, 1, 1, 2, 2]
+
+
+def test_run_many_process_pool():
+    reports = list(Pipeline([AppendSuffix()]).run_many(
+        _docs(4), variants=[{"suffix": "."}], executor="process", max_workers=2, chunksize=2))
+    assert [r.final_state.data["text"] for r in reports] == ["doc0.", "doc1.", "doc2.", "doc3."]
+    assert all("worker_pid" in r.info for r in reports)
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from ragfine.core.pipeline import Pipeline, combine
+from ragfine.core.pipebase import State
+import ragfine.steps
+
+# --- Counting steps: one variant-independent, one declared, one tracked -----
+
+class CountingUpper:
+    reads_variant = ()
+    def __init__(self, name="CountingUpper"):
+        self.name = name
+        self.calls = 0
+    def run(self, state: State, variant: dict) -> State:
+        self.calls += 1
+        state.data["text"] = state.data.get("text", "").upper()
+        return state
+
+class Suffix:
+    """Reads the variant without declaring it (keys are tracked at runtime)."""
+    def __init__(self, name="Suffix"):
+        self.name = name
+        self.calls = 0
+    def run(self, state: State, variant: dict) -> State:
+        self.calls += 1
+        state.data["text"] = state.data.get("text", "") + variant.get("suffix", "")
+        return state
+
+class Noop:
+    def __init__(self, name="Noop"):
+        self.name = name
+        self.calls = 0
+    def run(self, state: State, variant: dict) -> State:
+        self.calls += 1
+        return state
+
+def test_shared_prefixes_run_invariant_steps_once():
+    upper, suffix, noop = CountingUpper(), Suffix(), Noop()
+    pipe = Pipeline([upper, noop, suffix])
+    variants = combine({"suffix": ["!", "?", "."], "other": [1, 2]})
+
+    reports = pipe.run(State(data={"text": "hi"}), variants=variants, share_prefixes=True)
+
+    assert [r.final_state.data["text"] for r in reports] == ["HI!", "HI!", "HI?", "HI?", "HI.", "HI."]
+    assert upper.calls == 1 and noop.calls == 1
+    assert suffix.calls == 3  # 'other' is never read by Suffix
+    assert reports[0].steps[0]["shared"] == 6 and reports[0].steps[2]["shared"] == 2
+    # final states are independent objects
+    reports[0].final_state.data["text"] = "changed"
+    assert reports[1].final_state.data["text"] == "HI!"
+
+def test_shared_prefixes_match_plain_run_for_insightgen():
+    ragfine.steps.load_insightgen()
+    from ragfine.insightgen import Entifier, Questor, Solver, Integrator, Refiner, Rebaser
+
+    pipe = Pipeline([Entifier(), Questor(), Solver(), Integrator(), Refiner(), Rebaser()])
+    variants = combine({"style_prefix": ["", "> "], "style_suffix": ["\n—A", "\n—B"]})
+    initial = State(data={"text": "Alice emailed Bob via https://example.com"})
+
+    plain = pipe.run(initial, variants=variants)
+    shared = pipe.run(initial, variants=variants, share_prefixes=True)
+    assert [r.final_state.data for r in shared] == [r.final_state.data for r in plain]
+    assert all(r.steps[0]["shared"] == 4 for r in shared)
+
+    shared_async = pipe.run(initial, variants=variants, share_prefixes=True, async_mode=True)
+    assert [r.final_state.data for r in shared_async] == [r.final_state.data for r in plain]
+
+class SlowSuffix(Suffix):
+    """Async, undeclared reads; records how many representatives run at once."""
+    def __init__(self, name="SlowSuffix"):
+        super().__init__(name)
+        self.active = self.peak = 0
+    async def run(self, state: State, variant: dict) -> State:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return super().run(state, variant)
+
+def test_async_representatives_run_concurrently():
+    step = SlowSuffix()
+    variants = combine({"suffix": ["!", "?", ".", ";"], "other": [1, 2]})
+    reports = Pipeline([step]).run(State(data={"text": "hi"}), variants=variants,
+                                   share_prefixes=True, async_mode=True)
+    assert [r.final_state.data["text"] for r in reports] == ["hi" + v["suffix"] for v in variants]
+    assert step.calls == 4 and step.peak == 3  # first probe alone, then the other three together
+    assert all(r.steps[0]["shared"] == 2 for r in reports)
+
+def test_process_step_executor_keeps_read_tracking():
+    variants = combine({"suffix": ["!", "?"], "other": [1, 2, 3]})
+    reports = Pipeline([Suffix()]).run(State(data={"text": "hi"}), variants=variants, share_prefixes=True,
+                                       async_mode=True, step_executor="process", max_workers=2)
+    assert [r.final_state.data["text"] for r in reports] == ["hi" + v["suffix"] for v in variants]
+    assert all(r.steps[0]["shared"] == 3 for r in reports)
@@ -0,0 +1,51 @@
+import pickle
+
+from ragfine.core.pipebase import State
+from ragfine.core.pipeline import Pipeline
+from ragfine.insightgen import Entifier, Integrator, Questor, Solver
+from ragfine.insightgen.utils import QuestionRecords
+
+
+def test_questor_emits_records_aligned_with_questions():
+    text = "O'Brien wrote to ann@x.org. See https://x.org/a and O'Brien again."
+    st = Questor().run(Entifier(spans=True).run(State(data={"text": text}), {}), {})
+    rec = st.data["question_records"]
+    assert rec.questions == st.data["questions"]
+    assert [(e, k) for e, k, _, _ in rec] == [("O'Brien", "name"), ("See", "name"), ("ann@x.org", "email"), ("https://x.org/a", "url")]
+    assert all(text[off:off + len(e)] == e for e, _, off, _ in rec)
+    assert pickle.loads(pickle.dumps(rec)) == rec
+
+    sents = Questor().run(State(data={"text": "First point. Second point!"}), {}).data["question_records"]
+    assert [(k, off) for _, k, off, _ in sents] == [("sentence", 0), ("sentence", 13)]
+
+
+def test_solver_uses_records_and_falls_back_to_parsing_strings():
+    st = Questor().run(State(data={"text": "x", "entities": ["O'Brien", "a@b.io"]}), {})
+    st = Solver().run(st, {})
+    assert st.data["answers"] == [
+        "O'Brien looks like a named entity mentioned in the text.",
+        "'a@b.io' appears to be a contact detail (email).",
+    ]
+    st.data["questions"] = ["Who uses the email 'c@d.io'?"]  # edited by hand: records no longer apply
+    assert Solver().run(st, {}).data["answers"] == ["'c@d.io' appears to be a contact detail (email)."]
+    assert Integrator().run(st, {}).data["result"] == "- Who uses the email 'c@d.io'? → '" \
+        "c@d.io' appears to be a contact detail (email)."
+
+
+def test_solver_paths_give_identical_answers():
+    text = "O'Brien wrote to ann@x.org about https://x.org/a."
+    for st in (State(data={"text": text}), State(data={"text": "First point. Second point!", "entities": []})):
+        st = Questor().run(Entifier().run(st, {}) if "entities" not in st.data else st, {})
+        with_records = Solver().run(st, {}).data["answers"]
+        del st.data["question_records"]
+        assert Solver().run(st, {}).data["answers"] == with_records
+    assert with_records == ["It refers to a key point inferred from the sentence."] * 2
+
+
+def test_records_flow_through_pipelines_and_worker_processes():
+    pipe = Pipeline([Entifier(), Questor(), Solver(), Integrator()])
+    serial = pipe.run(State(data={"text": "Alice met Bob."}), variants=[{}, {}])
+    pooled = pipe.run(State(data={"text": "Alice met Bob."}), variants=[{}, {}], executor="process", max_workers=2)
+    assert isinstance(pooled[0].final_state.data["question_records"], QuestionRecords)
+    assert [r.final_state.data["result"] for r in pooled] == [r.final_state.data["result"] for r in serial]
+    assert "Alice looks like a named entity" in serial[0].final_state.data["result"]
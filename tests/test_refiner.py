@@ -0,0 +1,46 @@
+import random
+import re
+
+from ragfine.core.pipebase import State
+from ragfine.insightgen import Refiner
+from ragfine.insightgen.refiner import RefineStream, refine_stream, refine_text
+
+
+def _three_pass(text, ensure_trailing_newline=False):
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = re.sub(r"\s*→\s*", " → ", text)
+    text = text.strip()
+    return text + "\n" if ensure_trailing_newline and not text.endswith("\n") else text
+
+
+def test_single_pass_matches_three_pass_rules():
+    cases = [
+        "  - q → a  \n\n\n\n- q2→a2\t\n",
+        "x → → y", "a\n \n\t\nb", "→ start", "end →  ", "a \r\n\n\nb", "a\xa0→\n\nb", "", " \n ",
+    ]
+    rng = random.Random(7)
+    cases += ["".join(rng.choice(["a", " ", "\t", "\n", "→", "\r"]) for _ in range(30)) for _ in range(2000)]
+    for text in cases:
+        for nl in (False, True):
+            assert refine_text(text, nl) == _three_pass(text, nl), repr(text)
+
+
+def test_streaming_chunks_give_the_same_text():
+    rng = random.Random(3)
+    text = "".join(f"- Q{i}? {rng.choice(['→', ' → ', '  →', '→  '])}A{i}.{rng.choice([' ', '  ', ''])}\n"
+                   + rng.choice(["", "\n", "\n\n\n", " \n \n"]) for i in range(200))
+    for size in (1, 2, 7, 64):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert "".join(refine_stream(chunks, True)) == _three_pass(text, True)
+
+    stream = RefineStream()
+    assert stream.feed("  Hello   ") == "Hello"
+    assert stream.feed("\n\n\n→ world  ") == " → world"
+    assert stream.close() == ""
+
+
+def test_refiner_step():
+    st = Refiner(ensure_trailing_newline=True).run(State(data={"result": "a  →b \n\n\n\nc "}), {})
+    assert st.data["result"] == "a → b\n\nc\n"
+    assert Refiner().stream().feed("x→") == "x"
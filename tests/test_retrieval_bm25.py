@@ -0,0 +1,85 @@
+import math
+from collections import Counter
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ragfine.core.pipebase import State
+from ragfine.core.pipeline import Pipeline
+from ragfine.retrieval import BM25Index, Retriever, tokenize
+
+CORPUS = [
+    "Acme builds rockets and anvils.",
+    "The anvil market grew; Acme leads it.",
+    "Globex sells software to Initech.",
+    "Rockets, rockets everywhere: a rocket review.",
+    "Nothing relevant here.",
+]
+
+
+def _reference_scores(query, k1=1.5, b=0.75):
+    docs = [Counter(tokenize(t)) for t in CORPUS]
+    avgdl = sum(sum(d.values()) for d in docs) / len(docs)
+    scores = []
+    for d in docs:
+        dl, s = sum(d.values()), 0.0
+        for term in tokenize(query):
+            df = sum(1 for x in docs if term in x)
+            if term in d:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                s += idf * d[term] * (k1 + 1) / (d[term] + k1 * (1 - b + b * dl / avgdl))
+        scores.append(s)
+    return scores
+
+
+def test_scores_match_reference_bm25_and_topk_order():
+    index = BM25Index.build(CORPUS, block=2)  # several build blocks
+    for query in ("acme rockets", "anvil", "rockets rockets software"):
+        ref = _reference_scores(query)
+        hits = index.search(query, k=3)
+        expected = sorted((i for i, s in enumerate(ref) if s > 0), key=lambda i: (-ref[i], i))[:3]
+        assert [i for i, _ in hits] == expected
+        assert all(s == pytest.approx(ref[i], rel=1e-5) for i, s in hits)
+    assert index.search("unknownword") == []
+
+
+def test_index_round_trips_through_memory_mapped_npy(tmp_path):
+    path = tmp_path / "idx"
+    built = BM25Index.build(CORPUS, ids=[f"d{i}" for i in range(len(CORPUS))])
+    built.save(path)
+    loaded = BM25Index.load(path)
+    assert isinstance(loaded.docs, np.memmap) and isinstance(loaded.texts.blob, np.memmap)
+    assert loaded.search("acme anvil", 2) == built.search("acme anvil", 2)
+    assert loaded.hits("globex", 1) == [{"id": "d2", "score": pytest.approx(built.search("globex", 1)[0][1]),
+                                         "rank": 0, "text": CORPUS[2]}]
+
+
+def test_retriever_step_builds_once_saves_and_honours_variant_top_k(tmp_path):
+    path = str(tmp_path / "idx")
+    step = Retriever(index_path=path, corpus=CORPUS, k=2)
+    assert Retriever(index_path=path).index.meta == step.index.meta  # second step loads, no corpus needed
+    reports = Pipeline([step]).run(State(data={"query": "acme rockets"}), variants=[{}, {"top_k": 1}], batch_size=8)
+    assert [len(r.final_state.data["retrieved"]) for r in reports] == [2, 1]
+    assert reports[0].final_state.data["retrieved"][0]["text"] == CORPUS[0]
+    with pytest.raises(ValueError):
+        Retriever(index_path=str(tmp_path / "missing"))
+
+
+def test_saved_index_is_rebuilt_for_another_corpus_and_keyed_by_it(tmp_path):
+    path = str(tmp_path / "idx")
+    first = Retriever(index_path=path, corpus=CORPUS)
+    edited = CORPUS[:-1] + ["Here: nothing relevant."]  # same postings and sizes, different text
+    second = Retriever(index_path=path, corpus=edited)
+    assert second.index.meta["corpus"] != first.index.meta["corpus"]
+    assert second.index.hits("nothing", 1)[0]["text"] == "Here: nothing relevant."
+    assert Retriever(index_path=path).index.meta == second.index.meta  # no corpus: loaded as saved
+    in_memory = [Retriever(corpus=c).cache_key() for c in (CORPUS, edited, CORPUS)]
+    assert in_memory[0] != in_memory[1] and in_memory[0] == in_memory[2]
+    assert Retriever(index_path=path, corpus=edited, k1=1.2).index.meta["k1"] == 1.2
+
+
+def test_ties_at_the_cut_go_to_the_lower_doc_number():
+    index = BM25Index.build(["filler text"] * 3 + ["acme"] * 40 + ["acme acme"])
+    hits = index.search("acme", k=5)
+    assert [d for d, _ in hits] == [43, 3, 4, 5, 6]
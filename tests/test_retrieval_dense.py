@@ -0,0 +1,73 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ragfine.core.pipebase import State
+from ragfine.core.pipeline import Pipeline
+from ragfine.core.registry import register_fn
+from ragfine.retrieval import DenseIndex, DenseRetriever, hashing_embedder
+
+CORPUS = ["acme rockets", "anvil market acme", "globex software", "rocket review rockets", "nothing here"]
+
+
+def test_blocked_search_matches_full_matrix_topk(tmp_path):
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((1000, 16)).astype(np.float32)
+    index = DenseIndex.from_vectors(tmp_path / "idx", vecs)
+    assert isinstance(index.matrix, np.memmap)
+    queries = rng.standard_normal((4, 16)).astype(np.float32)
+    got = index.search_many(queries, k=5, block_rows=64)  # many blocks, running top-k
+    full = vecs @ queries.T
+    for j, hits in enumerate(got):
+        assert [i for i, _ in hits] == list(np.argsort(-full[:, j], kind="stable")[:5])
+        assert [s for _, s in hits] == pytest.approx([float(full[i, j]) for i, _ in hits], rel=1e-5)
+    assert index.search_many(queries[:1], k=5, block_rows=3) == index.search_many(queries[:1], k=5)
+
+
+def test_hashing_embedder_is_deterministic_and_normalised():
+    a, b = hashing_embedder(["Acme rockets", "acme ROCKETS"]), hashing_embedder(["acme rockets"])
+    assert np.allclose(a[0], a[1]) and np.allclose(a[0], b[0])
+    assert np.linalg.norm(a[0]) == pytest.approx(1.0)
+
+
+def test_dense_retriever_step_with_registry_embedder_and_batches(tmp_path):
+    register_fn("test_embed_64", lambda texts: hashing_embedder(texts, dim=64))
+    step = DenseRetriever(index_path=str(tmp_path / "idx"), embedder="test_embed_64", corpus=CORPUS, k=2)
+    assert step.index.dim == 64 and len(step.index) == len(CORPUS)
+    st = step.run(State(data={"query": "acme rockets"}), {})
+    assert st.data["retrieved"][0] == {"id": 0, "score": pytest.approx(1.0), "rank": 0, "text": "acme rockets"}
+    reports = Pipeline([step]).run(State(data={"query": "globex software"}), variants=[{}, {"top_k": 1}], batch_size=8)
+    assert [[h["id"] for h in r.final_state.data["retrieved"]] for r in reports][1] == [2]
+    assert len(reports[0].final_state.data["retrieved"]) == 2
+    reloaded = DenseRetriever(index_path=str(tmp_path / "idx"), embedder="test_embed_64", k=2)
+    assert reloaded.run(State(data={"query": "acme rockets"}), {}).data["retrieved"] == st.data["retrieved"]
+
+
+def test_ties_at_the_cut_go_to_the_lower_doc_number(tmp_path):
+    rng = np.random.default_rng(0)
+    vecs = np.zeros((300, 4), np.float32)
+    vecs[:, 0] = rng.integers(0, 3, 300)  # many exact ties
+    index = DenseIndex.from_vectors(tmp_path / "idx", vecs)
+    query = np.array([[1, 0, 0, 0]], np.float32)
+    expected = sorted(range(300), key=lambda i: (-vecs[i, 0], i))[:20]
+    for rows in (7, 64, 1024):  # ties inside one block and across blocks
+        assert [i for i, _ in index.search_many(query, k=20, block_rows=rows)[0]] == expected
+
+
+def test_no_index_path_builds_in_a_temporary_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    step = DenseRetriever(corpus=CORPUS, k=1)
+    assert step.run(State(data={"query": "globex"}), {}).data["retrieved"][0]["id"] == 2
+    assert list(tmp_path.iterdir()) == []  # nothing written into the working directory
+    with pytest.raises(ValueError, match="index_path"):
+        DenseRetriever()
+
+
+def test_saved_index_is_rebuilt_for_another_corpus(tmp_path):
+    path = str(tmp_path / "idx")
+    first = DenseRetriever(index_path=path, corpus=CORPUS, k=1)
+    edited = CORPUS[:-1] + ["acme acme rockets"]
+    second = DenseRetriever(index_path=path, corpus=edited, k=1)
+    assert second.cache_key() != first.cache_key()
+    assert second.run(State(data={"query": "acme acme rockets"}), {}).data["retrieved"][0]["id"] == 4
+    assert DenseRetriever(index_path=path).index.meta == second.index.meta  # no corpus: loaded as saved
@@ -0,0 +1,97 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ragfine.core.pipebase import State
+from ragfine.core.pipeline import Pipeline, combine
+from ragfine.retrieval import Retriever, RetrievalEval, RetrievalEvaluator, evaluate_rankings, read_qrels
+
+QRELS = {"q1": {"a": 2, "b": 1}, "q2": ["c"], "q3": {}}
+
+
+def _reference(judged, ranked, k):
+    """Plain-Python metrics for one ranking (linear gains; MRR over the whole ranking)."""
+    rel = {d: g for d, g in judged.items() if g > 0}
+    ranked = list(dict.fromkeys(ranked))  # repeated ids count once
+    top = ranked[:k]
+    recall = sum(d in rel for d in top) / len(rel)
+    dcg = sum(rel.get(d, 0) / math.log2(i + 2) for i, d in enumerate(top))
+    idcg = sum(g / math.log2(i + 2) for i, g in enumerate(sorted(rel.values(), reverse=True)[:k]))
+    rr = next((1 / (i + 1) for i, d in enumerate(ranked) if d in rel), 0.0)
+    return recall, dcg / idcg, rr
+
+
+def test_batched_metrics_match_reference_loop():
+    rng = np.random.default_rng(1)
+    docs = [f"d{i}" for i in range(30)]
+    qrels = {f"q{i}": {d: int(rng.integers(0, 3)) for d in rng.choice(docs, 6, replace=False)} for i in range(40)}
+    qrels = {q: j for q, j in qrels.items() if any(g > 0 for g in j.values())}
+    qids = list(qrels)
+    rankings = [list(rng.choice(docs, int(rng.integers(0, 25)))) for _ in qids]  # with repeats, past k
+    got = evaluate_rankings(qrels, qids, rankings, ks=(1, 5, 10))
+    for i, q in enumerate(qids):
+        recall, ndcg, rr = _reference(qrels[q], rankings[i], 5)
+        assert got["recall@5"][i] == pytest.approx(recall)
+        assert got["ndcg@5"][i] == pytest.approx(ndcg)
+        assert got["mrr"][i] == pytest.approx(rr)
+
+
+def test_unjudged_queries_are_skipped():
+    got = evaluate_rankings(QRELS, ["q3", "nope", "q2"], [["a"], ["a"], ["x", "c"]], ks=(1, 2))
+    assert np.isnan(got["mrr"][:2]).all()
+    assert got["mrr"][2] == 0.5 and got["recall@1"][2] == 0.0 and got["recall@2"][2] == 1.0
+
+
+def test_evaluator_streams_per_variant_means():
+    variants = [{"name": "good"}, {"name": "bad"}]
+    ev = RetrievalEvaluator(QRELS, ks=(1, 2), variants=variants, batch=2)  # flushes mid-stream
+    ev.add(0, "q1", [{"id": "a"}, {"id": "b"}])
+    ev.add(0, "q2", ["c"])
+    ev.add(1, "q1", ["x", "b"])
+    ev.add(1, "q2", [])
+    ev.add(1, "q3", ["a"])
+    res = ev.results()
+    assert res[0]["queries"] == 2 and res[0]["mrr"] == 1.0 and res[0]["ndcg@2"] == pytest.approx(1.0)
+    assert res[1]["mrr"] == pytest.approx(0.25) and res[1]["recall@2"] == pytest.approx(0.25)
+    assert ev.skipped == 1
+    assert [r["variant"]["name"] for r in ev.rows(sort_by="mrr")] == ["good", "bad"]
+
+
+def test_evaluator_as_retain_policy_over_a_grid():
+    corpus = ["acme rockets", "anvil market acme", "globex software", "rocket review rockets"]
+    qrels = {0: {0: 1}, 1: {2: 1}}
+    grid = combine({"top_k": [1, 3]})
+    pipe = Pipeline([Retriever(corpus=corpus, with_text=False), RetrievalEval(qrels=qrels, ks=(1, 3))])
+    ev = RetrievalEvaluator(qrels, ks=(1, 3), variants=grid)
+    states = [State(data={"query": "acme rockets", "query_id": 0}), State(data={"query": "globex", "query_id": 1})]
+    reports = list(pipe.run_many(states, variants=grid, retain=ev, batch_size=4))
+    assert all(r.final_state is None for r in reports)
+    res = ev.results()
+    assert res[0]["recall@1"] == 1.0 and res[1]["recall@3"] == 1.0 and res[1]["queries"] == 2
+
+
+def test_step_and_qrels_file(tmp_path):
+    path = tmp_path / "qrels.txt"
+    path.write_text("q1 0 a 2\nq1 0 b 1\nq2 0 c 0\n")
+    assert read_qrels(path) == {"q1": {"a": 2.0, "b": 1.0}, "q2": {"c": 0.0}}
+    step = RetrievalEval(qrels_file=str(path), ks=(2,))
+    states = [State(data={"query_id": "q1", "retrieved": [{"id": "b"}, {"id": "a"}]}),
+              State(data={"query_id": "q2", "retrieved": [{"id": "c"}]})]
+    step.run_batch(states, [{}, {}])
+    assert states[0].data["retrieval_metrics"]["recall@2"] == 1.0
+    assert states[0].data["retrieval_metrics"]["ndcg@2"] == pytest.approx((1 + 2 / math.log2(3)) / (2 + 1 / math.log2(3)))
+    assert states[1].data["retrieval_metrics"] == {}
+
+
+def test_step_cache_key_identifies_the_judgements():
+    a, b = RetrievalEval(qrels={"q": {"a": 1}}), RetrievalEval(qrels={"q": {"b": 1}})
+    assert a.cache_key() != b.cache_key()
+    assert a.cache_key() == RetrievalEval(qrels={"q": ["a"]}).cache_key()  # same judgements, other form
+
+
+def test_mrr_sees_the_whole_ranking_and_repeats_count_once():
+    got = evaluate_rankings({"q": {"a": 1, "b": 1}}, ["q", "q"], [["x", "y", "a"], ["a", "a", "a"]], ks=(2,))
+    assert got["mrr"][0] == pytest.approx(1 / 3) and got["recall@2"][0] == 0.0
+    assert got["recall@2"][1] == 0.5 and got["ndcg@2"][1] == pytest.approx(1 / (1 + 1 / math.log2(3)))
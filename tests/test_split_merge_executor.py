@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ragfine.core.pipebase import State
+from ragfine.core.pipeline import Pipeline
+from ragfine.core.registry import register_step, register_fn, STEP_REGISTRY
+from ragfine.steps import SplitMerge, split_merge
+
+
+class Square:
+    """Sub-step that refuses to be pickled: process workers must rebuild it from its spec."""
+    name = "square"
+
+    def __init__(self, offset: int = 0):
+        self.offset = offset
+        self.batches = []
+
+    def __reduce__(self):
+        raise TypeError("Square is built from the registry, not pickled")
+
+    def run_batch(self, states, variants):
+        self.batches.append(len(states))
+        for s in states:
+            s.data["out"] = s.data["item"] ** 2 + self.offset
+            s.data["pid"] = os.getpid()
+        return states
+
+    def run(self, state, variant):
+        return self.run_batch([state], [variant])[0]
+
+
+register_step("test_square", lambda **kw: Square(**kw))
+register_fn("test_range_items", lambda state, variant: range(state.data["n"]))
+
+
+def _items(state, variant):
+    return range(state.data["n"])
+
+
+def test_thread_executor_keeps_item_order_and_batches_chunks():
+    fan = SplitMerge("fan", _items, [Square()], executor="thread", max_workers=4, chunksize=3)
+    out = fan.run(State(data={"n": 10}), {})
+    assert [r["out"] for r in out.data["fan_results"]] == [i * i for i in range(10)]
+    assert sorted(fan._steps[0].batches) == [1, 3, 3, 3]
+
+
+def test_process_executor_rebuilds_registry_sub_steps_in_workers():
+    fan = split_merge("fan", "test_range_items", [{"use": "test_square", "offset": 1}],
+                      executor="process", max_workers=2, chunksize=4)
+    reports = Pipeline([fan]).run(State(data={"n": 12}), variants=[{}, {}])
+    for rep in reports:
+        results = rep.final_state.data["fan_results"]
+        assert [r["out"] for r in results] == [i * i + 1 for i in range(12)]
+        assert all(r["pid"] != os.getpid() for r in results)  # built in workers: Square can't be pickled
+
+
+def test_injected_executor_and_registry_entry():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        fan = STEP_REGISTRY["split_merge"](name="fan", items_fn=_items, sub_steps=["test_square"], executor=pool)
+        for n in (3, 5):  # the pool is reused across runs and left open
+            assert [r["out"] for r in fan.run(State(data={"n": n}), {}).data["fan_results"]] == [i * i for i in range(n)]
+        assert not pool._shutdown
+    with pytest.raises(ValueError):
+        SplitMerge("fan", _items, [], executor="gpu")
+
+
+def test_spawned_pool_is_built_once_and_reused_across_runs():
+    fan = split_merge("fan", "test_range_items", [{"use": "test_square", "offset": 2}],
+                      executor="process", max_workers=2, chunksize=3, mp_context="spawn")
+    try:
+        pids = set()
+        for n in (6, 9):  # runtime-registered step rebuilt in spawned workers from its spec
+            results = fan.run(State(data={"n": n}), {}).data["fan_results"]
+            assert [r["out"] for r in results] == [i * i + 2 for i in range(n)]
+            pids |= {r["pid"] for r in results}
+        pool = fan._pool
+        fan.run(State(data={"n": 2}), {})
+        assert fan._pool is pool and os.getpid() not in pids and len(pids) <= 2
+    finally:
+        fan.close()
+    assert fan._pool is None
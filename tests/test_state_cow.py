@@ -0,0 +1,81 @@
+import copy
+from typing import Any, List
+import pytest
+from pydantic import BaseModel
+from ragfine.core.pipeline import Pipeline
+from ragfine.core.pipebase import State
+from ragfine.core.cow import CowState, CowDict, copy_state, peek
+from ragfine.steps.validators import validate_io
+
+class AppendStep:
+    def __init__(self, name="AppendStep"):
+        self.name = name
+    def run(self, state: State, variant: dict) -> State:
+        state.data["docs"].append(variant["doc"])  # in-place mutation
+        state.meta["seen"] = variant["doc"]
+        return state
+
+def test_cow_fork_isolates_in_place_mutation():
+    corpus = [{"id": i} for i in range(3)]
+    base = State(data={"docs": corpus, "text": "x" * 1000})
+    a, b = CowState.fork(base), CowState.fork(base)
+
+    assert dict.__getitem__(a.data, "docs") is corpus  # shared until accessed
+    a.data["docs"].append({"id": 99})
+    assert len(b.data["docs"]) == 3 and len(corpus) == 3
+    assert a.data["text"] is base.data["text"]  # immutables are never copied
+
+    # forking a fork keeps both sides copy-on-write
+    c = copy.deepcopy(a)
+    c.data["docs"].pop()
+    assert len(a.data["docs"]) == 4 and len(c.data["docs"]) == 3
+    assert isinstance(c, CowState) and isinstance(c.data, CowDict)
+
+@pytest.mark.parametrize("strategy", ["deepcopy", "cow"])
+def test_pipeline_copy_strategy_keeps_variants_isolated(strategy):
+    initial = State(data={"docs": []})
+    reports = Pipeline([AppendStep()]).run(
+        initial, variants=[{"doc": "a"}, {"doc": "b"}], copy_strategy=strategy
+    )
+    assert [r.final_state.data["docs"] for r in reports] == [["a"], ["b"]]
+    assert [r.final_state.meta["seen"] for r in reports] == ["a", "b"]
+    assert initial.data["docs"] == []
+
+def test_unknown_copy_strategy_raises():
+    with pytest.raises(ValueError):
+        copy_state(State(), "bogus")
+    with pytest.raises(ValueError):
+        Pipeline([AppendStep()]).run(State(), copy_strategy="bogus")
+
+def test_peek_reads_without_copying():
+    corpus = [{"id": i} for i in range(3)]
+    fork = CowState.fork(State(data={"corpus": corpus}))
+    assert peek(fork.data, "corpus") is corpus and peek(fork.data, "missing", 0) == 0
+    assert fork.data["corpus"] is not corpus  # a plain read still takes a private copy
+    assert peek({"a": corpus}, "a") is corpus
+
+class Tracked:
+    """Counts deep copies made of it."""
+    copies = 0
+    def __deepcopy__(self, memo):
+        Tracked.copies += 1
+        return Tracked()
+
+class BlobIn(BaseModel):
+    blob: Any
+    tags: List[str] = []
+
+class CountOut(BaseModel):
+    n: int
+
+@validate_io(input_model=BlobIn, output_model=CountOut)
+def count_tags(state, variant):
+    state.data["n"] = len(peek(state.data, "tags"))
+    return state
+
+def test_validated_read_only_step_copies_nothing_under_cow():
+    Tracked.copies = 0
+    pipe = Pipeline([count_tags])
+    reports = pipe.run(State(data={"blob": Tracked(), "tags": ["a", "b"]}), variants=[{}, {}, {}], copy_strategy="cow")
+    assert [r.final_state.data["n"] for r in reports] == [2, 2, 2]
+    assert Tracked.copies == 0
@@ -0,0 +1,154 @@
+import os
+import subprocess
+import sys
+from ragfine.core.pipeline import Pipeline, combine
+from ragfine.core.pipebase import State
+from ragfine.core.cache import StepCache
+from ragfine.core.builder import pipeline_from_spec
+import ragfine.steps
+
+CALLS = {"upper": 0, "suffix": 0}
+
+class Upper:
+    reads_variant = ()
+    def __init__(self, name="Upper"):
+        self.name = name
+    def run(self, state: State, variant: dict) -> State:
+        CALLS["upper"] += 1
+        state.data["text"] = state.data["text"].upper()
+        return state
+
+class Suffix:
+    reads_variant = ("suffix",)
+    def __init__(self, name="Suffix", repeat=1):
+        self.name = name
+        self.repeat = repeat
+    def run(self, state: State, variant: dict) -> State:
+        CALLS["suffix"] += 1
+        state.data["text"] += variant["suffix"] * self.repeat
+        return state
+
+def test_cache_hits_on_rerun_and_reruns_only_downstream(tmp_path):
+    CALLS.update(upper=0, suffix=0)
+    cache = StepCache(tmp_path / "c.sqlite")
+    variants = combine({"suffix": ["!", "?"], "unused": [1, 2]})
+    initial = State(data={"text": "hi"})
+
+    first = Pipeline([Upper(), Suffix()], cache=cache).run(initial, variants=variants)
+    assert [r.final_state.data["text"] for r in first] == ["HI!", "HI!", "HI?", "HI?"]
+    assert [s["cache"] for s in first[0].steps] == ["miss", "miss"]
+    assert first[1].steps[0]["cache"] == "hit" and first[1].steps[1]["cache"] == "hit"  # 'unused' is not read
+    assert CALLS == {"upper": 1, "suffix": 2}
+
+    # a fresh cache object on the same file: everything hits
+    again = Pipeline([Upper(), Suffix()], cache=StepCache(tmp_path / "c.sqlite")).run(initial, variants=variants)
+    assert [r.final_state.data for r in again] == [r.final_state.data for r in first]
+    assert all(s["cache"] == "hit" for r in again for s in r.steps)
+
+    # changing a downstream parameter re-runs only that step
+    edited = Pipeline([Upper(), Suffix(repeat=2)], cache=cache).run(initial, variants=variants)
+    assert edited[0].final_state.data["text"] == "HI!!"
+    assert edited[0].steps[0]["cache"] == "hit" and edited[0].steps[1]["cache"] == "miss"
+    assert CALLS == {"upper": 1, "suffix": 4}
+
+def test_cache_lru_eviction_and_uncacheable_steps(tmp_path):
+    cache = StepCache(tmp_path / "lru.sqlite", max_bytes=400)
+    for i in range(10):
+        cache.put(f"k{i}", State(data={"text": "x" * 50, "i": i}))
+    assert 0 < len(cache) < 10 and cache.size_bytes <= 400
+    assert cache.get("k9") is not None and cache.get("k0") is None
+
+    class Clock:
+        cacheable = False
+        def run(self, state, variant):
+            return state
+    rep = Pipeline([Clock()], cache=cache).run(State())[0]
+    assert "cache" not in rep.steps[0]
+
+def test_cache_from_spec_and_batched_insightgen(tmp_path):
+    spec = {"cache": {"path": str(tmp_path / "spec.sqlite")}, "steps": ["Entifier", "Questor"]}
+    ragfine.steps.load_insightgen()
+    pipe, _ = pipeline_from_spec(spec)
+    docs = [State(data={"text": "Alice met Bob"}) for _ in range(3)]
+    first = list(pipe.run_many(docs))
+    assert first[0].steps[0]["cache"] == "miss" and first[0].steps[0]["batch"] == 3
+    pipe2, _ = pipeline_from_spec(spec)
+    again = list(pipe2.run_many([State(data={"text": "Alice met Bob"})], executor="process", max_workers=1))
+    assert [s["cache"] for s in again[0].steps] == ["hit", "hit"]
+    assert again[0].final_state.data == first[0].final_state.data
+
+def test_functions_are_keyed_by_code_closures_and_defaults(tmp_path):
+    cache = StepCache(tmp_path / "fn.sqlite")
+
+    def mk(n):
+        def set_x(state, variant):
+            state.data["x"] = n
+            return state
+        return set_x
+
+    assert Pipeline([mk(1)], cache=cache).run(State())[0].final_state.data == {"x": 1}
+    assert Pipeline([mk(100)], cache=cache).run(State())[0].final_state.data == {"x": 100}
+    a = Pipeline([lambda s, v: State(data={"y": "a"})], cache=cache).run(State())[0]
+    b = Pipeline([lambda s, v: State(data={"y": "b"})], cache=cache).run(State())[0]
+    assert (a.final_state.data, b.final_state.data) == ({"y": "a"}, {"y": "b"})
+    again = Pipeline([mk(1)], cache=cache).run(State())[0]
+    assert again.steps[0]["cache"] == "hit" and again.final_state.data == {"x": 1}
+
+def test_reads_state_hits_merge_only_written_keys(tmp_path):
+    cache = StepCache(tmp_path / "partial.sqlite")
+
+    class Length:
+        reads_state = ("text",)
+        writes_state = ("length",)
+        name = "Length"
+        def run(self, state, variant):
+            state.data["length"] = len(state.data["text"])
+            state.data["other"] = "stale"  # undeclared write: never cached
+            return state
+
+    class Opaque(Length):
+        writes_state = None
+
+    Pipeline([Length()], cache=cache).run(State(data={"text": "abc", "other": 1}))
+    rep = Pipeline([Length()], cache=cache).run(State(data={"text": "abc", "other": 2}))[0]
+    assert rep.steps[0]["cache"] == "hit"
+    assert rep.final_state.data == {"text": "abc", "other": 2, "length": 3}
+    rep = Pipeline([Opaque()], cache=cache).run(State(data={"text": "abc"}))[0]
+    assert "cache" not in rep.steps[0]  # reads_state without a known write set is not cached
+
+SCALE = 2
+
+def scaled(state, variant):
+    state.data["x"] = state.data.get("x", 1) * SCALE
+    return state
+
+def test_functions_are_keyed_by_the_globals_they_use(tmp_path):
+    global SCALE
+    cache = StepCache(tmp_path / "globals.sqlite")
+    assert Pipeline([scaled], cache=cache).run(State())[0].final_state.data == {"x": 2}
+    SCALE = 3
+    try:
+        rep = Pipeline([scaled], cache=cache).run(State())[0]
+        assert rep.steps[0]["cache"] == "miss" and rep.final_state.data == {"x": 3}
+    finally:
+        SCALE = 2
+
+def test_set_valued_state_keys_do_not_depend_on_the_hash_seed(tmp_path):
+    code = ("from ragfine.core.cache import StepCache; from ragfine.core.pipebase import State\n"
+            "def step(s, v): return s\n"
+            "print(StepCache(':memory:').key(step, State(data={'tags': {'alpha', 'beta', 'gamma', 'delta'}}), {}))")
+    keys = {
+        subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                       env={**os.environ, "PYTHONHASHSEED": seed}).stdout
+        for seed in ("1", "2", "3")
+    }
+    assert len(keys) == 1
+
+def test_running_total_follows_replacements_and_eviction(tmp_path):
+    cache = StepCache(tmp_path / "total.sqlite", max_bytes=1000)
+    for i in range(30):
+        cache.put(f"k{i % 7}", State(data={"text": "x" * (10 * i)}))
+        db = cache._db()
+        assert cache.size_bytes == db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] <= 1000
+    cache.clear()
+    assert cache.size_bytes == 0 and len(cache) == 0
@@ -0,0 +1,54 @@
+import asyncio
+import json
+from ragfine.core.pipeline import Pipeline, combine
+from ragfine.core.pipebase import State
+from ragfine.core.tracing import trace, span, _NULL_SPAN
+from ragfine.steps import BranchStep, AsyncSplitMerge
+
+
+def inc(state, variant):
+    state.data["n"] = state.data.get("n", 0) + 1
+    return state
+
+async def slow(state, variant):
+    await asyncio.sleep(0.01)
+    return state
+
+
+def _by_id(events):
+    return {ev[6]: ev for ev in events}
+
+
+def test_spans_nest_variant_step_substep_and_export(tmp_path):
+    pipe = Pipeline([BranchStep("branch", lambda s, v: True, [inc], [])])
+    with trace() as tracer:
+        pipe.run(State(), variants=combine({"k": [1, 2]}))
+    events = tracer.events
+    ids = _by_id(events)
+    sub = [ev for ev in events if ev[0] == "inc"]
+    assert len(sub) == 2
+    parent = ids[sub[0][7]]
+    assert parent[0] == "branch" and ids[parent[7]][0] == "variant"
+    for ev in events:
+        assert ev[2] <= ev[3]
+
+    out = tracer.export_chrome(str(tmp_path / "t.json"))
+    doc = json.load(open(out))
+    assert {e["name"] for e in doc["traceEvents"] if e["ph"] == "X"} >= {"variant", "branch", "inc"}
+
+
+def test_async_variants_and_items_get_separate_tracks():
+    fan = AsyncSplitMerge("fan", lambda s, v: [1, 2, 3], [slow])
+    with trace() as tracer:
+        Pipeline([fan]).run(State(), variants=combine({"k": [1, 2]}), async_mode=True)
+    items = [ev for ev in tracer.events if ev[1] == "item"]
+    assert len(items) == 6 and len({ev[5] for ev in items}) == 6  # one track per item task
+    variants = [ev for ev in tracer.events if ev[1] == "variant"]
+    assert variants[0][2] < variants[1][3] and variants[1][2] < variants[0][3]  # overlapping on the timeline
+
+
+def test_process_worker_spans_are_merged_and_tracing_off_is_noop():
+    with trace() as tracer:
+        Pipeline([inc]).run(State(), variants=combine({"k": [1, 2]}), executor="process", max_workers=2)
+    assert len([ev for ev in tracer.events if ev[0] == "inc"]) == 2
+    assert span("x") is _NULL_SPAN
@@ -0,0 +1,60 @@
+from typing import Dict, List
+import pytest
+from pydantic import BaseModel, Field
+from ragfine.core.pipebase import State
+from ragfine.steps.validators import validate_io, validation_mode, set_validation_mode
+
+
+class In(BaseModel):
+    text: str
+
+class Out(BaseModel):
+    count: int
+    tags: List[str]
+
+
+@validate_io(input_model=In, output_model=Out)
+def count_words(state, variant):
+    state.data["count"] = str(len(state.data["text"].split()))  # coerced to int by Out
+    state.data.setdefault("tags", [])
+    return state
+
+
+def test_validate_io_reads_declared_fields_and_merges_only_coerced():
+    tags = ["a", "b"]
+    big = list(range(10_000))
+    st = count_words(State(data={"text": "one two", "tags": tags, "big": big}), {})
+    assert st.data["count"] == 2
+    assert st.data["tags"] is tags and st.data["big"] is big  # untouched, not re-dumped
+    with pytest.raises(ValueError, match="input validation failed"):
+        count_words(State(data={"text": None}), {})
+
+
+class Scores(BaseModel):
+    scores: List[float]
+    by_doc: Dict[str, List[float]]
+    top_k: int = Field(alias="topK")
+
+
+@validate_io(input_model=In, output_model=Scores)
+def score(state, variant):
+    state.data.update(scores=[1, 2.5], by_doc={"d": [3]}, topK="5")
+    return state
+
+
+def test_write_back_uses_the_read_key_and_catches_nested_coercion():
+    st = score(State(data={"text": ""}), {})
+    assert st.data == {"text": "", "scores": [1.0, 2.5], "by_doc": {"d": [3.0]}, "topK": 5}  # no "top_k" key
+    assert type(st.data["scores"][0]) is float and type(st.data["by_doc"]["d"][0]) is float
+
+
+def test_validation_modes_off_and_sample():
+    with validation_mode("off"):
+        bad = State(data={"text": 5})
+        with pytest.raises(AttributeError):  # the step itself fails; no ValueError from validation
+            count_words(bad, {})
+    with validation_mode("sample", every=3):
+        results = [count_words(State(data={"text": "a b c"}), {}).data["count"] for _ in range(6)]
+    assert results.count(3) == 2 and results.count("3") == 4  # coerced only on sampled calls
+    with pytest.raises(ValueError):
+        set_validation_mode("sometimes")